@@ -1,22 +1,97 @@
 import os
-import datetime
+import sys
+import time
+import logging
+import threading
 from json import JSONEncoder
 
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
+# Cold start is measured from the first import of the app package
+_import_started = time.perf_counter()
+
+from flask import Flask, g, has_app_context
 from flask_migrate import Migrate
-from slack_sdk import WebClient
-from slack_sdk.signature import SignatureVerifier
+from werkzeug.local import LocalProxy
 
+from app import metrics, tracing, profiling, serialization, replica, \
+    query_budget
 from app.cache import Cache
+from app.slack import SlackClient, ClientPool
+from app.constants import (
+    SLACK_CLIENT_POOL_SIZE,
+    SQLALCHEMY_REPLICA_URI,
+    SLACK_DEDUPE_CACHE,
+    SHARED_CACHE,
+    DIRECTORY_CACHE,
+    REDIS_HOST,
+    REDIS_PORT,
+)
+
+logger = logging.getLogger(__name__)
+
+db = replica.RoutingSQLAlchemy()
+migrate = Migrate(directory=os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations"))
+
+_slack_objects: dict = {}
+
+
+# The Slack client and signature verifier are built on first use instead of
+# at import time. Resolving them must not import submodules of `app`: the
+# flask CLI resolves them while iterating over this module's globals.
+#
+# In multi-workspace mode they belong to the workspace of the current request
+# (`g.workspace`, see app.workspaces) and clients come from a bounded pool.
+def _current_workspace():
+    return g.get("workspace") if has_app_context() else None
+
+
+def _get_client():
+    workspace = _current_workspace()
+    if workspace is not None:
+        return _client_pool().get(workspace.id, workspace.bot_token)
+
+    if "client" not in _slack_objects:
+        _slack_objects["client"] = SlackClient(
+            token=os.environ["SLACK_API_TOKEN"],
+            base_url=os.environ.get("SLACK_API_URL", SlackClient.BASE_URL))
+    return _slack_objects["client"]
+
 
-db = SQLAlchemy()
-migrate = Migrate()
-client = WebClient(token=os.environ["SLACK_API_TOKEN"])
-signature_verifier = SignatureVerifier(os.environ["SLACK_SIGNING_SECRET"])
+def _client_pool() -> ClientPool:
+    if "client_pool" not in _slack_objects:
+        _slack_objects["client_pool"] = ClientPool(
+            SLACK_CLIENT_POOL_SIZE,
+            base_url=os.environ.get("SLACK_API_URL", SlackClient.BASE_URL))
+    return _slack_objects["client_pool"]
+
+
+def _get_signature_verifier():
+    from slack_sdk.signature import SignatureVerifier
+
+    workspace = _current_workspace()
+    if workspace is not None and workspace.signing_secret:
+        return SignatureVerifier(workspace.signing_secret)
+
+    if "signature_verifier" not in _slack_objects:
+        _slack_objects["signature_verifier"] = SignatureVerifier(
+            os.environ["SLACK_SIGNING_SECRET"])
+    return _slack_objects["signature_verifier"]
+
+
+client = LocalProxy(_get_client)
+signature_verifier = LocalProxy(_get_signature_verifier)
 
 # redis_client = redis.Redis(host=os.environ.get("REDIS_HOST", "localhost"), port=os.environ.get("REDIS_PORT", 6379), db=0)
-app_cache = Cache()
+app_cache = Cache(name="auth")
+# Slack deliveries already received, see utils.slack_request
+slack_dedupe_cache = Cache(type=SLACK_DEDUPE_CACHE, name="slack_dedupe",
+                           host=REDIS_HOST, port=REDIS_PORT)
+# State shared by the workers, e.g. the retention job (see app.retention)
+shared_cache = Cache(type=SHARED_CACHE, name="shared", host=REDIS_HOST,
+                     port=REDIS_PORT)
+# Slack user directory, see app.directory
+directory_cache = Cache(type=DIRECTORY_CACHE, name="slack_directory",
+                        host=REDIS_HOST, port=REDIS_PORT)
 
 
 class Config:
@@ -27,17 +102,36 @@ class Config:
 
     # Database
     SQLALCHEMY_DATABASE_URI = os.environ.get("SQLALCHEMY_DATABASE_URI")
+    # Optional read replica, see app.replica
+    SQLALCHEMY_BINDS = {replica.REPLICA_BIND: SQLALCHEMY_REPLICA_URI} \
+        if SQLALCHEMY_REPLICA_URI else None
     SQLALCHEMY_ECHO = False
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Startup
+    # Create missing tables on startup. Outside of development the schema is
+    # managed by the migrations (`flask schema upgrade`, run by the migration
+    # job of the chart) and the readiness probe waits for them.
+    CREATE_SCHEMA = os.environ.get(
+        "CREATE_SCHEMA",
+        "1" if os.environ.get("ENVIRONMENT", "DEBUG") == "DEBUG" else "0",
+    ) == "1"
+    # How the auth token cache is filled: "lazy" (on first use of a token),
+    # "background" (thread started in every worker) or "eager" (on startup)
+    CACHE_WARMUP = os.environ.get("CACHE_WARMUP", "lazy")
+
 
-# Custom encoder to serialize datetime objects
+# Custom encoder to serialize datetime objects. Responses are encoded by
+# app.serialization, which uses a faster backend when one is installed.
 class StandupJSONEncoder(JSONEncoder):
     def default(self, obj):
-        if isinstance(obj, (datetime.date, datetime.datetime)):
-            return obj.isoformat()
-        elif isinstance(obj, datetime.time):
-            return obj.strftime("%H:%M")
+        return serialization.default(obj)
+
+    def encode(self, obj):
+        if serialization.BACKEND == "stdlib":
+            return super().encode(obj)
+        return serialization.dumps(obj, sort_keys=self.sort_keys,
+                                   indent=self.indent)
 
 
 def create_app():
@@ -49,14 +143,66 @@ def create_app():
     app.json_encoder = StandupJSONEncoder
 
     db.init_app(app)
-    migrate.init_app(app, db, render_as_batch=True)
+    from app.search import search_cli, include_object
+    migrate.init_app(app, db, render_as_batch=True,
+                     include_object=include_object)
+    metrics.init_app(app)
+    replica.init_app(app, db)
+    tracing.init_app(app)
+    profiling.init_app(app)
+    query_budget.init_app(app)
+
+    from app.retention import retention_cli
+    from app.rollup import rollup_cli
+    from app.partitions import partitions_cli
+    from app.directory import directory_cli
+    from app.digests import digests_cli
+    from app.schema import schema_cli
+    app.cli.add_command(retention_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(rollup_cli)
+    app.cli.add_command(partitions_cli)
+    app.cli.add_command(directory_cli)
+    app.cli.add_command(digests_cli)
+    app.cli.add_command(schema_cli)
 
     with app.app_context():
         from . import routes
-        db.create_all()
-        init_cache()
+        if app.config["CREATE_SCHEMA"] and not _running_migrations():
+            from app.schema import create_schema
+            create_schema()
+        if app.config["CACHE_WARMUP"] == "eager":
+            init_cache()
+
+    _register_postfork(app)
+    _check_dedupe_cache()
+    if app.config["CACHE_WARMUP"] == "background" and not _under_uwsgi():
+        warm_cache_in_background(app)
 
-        return app
+    app.config["STARTUP_SECONDS"] = time.perf_counter() - _import_started
+    metrics.STARTUP_SECONDS.set(app.config["STARTUP_SECONDS"])
+    logger.info("App ready in %.3fs", app.config["STARTUP_SECONDS"])
+
+    return app
+
+
+# `flask db ...` and `flask schema ...` manage the schema themselves.
+# Tables created by create_all before they run would make the migrations
+# that add them fail.
+def _running_migrations() -> bool:
+    return sys.argv[1:2] in (["db"], ["schema"])
+
+
+# Revision of the newest migration shipped with this build
+_schema_head = {}
+
+
+def schema_head() -> str:
+    if "head" not in _schema_head:
+        from alembic.script import ScriptDirectory
+        _schema_head["head"] = ScriptDirectory.from_config(
+            migrate.get_config()).get_current_head()
+    return _schema_head["head"]
 
 
 def init_cache():
@@ -67,3 +213,60 @@ def init_cache():
     for key in keys:
         if key.token and key.user:
             app_cache.set(key.token, key.user)
+
+
+def warm_cache_in_background(app):
+    def warm():
+        with app.app_context():
+            try:
+                init_cache()
+            except Exception:
+                logger.exception("Failed to warm the auth cache")
+            finally:
+                db.session.remove()
+
+    threading.Thread(target=warm, name="cache-warmup", daemon=True).start()
+
+
+def _under_uwsgi() -> bool:
+    try:
+        import uwsgi  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _uwsgi_workers() -> int:
+    try:
+        import uwsgi
+        return uwsgi.numproc
+    except ImportError:
+        return 1
+
+
+# Slack retries a delivery on any worker, a per-worker dedupe cache only
+# drops the retries that reach the worker of the original request
+def _check_dedupe_cache():
+    workers = _uwsgi_workers()
+    if SLACK_DEDUPE_CACHE == "in_memory" and workers > 1:
+        logger.warning(
+            "SLACK_DEDUPE_CACHE=in_memory with %d uWSGI workers: Slack "
+            "retries that reach another worker are handled twice. Set "
+            "SLACK_DEDUPE_CACHE=redis.", workers)
+
+
+# uWSGI loads the app once in the master and forks the workers from it.
+# Connections opened before the fork must not be shared by the workers, so
+# every worker starts with a fresh pool.
+def _register_postfork(app):
+    try:
+        from uwsgidecorators import postfork
+    except ImportError:
+        return
+
+    @postfork
+    def reset_worker():
+        with app.app_context():
+            db.engine.dispose()
+        if app.config["CACHE_WARMUP"] == "background":
+            warm_cache_in_background(app)
@@ -1,36 +1,104 @@
-import redis
+import time
+import threading
+
+from app import metrics
+
+# Expired in-memory keys are swept after this many writes with a TTL
+SWEEP_INTERVAL = 1024
 
 
 class Cache:
-    def __init__(self, type="in_memory", **kwargs):
+    def __init__(self, type="in_memory", name="default", **kwargs):
         self.type = type
+        self.name = name
         if type == "redis":
+            # Imported here, redis is slow to import and unused by default
+            import redis
             self.cache = redis.Redis(host=kwargs["host"], port=kwargs["port"], db=0)
         else:
             self.cache = {}
+            # Expiry time of the in-memory keys that have a TTL
+            self.expires = {}
+            self._writes = 0
+            self._lock = threading.Lock()
 
         self.func_map = {
-            "redis": {"set": self._set_redis_key, "get": self._get_redis_key},
+            "redis": {
+                "set": self._set_redis_key,
+                "get": self._get_redis_key,
+                "add": self._add_redis_key,
+                "delete": self._delete_redis_key,
+            },
             "in_memory": {
                 "set": self._set_in_memory_key,
                 "get": self._get_in_memory_key,
+                "add": self._add_in_memory_key,
+                "delete": self._delete_in_memory_key,
             },
         }
 
-    def set(self, key, value):
-        self.func_map[self.type]["set"](key, value)
+    def set(self, key, value, ttl: int = None):
+        self.func_map[self.type]["set"](key, value, ttl)
 
     def get(self, key):
-        return self.func_map[self.type]["get"](key)
+        value = self.func_map[self.type]["get"](key)
+        metrics.observe_cache(self.name, value is not None)
+        return value
+
+    # Set `key` only if it is not set yet. Returns whether it was set.
+    def add(self, key, value, ttl: int = None) -> bool:
+        return self.func_map[self.type]["add"](key, value, ttl)
+
+    def delete(self, key):
+        self.func_map[self.type]["delete"](key)
+
+    def _set_redis_key(self, key: str, value, ttl: int = None):
+        self.cache.set(key, value, ex=ttl)
 
-    def _set_redis_key(self, key: str, value):
-        self.cache.set(key, value)
+    def _set_in_memory_key(self, key, value, ttl: int = None):
+        with self._lock:
+            self._set_in_memory_locked(key, value, ttl)
 
-    def _set_in_memory_key(self, key, value):
+    def _set_in_memory_locked(self, key, value, ttl: int = None):
         self.cache[key] = value
+        if ttl:
+            self.expires[key] = time.monotonic() + ttl
+            self._writes += 1
+            if self._writes % SWEEP_INTERVAL == 0:
+                self._sweep()
+        else:
+            self.expires.pop(key, None)
 
     def _get_redis_key(self, key):
         return self.cache.get(key)
 
     def _get_in_memory_key(self, key):
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            return None
         return self.cache.get(key)
+
+    def _add_redis_key(self, key: str, value, ttl: int = None) -> bool:
+        return bool(self.cache.set(key, value, ex=ttl, nx=True))
+
+    def _add_in_memory_key(self, key, value, ttl: int = None) -> bool:
+        with self._lock:
+            if self._get_in_memory_key(key) is not None:
+                return False
+            self._set_in_memory_locked(key, value, ttl)
+            return True
+
+    def _delete_redis_key(self, key: str):
+        self.cache.delete(key)
+
+    def _delete_in_memory_key(self, key):
+        with self._lock:
+            self.cache.pop(key, None)
+            self.expires.pop(key, None)
+
+    def _sweep(self):
+        now = time.monotonic()
+        for key in [key for key, expires in self.expires.items()
+                    if expires <= now]:
+            self.cache.pop(key, None)
+            self.expires.pop(key)
@@ -8,7 +8,12 @@ SLASH_COMMAND_TRIGGER = "slash_command_trigger"
 
 CAT_API_HOST = "https://api.thecatapi.com"
 
+# Slack message limits: blocks per message and characters per section text
 BLOCK_SIZE = 50
+SECTION_TEXT_SIZE = 3000
+# Size budget (bytes of JSON) for the blocks of one message. Slack rejects
+# messages with very large block payloads, so stay well below that.
+MESSAGE_PAYLOAD_SIZE = int(os.environ.get("MESSAGE_PAYLOAD_SIZE", 12000))
 
 NO_USER_ERROR_MESSAGE = (
     "Your user details or standup for your user/team doesn't exist in the database."
@@ -19,6 +24,102 @@ SUBMISSION_UPDATED_MESSAGE = "Your submission has been updated"
 
 POST_PUBLISH_STATS = os.environ.get("POST_PUBLISH_STATS", 0)
 
+# Unknown API tokens are remembered as invalid for AUTH_NEGATIVE_TTL seconds
+# so that repeated requests with a wrong or missing token don't each query
+# the auth table
+AUTH_NEGATIVE_TTL = int(os.environ.get("AUTH_NEGATIVE_TTL", 60))
+
+# Serve several Slack workspaces from one deployment. Tokens and signing
+# secrets then come from the workspace table instead of SLACK_API_TOKEN and
+# SLACK_SIGNING_SECRET, and at most SLACK_CLIENT_POOL_SIZE Slack clients are
+# kept per worker.
+MULTI_WORKSPACE = os.environ.get("MULTI_WORKSPACE", "0") == "1"
+SLACK_CLIENT_POOL_SIZE = int(os.environ.get("SLACK_CLIENT_POOL_SIZE", 64))
+
+# Read replica. When set, the reads of the read-only APIs go to it while its
+# replication lag is at most REPLICA_MAX_LAG seconds, measured every
+# REPLICA_LAG_CHECK_INTERVAL seconds (see app.replica).
+SQLALCHEMY_REPLICA_URI = os.environ.get("SQLALCHEMY_REPLICA_URI", "")
+REPLICA_MAX_LAG = float(os.environ.get("REPLICA_MAX_LAG", 5))
+REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get("REPLICA_LAG_CHECK_INTERVAL",
+                                                  5))
+
+# JSON backend: "auto" (orjson when installed), "orjson" or "stdlib"
+JSON_BACKEND = os.environ.get("JSON_BACKEND", "auto")
+
+# Append every verified Slack request to this file (JSON lines) so that it can
+# be anonymized and replayed by benchmarks.loadgen. Disabled when empty.
+SLACK_CAPTURE_FILE = os.environ.get("SLACK_CAPTURE_FILE", "")
+
+# Request tracing. TRACING_EXPORTER is one of "off", "log" (JSON lines on the
+# app.tracing logger) or "zipkin" (Zipkin v2 JSON posted to TRACING_ENDPOINT,
+# e.g. a local Zipkin or OpenTelemetry collector).
+TRACING_EXPORTER = os.environ.get("TRACING_EXPORTER", "off")
+TRACING_ENDPOINT = os.environ.get("TRACING_ENDPOINT",
+                                  "http://localhost:9411/api/v2/spans")
+TRACING_SAMPLE_RATE = float(os.environ.get("TRACING_SAMPLE_RATE", 1.0))
+TRACING_SERVICE_NAME = os.environ.get("TRACING_SERVICE_NAME", "slate")
+
+# Directory where on-demand profiles are written
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "/tmp/slate-profiles")
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL",
+                                               0.005))
+
+# Query budgets of routes and handlers, for development and tests (see
+# app.query_budget): "off", "log" or "raise" when a budget is exceeded.
+# Routes without a budget get QUERY_BUDGET_DEFAULT statements, 0 for none.
+QUERY_BUDGET_MODE = os.environ.get("QUERY_BUDGET_MODE", "off")
+QUERY_BUDGET_DEFAULT = int(os.environ.get("QUERY_BUDGET_DEFAULT", 0))
+
+# Submission retention. Submissions older than RETENTION_DAYS days are purged
+# in batches of RETENTION_BATCH_SIZE rows with RETENTION_BATCH_SLEEP seconds
+# between batches.
+RETENTION_DAYS = int(os.environ.get("RETENTION_DAYS", 90))
+RETENTION_BATCH_SIZE = int(os.environ.get("RETENTION_BATCH_SIZE", 500))
+RETENTION_BATCH_SLEEP = float(os.environ.get("RETENTION_BATCH_SLEEP", 0.1))
+
+# State shared by all workers, like the lock and progress of the retention
+# job, is kept in the SHARED_CACHE ("in_memory", per worker, or "redis")
+SHARED_CACHE = os.environ.get("SHARED_CACHE", "in_memory")
+
+# On Postgres, the submission table can be range-partitioned by month (set
+# SUBMISSION_PARTITIONING=1 before migrating, see app.partitions). Partitions
+# are created SUBMISSION_PARTITIONS_AHEAD months ahead of time.
+SUBMISSION_PARTITIONING = os.environ.get("SUBMISSION_PARTITIONING", "0") == "1"
+SUBMISSION_PARTITIONS_AHEAD = int(os.environ.get("SUBMISSION_PARTITIONS_AHEAD",
+                                                 3))
+
+# A standup publish that holds its lock for longer than this many seconds is
+# considered dead and the standup can be published again
+PUBLISH_LOCK_TIMEOUT = int(os.environ.get("PUBLISH_LOCK_TIMEOUT", 600))
+
+# Slack messages per second sent by the org-wide reminder
+REMINDER_SEND_RATE = float(os.environ.get("REMINDER_SEND_RATE", 10))
+
+# Slack re-delivers a request that wasn't acknowledged within 3 seconds.
+# Deliveries are remembered for SLACK_DEDUPE_TTL seconds in the
+# SLACK_DEDUPE_CACHE ("in_memory", per worker, or "redis", shared by all
+# workers) and repeated ones are acknowledged without being handled again.
+SLACK_DEDUPE_TTL = int(os.environ.get("SLACK_DEDUPE_TTL", 900))
+SLACK_DEDUPE_CACHE = os.environ.get("SLACK_DEDUPE_CACHE", "in_memory")
+REDIS_HOST = os.environ.get("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.environ.get("REDIS_PORT", 6379))
+
+# Slack user directory sync (see app.directory): users.list pages of
+# DIRECTORY_PAGE_SIZE members, at most DIRECTORY_SYNC_RATE pages per second,
+# committed every DIRECTORY_BATCH_SIZE updated users. The directory is
+# cached in the DIRECTORY_CACHE ("in_memory" or "redis").
+DIRECTORY_PAGE_SIZE = int(os.environ.get("DIRECTORY_PAGE_SIZE", 200))
+DIRECTORY_SYNC_RATE = float(os.environ.get("DIRECTORY_SYNC_RATE", 0.3))
+DIRECTORY_BATCH_SIZE = int(os.environ.get("DIRECTORY_BATCH_SIZE", 500))
+DIRECTORY_CACHE = os.environ.get("DIRECTORY_CACHE", "in_memory")
+
+# Weekly and monthly digests (see app.digests) are built by DIGEST_WORKERS
+# processes (default one per CPU) and posted at most DIGEST_POST_RATE
+# messages per second
+DIGEST_WORKERS = int(os.environ.get("DIGEST_WORKERS", os.cpu_count() or 1))
+DIGEST_POST_RATE = float(os.environ.get("DIGEST_POST_RATE", 1))
+
 NO_USER_SUBMIT_MESSAGE = "Didn't hear from"
 
 STANDUP_INFO_SECTION = {
@@ -0,0 +1,341 @@
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, date, timedelta
+from itertools import groupby
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+import click
+from flask.cli import AppGroup
+from slack_sdk.errors import SlackApiError
+from sqlalchemy import select, and_
+
+import app.utils as utils
+import app.forms as forms
+import app.workspaces as workspaces
+import app.serialization as serialization
+from app import client
+from app.slack import Throttle
+from app.models import Digest, Standup, Submission, Team, User, Workspace, db
+from app.constants import (
+    DIGEST_WORKERS,
+    DIGEST_POST_RATE,
+    STANDUP_SECTION_DIVIDER,
+)
+
+logger = logging.getLogger(__name__)
+
+digests_cli = AppGroup("digests",
+                       help="Build weekly and monthly standup digests.")
+
+PERIODS = ("week", "month")
+
+_submission = Submission.__table__
+_user = User.__table__
+
+
+# First and last day of the period starting on `start`, by default the last
+# complete week (Monday to Sunday) or month before today. Months always
+# start on the first.
+def period_dates(period: str, start: Optional[date] = None,
+                 today: Optional[date] = None) -> Tuple[date, date]:
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+    today = today or datetime.utcnow().date()
+
+    if period == "week":
+        start = start or today - timedelta(days=today.weekday() + 7)
+        return start, start + timedelta(days=6)
+
+    start = (start or (today.replace(day=1) - timedelta(days=1))) \
+        .replace(day=1)
+    next_month = (start + timedelta(days=32)).replace(day=1)
+    return start, next_month - timedelta(days=1)
+
+
+def _section(text: str) -> Dict[str, Any]:
+    return {"type": "section", "text": {"type": "mrkdwn", "text": text}}
+
+
+def _day(created_at: datetime) -> Dict[str, Any]:
+    return {"type": "context", "elements": [
+        {"type": "mrkdwn", "text": f"*{created_at:%A, %b %d}*"}]}
+
+
+# Digests of one standup: the team digest (user None) and one for every
+# member who submitted, built from one streamed read of the period's
+# submissions. Runs in the worker processes; the blocks are returned as JSON.
+def build_standup_digests(standup_id: int, team: str, start_date: date,
+                          end_date: date) -> Dict[str, Any]:
+    started = time.perf_counter()
+    query = (
+        select([_user.c.id, _user.c.user_id, _submission.c.created_at,
+                _submission.c.form_version,
+                _submission.c.standup_submission])
+        .select_from(_submission.join(
+            _user, _user.c.id == _submission.c.user_id))
+        .where(and_(
+            _submission.c.standup_id == standup_id,
+            _submission.c.created_at >= datetime.combine(
+                start_date, datetime.min.time()),
+            _submission.c.created_at < datetime.combine(
+                end_date + timedelta(days=1), datetime.min.time()),
+        ))
+        .order_by(_user.c.username, _user.c.id, _submission.c.created_at)
+        .execution_options(stream_results=True)
+    )
+    period = f"{start_date:%b %d} – {end_date:%b %d, %Y}"
+
+    team_blocks: List[Dict[str, Any]] = []
+    people: List[Dict[str, Any]] = []
+    try:
+        rows = db.session.execute(query)
+        for (user_id, slack_user_id), user_rows in groupby(
+                rows, key=lambda row: (row.id, row.user_id)):
+            blocks: List[Dict[str, Any]] = []
+            submissions = 0
+            for row in user_rows:
+                blocks.append(_day(row.created_at))
+                blocks.extend(utils.answer_sections(
+                    row.standup_submission,
+                    forms.schema(standup_id, row.form_version)))
+                submissions += 1
+
+            team_blocks.append(_section(f"<@{slack_user_id}>"))
+            team_blocks.extend(blocks)
+            team_blocks.append(STANDUP_SECTION_DIVIDER)
+            people.append({
+                "user_id": user_id, "submissions": submissions,
+                "blocks": serialization.dumps([_section(
+                    f"*{team}* standups of <@{slack_user_id}>, {period}")]
+                    + blocks),
+            })
+    finally:
+        db.session.rollback()
+
+    submissions = sum(person["submissions"] for person in people)
+    header = _section(f"*{team}* standup digest, {period}: {submissions} "
+                      f"submissions from {len(people)} members")
+    return {
+        "standup_id": standup_id,
+        "submissions": submissions,
+        "members": len(people),
+        "digests": [{"user_id": None, "submissions": submissions,
+                     "blocks": serialization.dumps([header] + team_blocks)}]
+        + people,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+# Every worker process runs its own app, with its own database connections
+def _init_worker() -> None:
+    from app import create_app
+    create_app().app_context().push()
+
+
+# (standup id, digests, error) of every standup, in the order they finish.
+# Workers are spawned rather than forked so that they share no connection
+# with this process. One worker or less builds the digests in this process.
+def _build_all(standups: Dict[int, Any], start_date: date, end_date: date,
+               workers: int) -> Iterator[Tuple[int, Optional[Dict], Any]]:
+    if workers <= 1:
+        for standup_id, standup in standups.items():
+            try:
+                yield standup_id, build_standup_digests(
+                    standup_id, standup.team, start_date, end_date), None
+            except Exception as e:
+                db.session.rollback()
+                yield standup_id, None, e
+        return
+
+    with ProcessPoolExecutor(
+            max_workers=min(workers, len(standups)),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker) as pool:
+        futures = {
+            pool.submit(build_standup_digests, standup_id, standup.team,
+                        start_date, end_date): standup_id
+            for standup_id, standup in standups.items()
+        }
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+# Replace the digests of a standup for the period, with one INSERT for the
+# members' digests. Returns the team digest.
+def _save(period: str, start_date: date, end_date: date,
+          built: Dict[str, Any]) -> Digest:
+    Digest.query.filter_by(standup_id=built["standup_id"], period=period,
+                           start_date=start_date).delete()
+    team, *people = [
+        {"standup_id": built["standup_id"], "user_id": digest["user_id"],
+         "period": period, "start_date": start_date, "end_date": end_date,
+         "submissions": digest["submissions"], "blocks": digest["blocks"],
+         "created_at": datetime.utcnow()}
+        for digest in built["digests"]]
+    digest = Digest(**team)
+    db.session.add(digest)
+    if people:
+        db.session.bulk_insert_mappings(Digest, people)
+    db.session.commit()
+    return digest
+
+
+# Blocks of a team digest grouped by member, so that a member's standups
+# stay in one message where possible
+def _groups(blocks: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    groups: List[List[Dict[str, Any]]] = [[]]
+    for block in blocks:
+        groups[-1].append(block)
+        if block == STANDUP_SECTION_DIVIDER:
+            groups.append([])
+    return [group for group in groups if group]
+
+
+# Post a team digest to the standup's channel: the first message in the
+# channel, the rest in its thread
+def _post(digest: Digest, channel: str, throttle: Throttle) -> None:
+    thread_ts = None
+    for blocks, _ in utils.pack_blocks(_groups(
+            serialization.loads(digest.blocks))):
+        response = throttle.call(client.chat_postMessage, channel=channel,
+                                 blocks=blocks, thread_ts=thread_ts)
+        thread_ts = thread_ts or response["ts"]
+    digest.posted_at = datetime.utcnow()
+    db.session.commit()
+
+
+# Build the digests of every active standup (or those of `teams`) for the
+# period and save them. With `post`, team digests with submissions are
+# posted to the standups' channels.
+def build(period: str = "week", start: Optional[date] = None,
+          teams: Optional[List[str]] = None, workers: int = DIGEST_WORKERS,
+          post: bool = False) -> Dict[str, Any]:
+    start_date, end_date = period_dates(period, start)
+    query = (
+        db.session.query(Standup.id, Standup.workspace_id,
+                         Standup.publish_channel, Team.name.label("team"))
+        .join(Team, Team.id == Standup.team_id)
+        .filter(Standup.is_active)
+    )
+    if teams:
+        query = query.filter(Team.name.in_(teams))
+    standups = {row.id: row for row in query}
+
+    workspace_ids = {row.workspace_id for row in standups.values()} - {None}
+    workspaces_by_id = {workspace.id: workspace for workspace in
+                        Workspace.query.filter(Workspace.id.in_(workspace_ids))
+                        } if workspace_ids and post else {}
+    db.session.commit()
+
+    result: Dict[str, Any] = {
+        "period": period, "start_date": start_date, "end_date": end_date,
+        "teams": [], "submissions": 0, "posted": 0, "failed": []}
+    started = time.perf_counter()
+    throttle = Throttle(DIGEST_POST_RATE)
+
+    for standup_id, built, error in _build_all(standups, start_date,
+                                               end_date, workers):
+        standup = standups[standup_id]
+        if error is not None:
+            logger.error("digests: failed to build the digest of %s: %r",
+                         standup.team, error)
+            result["failed"].append(standup.team)
+            continue
+
+        digest = _save(period, start_date, end_date, built)
+        team_result = {"team": standup.team,
+                       "submissions": built["submissions"],
+                       "members": built["members"],
+                       "seconds": round(built["seconds"], 3),
+                       "posted": False}
+        logger.info("digests: built %(team)s in %(seconds).3fs, "
+                    "%(submissions)d submissions", team_result)
+
+        if post and built["submissions"] and standup.publish_channel:
+            workspaces.activate(workspaces_by_id.get(standup.workspace_id))
+            try:
+                _post(digest, standup.publish_channel, throttle)
+                team_result["posted"] = True
+                result["posted"] += 1
+            except SlackApiError as e:
+                logger.warning("digests: failed to post the digest of %s: %s",
+                               standup.team, e.response.get("error"))
+            finally:
+                workspaces.activate(None)
+
+        result["teams"].append(team_result)
+        result["submissions"] += built["submissions"]
+
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+# Saved digests of a period, by default the latest one built. Team digests
+# come first.
+def digests(period: str = "week", start_date: Optional[date] = None,
+            team: Optional[str] = None,
+            user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    if start_date is None:
+        start_date = db.session.query(db.func.max(Digest.start_date)) \
+            .filter(Digest.period == period).scalar()
+    query = (
+        db.session.query(Digest, Team.name, User.user_id, User.username)
+        .join(Standup, Standup.id == Digest.standup_id)
+        .outerjoin(Team, Team.id == Standup.team_id)
+        .outerjoin(User, User.id == Digest.user_id)
+        .filter(Digest.period == period, Digest.start_date == start_date)
+    )
+    if team:
+        query = query.filter(Team.name == team)
+    if user_id is not None:
+        query = query.filter(Digest.user_id == user_id)
+
+    return [{
+        "team": team_name,
+        "user_id": digest.user_id,
+        "slack_user_id": slack_user_id,
+        "username": username,
+        "period": digest.period,
+        "start_date": digest.start_date,
+        "end_date": digest.end_date,
+        "submissions": digest.submissions,
+        "blocks": serialization.loads(digest.blocks),
+        "created_at": digest.created_at,
+        "posted_at": digest.posted_at,
+    } for digest, team_name, slack_user_id, username in query.order_by(
+        Team.name, Digest.user_id.isnot(None), User.username)]
+
+
+@digests_cli.command("build")
+@click.option("--period", type=click.Choice(PERIODS), default="week",
+              show_default=True)
+@click.option("--start", type=click.DateTime(formats=["%Y-%m-%d"]),
+              help="First day of the period. Defaults to the last complete "
+                   "week or month.")
+@click.option("--team", "teams", multiple=True,
+              help="Only build the digest of this team (repeatable).")
+@click.option("--workers", type=int, default=DIGEST_WORKERS,
+              show_default=True, help="Worker processes.")
+@click.option("--post", is_flag=True,
+              help="Post the team digests to the standup channels.")
+def build_command(period, start, teams, workers, post):
+    """Build the digests of all standups for a week or a month."""
+    result = build(period, start.date() if start else None, list(teams),
+                   workers, post)
+    for team in sorted(result["teams"], key=lambda team: -team["seconds"]):
+        click.echo(f"{team['team']:<24}{team['seconds']:>8.3f}s "
+                   f"{team['submissions']:>6} submissions "
+                   f"{team['members']:>5} members"
+                   f"{'  posted' if team['posted'] else ''}")
+    click.echo(f"Built {len(result['teams'])} {period}ly digests from "
+               f"{result['start_date']} to {result['end_date']} in "
+               f"{result['seconds']:.3f}s, posted {result['posted']}")
+    if result["failed"]:
+        raise click.ClickException(
+            f"Failed to build {len(result['failed'])} digests: "
+            f"{', '.join(result['failed'])}")
@@ -0,0 +1,154 @@
+import logging
+from typing import Dict, Any, Iterator, List, Optional
+
+import click
+from flask.cli import AppGroup
+
+import app.serialization as serialization
+import app.workspaces as workspaces
+import app.versioning as versioning
+from app import client, directory_cache
+from app.slack import Throttle
+from app.models import User, Workspace, db
+from app.constants import (
+    DIRECTORY_PAGE_SIZE,
+    DIRECTORY_BATCH_SIZE,
+    DIRECTORY_SYNC_RATE,
+)
+
+logger = logging.getLogger(__name__)
+
+directory_cli = AppGroup(
+    "directory", help="Sync user names from the Slack user directory.")
+
+
+def _cache_key(slack_user_id: str, workspace_id: Optional[int]) -> str:
+    return f"{workspace_id or 0}:{slack_user_id}"
+
+
+# Profile of a `users.list` member in the shape of the user columns
+def profile(member: Dict[str, Any]) -> Dict[str, Any]:
+    member_profile = member.get("profile", {})
+    display_name = member_profile.get("display_name") or None
+    real_name = member_profile.get("real_name") or member.get("real_name")
+    return {
+        "username": (display_name or real_name or member.get("name")
+                     or "")[:50] or None,
+        "display_name": (real_name or "")[:80] or None,
+        "tz": (member.get("tz") or "")[:50] or None,
+        "is_deleted": bool(member.get("deleted")),
+        "directory_updated": member.get("updated"),
+    }
+
+
+# Directory entry of a Slack user of the current workspace, as cached by the
+# last sync in this process (or by any process with a redis cache)
+def lookup(slack_user_id: str) -> Optional[Dict[str, Any]]:
+    value = directory_cache.get(
+        _cache_key(slack_user_id, workspaces.current_id()))
+    return serialization.loads(value) if value else None
+
+
+# Human members of the current workspace, one `users.list` page at a time
+def members(throttle: Throttle) -> Iterator[List[Dict[str, Any]]]:
+    cursor = None
+    while True:
+        response = throttle.call(client.users_list, limit=DIRECTORY_PAGE_SIZE,
+                                 cursor=cursor)
+        yield [member for member in response.get("members", [])
+               if not member.get("is_bot") and member.get("id") != "USLACKBOT"]
+        cursor = response.get("response_metadata", {}).get("next_cursor")
+        if not cursor:
+            return
+
+
+# Sync the users of the current workspace with the Slack directory. Users
+# whose profile didn't change since the last sync (Slack's `updated` time)
+# are skipped unless `full`. Changed users are written with one UPDATE per
+# batch. Deleted Slack users are deactivated, and reactivated if they come
+# back; users deactivated in slate stay inactive. Users are only updated,
+# slate creates them when they join a standup.
+def sync_workspace(full: bool = False) -> Dict[str, int]:
+    workspace_id = workspaces.current_id()
+    known = {
+        row.user_id: row for row in workspaces.scoped(
+            db.session.query(User.id, User.user_id, User.is_active,
+                             User.is_deleted, User.directory_updated), User)
+    }
+    result = {"members": 0, "updated": 0, "deactivated": 0}
+
+    throttle = Throttle(DIRECTORY_SYNC_RATE)
+    batch: List[Dict[str, Any]] = []
+    for page in members(throttle):
+        for member in page:
+            entry = profile(member)
+            directory_cache.set(_cache_key(member["id"], workspace_id),
+                                serialization.dumps(entry))
+            result["members"] += 1
+
+            user = known.get(member["id"])
+            if user is None or (not full and entry["directory_updated"] ==
+                                user.directory_updated):
+                continue
+            row = {"id": user.id, **entry}
+            if entry["is_deleted"] != bool(user.is_deleted):
+                row["is_active"] = not entry["is_deleted"]
+                if entry["is_deleted"] and user.is_active:
+                    result["deactivated"] += 1
+            batch.append(row)
+
+        if len(batch) >= DIRECTORY_BATCH_SIZE:
+            result["updated"] += _write(batch)
+            batch = []
+    result["updated"] += _write(batch)
+    return result
+
+
+def _write(batch: List[Dict[str, Any]]) -> int:
+    if batch:
+        db.session.bulk_update_mappings(User, batch)
+        versioning.bump("user")
+        db.session.commit()
+    return len(batch)
+
+
+# Sync every active workspace, or the single workspace of a deployment
+# without workspaces
+def sync(full: bool = False) -> Dict[str, Any]:
+    result: Dict[str, Any] = {"workspaces": 0, "members": 0, "updated": 0,
+                              "deactivated": 0, "failed": []}
+    targets = Workspace.query.filter_by(is_active=True).all() or [None]
+    for workspace in targets:
+        workspaces.activate(workspace)
+        try:
+            counts = sync_workspace(full)
+        except Exception:
+            db.session.rollback()
+            logger.exception("directory: failed to sync workspace %s",
+                             workspace.slack_team_id if workspace else "")
+            result["failed"].append(
+                workspace.slack_team_id if workspace else None)
+            continue
+        finally:
+            workspaces.activate(None)
+
+        result["workspaces"] += 1
+        for key, value in counts.items():
+            result[key] += value
+    logger.info("directory: synced %(members)d members, updated %(updated)d "
+                "users", result)
+    return result
+
+
+@directory_cli.command("sync")
+@click.option("--full", is_flag=True,
+              help="Update all users, not only those whose profile changed.")
+def sync_command(full):
+    """Sync user names, time zones and deactivations from Slack."""
+    result = sync(full)
+    click.echo(f"Synced {result['members']} members of "
+               f"{result['workspaces']} workspaces: {result['updated']} "
+               f"users updated, {result['deactivated']} deactivated")
+    if result["failed"]:
+        raise click.ClickException(
+            f"Failed to sync {len(result['failed'])} workspaces")
@@ -0,0 +1,196 @@
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+
+import app.serialization as serialization
+from app.models import Standup, StandupForm, db
+from app.constants import STANDUP_HELP_SECTION
+
+# Every question of a standup form has an id that stays the same across the
+# versions of the form. Its input block is `question_<id>` with the action
+# `answer`, so the answer of a question is found in a submitted view's state
+# without walking its blocks.
+ANSWER_ACTION_ID = "answer"
+BLOCK_ID_PREFIX = "question_"
+
+# [{"id": question id, "text": question}, ...]
+Schema = List[Dict[str, Any]]
+
+# Form versions never change once written, so they are cached per process
+_schemas: Dict[Tuple[int, int], Schema] = {}
+
+
+def block_id(question_id: int) -> str:
+    return f"{BLOCK_ID_PREFIX}{question_id}"
+
+
+def question_id(block_id: str) -> Optional[int]:
+    if not block_id or not block_id.startswith(BLOCK_ID_PREFIX):
+        return None
+    try:
+        return int(block_id[len(BLOCK_ID_PREFIX):])
+    except ValueError:
+        return None
+
+
+# Schema of `questions`. Questions of `previous` keep their ids, new ones get
+# ids after `last_id`, the highest id the form ever used.
+def assign_ids(questions: List[str], previous: Schema = (),
+               last_id: int = 0) -> Schema:
+    free: Dict[str, List[int]] = {}
+    for question in previous:
+        free.setdefault(question["text"], []).append(question["id"])
+
+    schema = []
+    for text in questions:
+        if free.get(text):
+            id_ = free[text].pop(0)
+        else:
+            last_id += 1
+            id_ = last_id
+        schema.append({"id": id_, "text": text})
+    return schema
+
+
+# Block Kit modal of a form
+def blockkit(schema: Schema) -> Dict[str, Any]:
+    blockkit_form = {
+        "title": {"type": "plain_text", "text": "Daily Standup", "emoji": True},
+        "submit": {"type": "plain_text", "text": "Submit", "emoji": True},
+        "type": "modal",
+        "close": {"type": "plain_text", "text": "Cancel", "emoji": True},
+        "blocks": [STANDUP_HELP_SECTION],
+    }
+    for question in schema:
+        blockkit_form["blocks"].append({
+            "type": "input",
+            "block_id": block_id(question["id"]),
+            "label": {"type": "plain_text", "text": question["text"],
+                      "emoji": True},
+            "element": {"type": "plain_text_input", "multiline": True,
+                        "action_id": ANSWER_ACTION_ID},
+        })
+    return blockkit_form
+
+
+# Schemas of (standup id, form version) pairs, loading the uncached ones
+# with one query. Pairs without a version are skipped.
+def schemas(keys: Iterable[Tuple[int, Optional[int]]]
+            ) -> Dict[Tuple[int, int], Schema]:
+    keys = {key for key in keys if key[0] is not None and key[1] is not None}
+    missing = keys - _schemas.keys()
+    if missing:
+        rows = db.session.query(
+            StandupForm.standup_id, StandupForm.version, StandupForm.questions
+        ).filter(
+            StandupForm.standup_id.in_({key[0] for key in missing}),
+            StandupForm.version.in_({key[1] for key in missing}),
+        )
+        for standup_id, version, questions in rows:
+            _schemas[(standup_id, version)] = serialization.loads(questions)
+    return {key: _schemas[key] for key in keys if key in _schemas}
+
+
+def schema(standup_id: Optional[int], version: Optional[int]
+           ) -> Optional[Schema]:
+    return schemas([(standup_id, version)]).get((standup_id, version))
+
+
+# Delete the form versions of a standup. Does not commit. Standups are
+# rarely deleted, the whole cache is dropped in case the id is reused.
+def delete(standup_id: int) -> None:
+    StandupForm.query.filter_by(standup_id=standup_id).delete()
+    _schemas.clear()
+
+
+# Set the questions of a standup. A new form version is added when they
+# changed; the form (`standup_blocks`) is rebuilt either way. Does not
+# commit.
+def set_questions(standup: Standup, questions: List[str],
+                  callback_id: str = None) -> None:
+    previous = schema(standup.id, standup.form_version) or []
+    last_id = 0
+    if standup.id is not None:
+        for (questions_json,) in db.session.query(
+                StandupForm.questions).filter_by(standup_id=standup.id):
+            last_id = max([last_id] + [question["id"] for question in
+                                       serialization.loads(questions_json)])
+
+    new = assign_ids(questions, previous, last_id)
+    if new != previous or standup.form_version is None:
+        version = (standup.form_version or 0) + 1
+        db.session.add(StandupForm(standup=standup, version=version,
+                                   questions=serialization.dumps(new)))
+        standup.form_version = version
+
+    form = blockkit(new)
+    if callback_id:
+        form["callback_id"] = callback_id
+    standup.standup_blocks = serialization.dumps(form)
+
+
+# Modal of a standup's form, tagged with the form version so that the
+# submission can be read with the version it was filled in with
+def tag_view(view: Dict[str, Any], standup: Standup) -> Dict[str, Any]:
+    if standup.form_version is not None:
+        view["private_metadata"] = serialization.dumps(
+            {"form_version": standup.form_version})
+    return view
+
+
+# Form version of a submitted view, None for untagged views
+def form_version(view: Dict[str, Any]) -> Optional[int]:
+    try:
+        metadata = serialization.loads(view.get("private_metadata") or "{}")
+        return int(metadata["form_version"])
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+# Answers of a submitted view by question id, looked up in its state
+def answers_by_id(view: Dict[str, Any], schema: Schema
+                  ) -> Dict[int, Optional[str]]:
+    values = view.get("state", {}).get("values", {})
+    return {question["id"]: values.get(block_id(question["id"]), {})
+            .get(ANSWER_ACTION_ID, {}).get("value")
+            for question in schema}
+
+
+# Fill the input blocks of `form` with the answers of a submitted view. A
+# question has the same id in every version of the form, so the answers of a
+# view of any version land on the right question; views from before form
+# versions are matched by question text. New questions are left blank.
+def fill(form: Dict[str, Any], view: Dict[str, Any]) -> Dict[str, Any]:
+    values = view.get("state", {}).get("values", {})
+    by_text = dict(answers(view)) if form_version(view) is None else None
+    for block in form.get("blocks", []):
+        if block.get("type") != "input":
+            continue
+        if by_text is not None:
+            value = by_text.get(block.get("label", {}).get("text", ""))
+        else:
+            value = values.get(block.get("block_id", ""), {}) \
+                .get(ANSWER_ACTION_ID, {}).get("value")
+        if value is not None:
+            block["element"]["initial_value"] = value
+    return form
+
+
+# (question, answer) pairs of a submitted view. With the schema of the
+# submission's form version the answers are looked up by question id,
+# without one the view's input blocks are walked to pair labels and answers.
+def answers(view: Dict[str, Any], schema: Optional[Schema] = None
+            ) -> List[Tuple[str, Optional[str]]]:
+    if schema is not None:
+        by_id = answers_by_id(view, schema)
+        return [(question["text"], by_id[question["id"]])
+                for question in schema]
+
+    values = view.get("state", {}).get("values", {})
+    pairs = []
+    for block in view.get("blocks", []):
+        if block.get("type") != "input":
+            continue
+        action_id = block.get("element", {}).get("action_id", "")
+        pairs.append((block.get("label", {}).get("text", ""),
+                      values.get(block.get("block_id", ""), {})
+                      .get(action_id, {}).get("value")))
+    return pairs
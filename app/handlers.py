@@ -1,16 +1,28 @@
-import json
+import logging
 from datetime import datetime, time
 
 from slack_sdk.errors import SlackApiError
 from flask import make_response
+from sqlalchemy.orm import selectinload
 
 import app.utils as utils
+import app.forms as forms
+import app.search as search
+import app.rollup as rollup
+import app.directory as directory
+import app.query_budget as query_budget
+import app.workspaces as workspaces
+import app.serialization as serialization
 import app.constants as constants
 from app.models import Team, Standup, User, Submission, db
 from app import client
+from app.tracing import traced
+
+logger = logging.getLogger(__name__)
 
 
 # Handler for new/existing standup configuration
+@traced()
 def configure_standup_handler(**kwargs):
     payload = kwargs.get("data", {})
     _, team_name = payload.get("view", {}).get("callback_id", "").split("%")
@@ -45,9 +57,9 @@ def configure_standup_handler(**kwargs):
     publish_time = datetime.strptime(publish_time, "%H:%M").time()
 
     # Get team
-    team = Team.query.filter_by(name=team_name).first()
+    team = workspaces.scoped(Team.query, Team).filter_by(name=team_name).first()
     if not team:
-        team = Team(name=team_name)
+        team = Team(name=team_name, workspace_id=workspaces.current_id())
 
         db.session.add(team)
         db.session.commit()
@@ -63,7 +75,8 @@ def configure_standup_handler(**kwargs):
     # Users to remove
     remove_user_list = set(user_ids) - set(user_list)
     for user_id in remove_user_list:
-        user = User.query.filter_by(user_id=user_id).first()
+        user = workspaces.scoped(User.query, User).filter_by(
+            user_id=user_id).first()
         teams = []
         for team in user.team:
             if team.name != team_name:
@@ -76,9 +89,13 @@ def configure_standup_handler(**kwargs):
     # Users to add
     add_user_list = set(user_list) - set(user_ids)
     for user_id in add_user_list:
-        user = User.query.filter_by(user_id=user_id).first()
+        user = workspaces.scoped(User.query, User).filter_by(
+            user_id=user_id).first()
         if not user:
-            user = User(user_id=user_id, is_active=True, team=[team])
+            # Names come from the directory sync, never from users.info
+            user = User(user_id=user_id, is_active=True, team=[team],
+                        workspace_id=workspaces.current_id(),
+                        **(directory.lookup(user_id) or {}))
         else:
             if team not in user.team:
                 user.team.append(team)
@@ -86,66 +103,73 @@ def configure_standup_handler(**kwargs):
         db.session.add(user)
         db.session.commit()
 
-    # Create or update standup
+    # Create or update standup. Changed questions add a new form version.
     questions = questions.split("\n")
-    blockkit_form = utils.questions_to_blockkit(questions)
-    blockkit_form["callback_id"] = f"submit_standup%{team_name}"
 
-    standup = Standup.query.filter(Standup.trigger == team_name).first()
+    standup = workspaces.scoped(Standup.query, Standup).filter(
+        Standup.trigger == team_name).first()
     if not standup:
-        standup = Standup(standup_blocks=json.dumps(blockkit_form),
-                          trigger=team_name,
+        standup = Standup(trigger=team_name,
+                          workspace_id=workspaces.current_id(),
                           team=team,
                           publish_time=publish_time,
                           publish_channel=publish_channel)
+        forms.set_questions(standup, questions,
+                            callback_id=f"submit_standup%{team_name}")
         team.standup = standup
         db.session.add(standup)
         db.session.commit()
         db.session.add(standup)
         db.session.commit()
     else:
-        standup.standup_blocks = json.dumps(blockkit_form)
+        forms.set_questions(standup, questions,
+                            callback_id=f"submit_standup%{team_name}")
         standup.publish_time = publish_time
         standup.publish_channel = publish_channel
         db.session.add(standup)
         db.session.commit()
 
 
-# Handler for new standup submission
+# Handler for new standup submission. A late submission, posted to today's
+# thread with its list of missing users, takes the most statements.
+@traced()
+@query_budget.budget(12)
 def submit_standup_handler(**kwargs):
     payload = kwargs.get("data")
-    standup_submission = json.dumps(payload.get("view"))
-
-    if payload and utils.is_submission_eligible(payload):
-        user_payload = payload.get("user", {})
-        _, team_name = payload.get("view", {}).get("callback_id", "").split("%")
-
-        user = User.query.filter_by(user_id=user_payload.get("id")).first()
-        standup = Standup.query.filter(Standup.trigger == team_name).first()
-
-        todays_datetime = datetime(
-            datetime.today().year, datetime.today().month, datetime.today().day
-        )
-
-        is_edit = False
-        if submission := utils.submission_exists(user, standup):
-            client.chat_postMessage(channel=user.user_id,
+    if not payload or not utils.is_submission_eligible(payload):
+        return
+
+    slack_user_id = payload["user"]["id"]
+    _, team_name = payload["view"]["callback_id"].split("%")
+
+    context = utils.submission_context(slack_user_id, team_name)
+    if context is None:
+        logger.warning("No user %s or standup %s for a submission",
+                       slack_user_id, team_name)
+        return
+    user, standup = context
+
+    # The steps below commit several times but only read what was loaded
+    # here, so the loaded rows are kept instead of being read again
+    with utils.keep_loaded():
+        # Inserts today's submission or updates the existing one. The
+        # (user, standup, day) unique key makes double submits update it.
+        submission, inserted = utils.upsert_submission(
+            user, standup, serialization.dumps(payload["view"]),
+            forms.form_version(payload["view"]))
+        if not inserted:
+            client.chat_postMessage(channel=slack_user_id,
                                     text=constants.SUBMISSION_UPDATED_MESSAGE)
-            submission.standup_submission = standup_submission
-            is_edit = True
-        else:
-            submission = Submission(user_id=user.id,
-                                    standup_submission=standup_submission,
-                                    standup_id=standup.id,
-                                    standup=standup)
 
-        db.session.add(submission)
-        db.session.commit()
+        search.index_submission(submission)
+        if inserted:
+            rollup.record_submission(submission)
 
-    utils.after_submission(submission, is_edit)
+        utils.after_submission(submission, not inserted)
 
 
 # Open view to configure standup
+@traced()
 def open_configure_view(**kwargs):
     data = kwargs.get("data")
     config_blocks: List = dict(constants.CONFIGURE_VIEW)
@@ -158,11 +182,11 @@ def open_configure_view(**kwargs):
                     200,
                 )
 
-    team = Team.query.filter_by(name=team_name).first()
+    team = workspaces.scoped(Team.query, Team).filter_by(name=team_name).first()
 
     if team:
         # Prepare standup question list to put in textfield
-        standup_json = json.loads(team.standup.standup_blocks)
+        standup_json = serialization.loads(team.standup.standup_blocks)
 
         blocks = standup_json.get("blocks", [])
         questions = filter(lambda block: block["type"] == "input", blocks)
@@ -195,76 +219,52 @@ def open_configure_view(**kwargs):
 
 
 # Open standup view for a user
+@traced()
+@query_budget.budget(2)
 def open_standup_view(**kwargs):
     user_id = kwargs.get("user_id")
     data = kwargs.get("data", None)
     trigger_type = kwargs.get("trigger_type", constants.BUTTON_TRIGGER)
 
-    try:
-        user = User.query.filter_by(user_id=user_id).first()
-        if trigger_type == constants.BUTTON_TRIGGER:
-            team = (
-                db.session.query(Team)
-                .join(User.team)
-                .filter(User.id == user.id)
-                .first()
-            )
-        else:
-            team_name = data.get("text")
-            print(team_name)
-            if not team_name:
+    # Slash commands name the team, buttons open the user's first team
+    team_name = None
+    if trigger_type != constants.BUTTON_TRIGGER:
+        team_name = data.get("text")
+        if not team_name:
+            user = workspaces.scoped(User.query, User).filter_by(
+                user_id=user_id).options(selectinload(User.team)).first()
+            if user:
                 message = f"Slash command format is `/standup <team-name>`.\nYour commands: {', '.join(utils.get_user_slash_commands(user))}"
                 client.chat_postMessage(channel=user.user_id, text=message)
-            team = Team.query.filter_by(name=team_name).first()
 
-        # TODO: Check if this user it allowed in this team's standup especially
-        # in the case of slash command trigger.
-        standup = team.standup
-
-        if submission := utils.submission_exists(user, standup):
-            client.views_open(
-                trigger_id=data.get("trigger_id"),
-                view=open_edit_view(standup, submission)
-            )
-
-        client.views_open(
-            trigger_id=data.get("trigger_id"),
-            view=utils.get_standup_view(standup)
-        )
-        return make_response("", 200)
-    except SlackApiError as e:
-        code = e.response["error"]
-        return make_response(f"Failed to open a modal due to {code}", 200)
-    except AttributeError:
+    opened = utils.open_standup_context(user_id, team_name) \
+        if trigger_type == constants.BUTTON_TRIGGER or team_name else None
+    if opened is None:
         return make_response(
             f"No user details or standup exists for this request.\n{constants.NO_USER_ERROR_MESSAGE}",
             200,
         )
+    standup, submission = opened
+
+    # Today's answers are edited in the filled form, otherwise it is blank
+    view = open_edit_view(standup, submission) if submission \
+        else utils.get_standup_view(standup)
+    try:
+        client.views_open(trigger_id=data.get("trigger_id"), view=view)
+    except SlackApiError as e:
+        code = e.response["error"]
+        return make_response(f"Failed to open a modal due to {code}", 200)
+    return make_response("", 200)
 
 
 # Create block kit filled with existing responses for standup
+@traced()
+@query_budget.budget(0)
 def open_edit_view(standup: Standup, submission: Submission) -> str:
-    standup_json = json.loads(submission.standup_submission)
-    submission_text_list: List = []
-
-    # Create list of existing responses
-    blocks = standup_json.get("blocks", [])
-    for block in blocks:
-        block_id = block.get("block_id", "")
-        action_id = block.get("element", {}).get("action_id", "")
-
-        values = standup_json.get("state", {}).get("values", {})
-        submission_text_list.append(values.get(
-            block_id, {}).get(action_id, {}).get("value", ""))
-
-    # Create edit view filled with responses
-    standup_blocks = json.loads(standup.standup_blocks)
-    filled_blocks: List = []
-    for idx, block in enumerate(standup_blocks.get("blocks", [])):
-        if block["type"] == "input":
-            block["element"]["initial_value"] = submission_text_list[idx]
-        filled_blocks.append(block)
-    standup_blocks["blocks"] = filled_blocks
+    standup_blocks = forms.fill(
+        serialization.loads(standup.standup_blocks),
+        serialization.loads(submission.standup_submission))
     standup_blocks["callback_id"] = f"submit_standup%{standup.trigger}"
+    forms.tag_view(standup_blocks, standup)
 
-    return json.dumps(standup_blocks)
+    return serialization.dumps(standup_blocks)
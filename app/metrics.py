@@ -0,0 +1,268 @@
+import os
+import time
+import atexit
+
+from flask import g, request, has_app_context
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# When set, every uWSGI worker writes its samples to this directory and the
+# scrape endpoint aggregates them. Must be set before the workers start.
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR") or \
+    os.environ.get("prometheus_multiproc_dir")
+
+REQUEST_LATENCY = Histogram(
+    "slate_http_request_duration_seconds",
+    "Latency of HTTP requests by route",
+    ["endpoint", "method", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "slate_http_requests_in_flight",
+    "HTTP requests currently being served by route",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+)
+DB_QUERIES = Histogram(
+    "slate_db_queries_per_request",
+    "Number of SQL statements executed per HTTP request",
+    ["endpoint"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, float("inf")),
+)
+DB_TIME = Histogram(
+    "slate_db_query_seconds_per_request",
+    "Time spent executing SQL statements per HTTP request",
+    ["endpoint"],
+)
+SLACK_LATENCY = Histogram(
+    "slate_slack_api_call_duration_seconds",
+    "Latency of Slack Web API calls by method",
+    ["method"],
+)
+SLACK_ERRORS = Counter(
+    "slate_slack_api_errors_total",
+    "Failed Slack Web API calls by method and error",
+    ["method", "error"],
+)
+SLACK_RATE_LIMITED = Counter(
+    "slate_slack_api_rate_limited_total",
+    "Slack Web API calls rejected with HTTP 429 by method",
+    ["method"],
+)
+STARTUP_SECONDS = Gauge(
+    "slate_startup_seconds",
+    "Time from importing the app to the app being ready",
+    multiprocess_mode="max",
+)
+CACHE_REQUESTS = Counter(
+    "slate_cache_requests_total",
+    "Cache lookups by cache and result (hit/miss)",
+    ["cache", "result"],
+)
+DB_ENGINE_QUERIES = Counter(
+    "slate_db_queries_total",
+    "SQL statements executed by engine (primary/replica)",
+    ["engine"],
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "slate_db_pool_checked_out_connections",
+    "Connections checked out of the pool by engine",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "slate_db_pool_connections",
+    "Open connections of the pool by engine",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+DB_REPLICA_LAG = Gauge(
+    "slate_db_replica_lag_seconds",
+    "Last measured replication lag of the read replica",
+    multiprocess_mode="max",
+)
+SLACK_DUPLICATES_DROPPED = Counter(
+    "slate_slack_duplicate_requests_dropped_total",
+    "Slack requests acknowledged without handling because they were already "
+    "received, by route and reason (retry/duplicate)",
+    ["endpoint", "reason"],
+)
+
+
+# Label used for a request. The URL rule keeps the label cardinality bounded.
+def _endpoint() -> str:
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_endpoint = _endpoint()
+    g.db_queries = 0
+    g.db_time = 0.0
+    REQUESTS_IN_FLIGHT.labels(g.metrics_endpoint).inc()
+
+
+def _observe(status: int) -> None:
+    endpoint = g.metrics_endpoint
+    REQUEST_LATENCY.labels(endpoint, request.method, str(status)).observe(
+        time.perf_counter() - g.metrics_start)
+    DB_QUERIES.labels(endpoint).observe(g.db_queries)
+    DB_TIME.labels(endpoint).observe(g.db_time)
+    g.metrics_observed = True
+
+
+def _after_request(response):
+    if "metrics_start" in g:
+        _observe(response.status_code)
+    return response
+
+
+def _teardown_request(exc):
+    if "metrics_start" not in g:
+        return
+    if not g.get("metrics_observed"):
+        _observe(500)
+    REQUESTS_IN_FLIGHT.labels(g.metrics_endpoint).dec()
+
+
+# Engine names by engine, see instrument_engine
+_engine_names: dict = {}
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+    name = _engine_names.get(conn.engine)
+    if name:
+        DB_ENGINE_QUERIES.labels(name).inc()
+    if has_app_context() and "db_queries" in g:
+        g.db_queries += 1
+        g.db_time += elapsed
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    if context.connection is not None:
+        starts = context.connection.info.get("metrics_query_start")
+        if starts:
+            starts.pop()
+
+
+# Record the outcome of one Slack Web API call
+def observe_slack_call(method: str, elapsed: float, error: str = None,
+                       status: int = None) -> None:
+    SLACK_LATENCY.labels(method).observe(elapsed)
+    if error:
+        SLACK_ERRORS.labels(method, error).inc()
+    if status == 429:
+        SLACK_RATE_LIMITED.labels(method).inc()
+
+
+# Record a cache lookup
+def observe_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+# Export the pool usage and the queries of `engine` under `name`
+def instrument_engine(name: str, engine) -> None:
+    if engine in _engine_names:
+        return
+    _engine_names[engine] = name
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        DB_POOL_CONNECTIONS.labels(name).inc()
+
+    @event.listens_for(engine, "close")
+    def _close(dbapi_connection, connection_record):
+        DB_POOL_CONNECTIONS.labels(name).dec()
+
+    @event.listens_for(engine, "close_detached")
+    def _close_detached(dbapi_connection):
+        DB_POOL_CONNECTIONS.labels(name).dec()
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKED_OUT.labels(name).inc()
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.labels(name).dec()
+
+
+def observe_replica_lag(seconds: float) -> None:
+    DB_REPLICA_LAG.set(seconds)
+
+
+# Record a Slack request of the current route dropped as a repeated delivery
+def observe_duplicate_slack_request(reason: str) -> None:
+    SLACK_DUPLICATES_DROPPED.labels(_endpoint(), reason).inc()
+
+
+# Exports hit ratio per cache computed from the (aggregated) lookup counters
+class CacheHitRatioCollector:
+    def __init__(self, source: CollectorRegistry):
+        self.source = source
+
+    def collect(self):
+        hits: dict = {}
+        totals: dict = {}
+        for metric in self.source.collect():
+            if metric.name != "slate_cache_requests":
+                continue
+            for sample in metric.samples:
+                if not sample.name.endswith("_total"):
+                    continue
+                cache = sample.labels["cache"]
+                totals[cache] = totals.get(cache, 0) + sample.value
+                if sample.labels["result"] == "hit":
+                    hits[cache] = hits.get(cache, 0) + sample.value
+
+        ratio = GaugeMetricFamily("slate_cache_hit_ratio",
+                                  "Cache hit ratio since start", labels=["cache"])
+        for cache, total in totals.items():
+            ratio.add_metric([cache], hits.get(cache, 0) / total if total else 0)
+        yield ratio
+
+
+# Metrics of all workers in Prometheus text format
+def scrape() -> bytes:
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=MULTIPROC_DIR)
+    else:
+        registry = REGISTRY
+
+    derived = CollectorRegistry(auto_describe=True)
+    derived.register(CacheHitRatioCollector(registry))
+
+    return generate_latest(registry) + generate_latest(derived)
+
+
+def _mark_process_dead():
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid(), path=MULTIPROC_DIR)
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    atexit.register(_mark_process_dead)
@@ -1,11 +1,28 @@
 import enum
-from datetime import datetime
+from datetime import datetime, date, timezone
+from typing import List
 
 from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Table, \
-    Enum, Time
-from sqlalchemy.orm import relationship
+    Enum, Time, Date, Index, UniqueConstraint, text
+from sqlalchemy.orm import relationship, validates
 
-from app import db
+from app import db, serialization
+
+
+# Server's local time of `moment`, a UTC timestamp like the `created_at`
+# columns. Publish times are in this clock.
+def local_time(moment: datetime) -> datetime:
+    return moment.replace(tzinfo=timezone.utc).astimezone() \
+        .replace(tzinfo=None)
+
+
+# Standup day of `moment` (a UTC timestamp) or of now: the server's local
+# date. Publish times, today's thread, reminders, the day key of
+# submissions and the participation rollup all go by this day.
+def standup_day(moment: datetime = None) -> date:
+    if moment is None:
+        return date.today()
+    return local_time(moment).date()
 
 
 association_table = Table(
@@ -22,14 +39,39 @@ class PostSubmitActionEnum(enum.Enum):
     dog = 2
 
 
+# Slack workspace served by this deployment in multi-workspace mode
+class Workspace(db.Model):
+    __tablename__ = "workspace"
+    __table_args__ = {'extend_existing': True}
+
+    id = Column(Integer, primary_key=True)
+    # Slack's team id of the workspace, e.g. T0123ABCD
+    slack_team_id = Column(String(20), unique=True, nullable=False)
+    name = Column(String(100), unique=False, nullable=True)
+    bot_token = Column(String(255), nullable=False)
+    # Signing secret of the workspace's app. Apps distributed to several
+    # workspaces share SLACK_SIGNING_SECRET and leave this empty.
+    signing_secret = Column(String(100), nullable=True)
+    is_active = Column(Boolean, unique=False, default=True)
+    created_at = Column(db.DateTime, default=datetime.utcnow, nullable=True)
+
+
 class User(db.Model):
     __tablename__ = "user"
     __table_args__ = {'extend_existing': True}
 
     id = Column(Integer, primary_key=True)
     user_id = Column(String(20), unique=False)
+    workspace_id = Column(Integer, ForeignKey("workspace.id"), nullable=True,
+                          index=True)
     username = Column(String(50), unique=False)
     is_active = Column(Boolean, unique=False, default=True)
+    # Synced from the Slack user directory, see app.directory
+    display_name = Column(String(80), nullable=True)
+    tz = Column(String(50), nullable=True)
+    is_deleted = Column(Boolean, nullable=True)
+    # Slack's `updated` time of the profile at the last sync
+    directory_updated = Column(Integer, nullable=True)
     submission = relationship(
         "Submission", lazy='dynamic', back_populates="user")
     team = relationship("Team", secondary=association_table,
@@ -45,10 +87,23 @@ class User(db.Model):
 
 class Team(db.Model):
     __tablename__ = "team"
-    __table_args__ = {'extend_existing': True}
+    # Team names are unique per workspace. Without multiple workspaces the
+    # workspace is NULL, which unique constraints don't compare, so those
+    # names are kept unique by a partial index.
+    __table_args__ = (
+        UniqueConstraint("workspace_id", "name",
+                         name="uq_team_workspace_id_name"),
+        Index("uq_team_name_without_workspace", "name", unique=True,
+              postgresql_where=text("workspace_id IS NULL"),
+              sqlite_where=text("workspace_id IS NULL")),
+        {'extend_existing': True},
+    )
 
     id = Column(Integer, primary_key=True)
-    name = Column(String(20), unique=True, nullable=True)
+    name = Column(String(20), nullable=True)
+    workspace_id = Column(Integer, ForeignKey("workspace.id"), nullable=True,
+                          index=True)
+    workspace = relationship("Workspace")
     standup = relationship("Standup", uselist=False, back_populates="team")
     user = relationship("User", secondary=association_table,
                         back_populates="team")
@@ -57,7 +112,11 @@ class Team(db.Model):
 
 class Submission(db.Model):
     __tablename__ = "submission"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        UniqueConstraint("user_id", "standup_id", "day",
+                         name="uq_submission_user_standup_day"),
+        {'extend_existing': True},
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("user.id"))
@@ -66,6 +125,40 @@ class Submission(db.Model):
     standup = relationship("Standup")
     standup_submission = Column(String(), unique=False)
     created_at = Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Standup day of the submission, a user submits once per standup and day
+    # (see utils.upsert_submission)
+    day = Column(Date, nullable=True, default=standup_day)
+    # When the submission was posted to the standup thread
+    published_at = Column(db.DateTime, nullable=True)
+    # Version of the standup's form that was submitted, None for
+    # submissions of forms without stable question ids
+    form_version = Column(Integer, nullable=True)
+
+
+# Submissions the migrations set aside instead of deleting them, e.g. the
+# earlier duplicates of a day when the day key was added. `id` is the id the
+# submission had.
+class ArchivedSubmission(db.Model):
+    __tablename__ = "submission_archive"
+    __table_args__ = {'extend_existing': True}
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, nullable=True)
+    standup_id = Column(Integer, nullable=True)
+    standup_submission = Column(String(), nullable=True)
+    created_at = Column(db.DateTime, nullable=True)
+    published_at = Column(db.DateTime, nullable=True)
+    day = Column(Date, nullable=True)
+    # Why it was archived: "duplicate" or "no_day"
+    reason = Column(String(20), nullable=False)
+    archived_at = Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+# Questions (input labels) of a standup's Block Kit form
+def standup_questions(standup_blocks: str) -> List[str]:
+    blocks = serialization.loads(standup_blocks or "{}").get("blocks", [])
+    return [block["label"]["text"] for block in blocks
+            if block["type"] == "input"]
 
 
 class Standup(db.Model):
@@ -74,12 +167,21 @@ class Standup(db.Model):
 
     id = Column(Integer, primary_key=True)
     standup_blocks = Column(String(), unique=False)
+    # JSON list of the questions of `standup_blocks`, kept in sync with it so
+    # that the read APIs don't parse the form
+    questions = Column(String(), nullable=True)
+    # Current version of the form, see StandupForm
+    form_version = Column(Integer, nullable=True)
+    workspace_id = Column(Integer, ForeignKey("workspace.id"), nullable=True,
+                          index=True)
     trigger = Column(String(10), unique=False)
     is_active = Column(Boolean, unique=False, default=True)
     team_id = Column(Integer, ForeignKey("team.id"))
     team = relationship("Team", back_populates="standup")
     publish_channel = Column(String(20), unique=False)
     publish_time = Column(Time, nullable=True)
+    # Set while the standup is being published, see utils.acquire_publish_lock
+    publishing_since = Column(db.DateTime, nullable=True)
     created_at = Column(db.DateTime, default=datetime.utcnow, nullable=True)
 
     def update(self, **kwargs):
@@ -87,18 +189,109 @@ class Standup(db.Model):
             if hasattr(self, key):
                 setattr(self, key, value)
 
+    @validates("standup_blocks")
+    def _extract_questions(self, key, standup_blocks):
+        self.questions = serialization.dumps(
+            standup_questions(standup_blocks))
+        return standup_blocks
+
+
+# One version of the questions of a standup's form. Every question keeps
+# its id across versions, the answers of a submission are looked up by id
+# in the version it was submitted with (see app.forms).
+class StandupForm(db.Model):
+    __tablename__ = "standup_form"
+    __table_args__ = (
+        UniqueConstraint("standup_id", "version",
+                         name="uq_standup_form_standup_version"),
+        {'extend_existing': True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    standup_id = Column(Integer, ForeignKey('standup.id'), nullable=False)
+    standup = relationship("Standup")
+    version = Column(Integer, nullable=False)
+    # JSON list of {"id": question id, "text": question}
+    questions = Column(String(), nullable=False)
+    created_at = Column(db.DateTime, default=datetime.utcnow, nullable=True)
+
 
 class StandupThread(db.Model):
     __tablename__ = "standupthread"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index("ix_standupthread_standup_id_day", "standup_id", "day"),
+        {'extend_existing': True},
+    )
 
     id = Column(Integer, primary_key=True)
     standup_id = Column(Integer, ForeignKey('standup.id'))
     standup = relationship("Standup")
     thread_id = Column(String(70), unique=True)
+    # Standup day the thread was published for
+    day = Column(Date, nullable=True)
     created_at = Column(db.DateTime, default=datetime.utcnow, nullable=True)
 
 
+# Participation of one standup on one day, maintained incrementally on
+# submit and publish (see app.rollup)
+class StandupDailyStats(db.Model):
+    __tablename__ = "standup_daily_stats"
+    __table_args__ = (
+        UniqueConstraint("standup_id", "day",
+                         name="uq_standup_daily_stats_standup_day"),
+        {'extend_existing': True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    standup_id = Column(Integer, ForeignKey('standup.id'), nullable=False)
+    standup = relationship("Standup")
+    day = Column(Date, nullable=False)
+    expected_members = Column(Integer, nullable=False, default=0)
+    submitted = Column(Integer, nullable=False, default=0)
+    late = Column(Integer, nullable=False, default=0)
+    first_submitted_at = Column(db.DateTime, nullable=True)
+    last_submitted_at = Column(db.DateTime, nullable=True)
+    published_at = Column(db.DateTime, nullable=True)
+
+
+# Digest of a standup's submissions over a week or a month: the team's
+# digest (no user) and one per member who submitted (see app.digests)
+class Digest(db.Model):
+    __tablename__ = "digest"
+    __table_args__ = (
+        Index("ix_digest_standup_id_period_start_date", "standup_id",
+              "period", "start_date"),
+        {'extend_existing': True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    standup_id = Column(Integer, ForeignKey('standup.id'), nullable=False)
+    standup = relationship("Standup")
+    user_id = Column(Integer, ForeignKey('user.id'), nullable=True)
+    user = relationship("User")
+    # "week" or "month"
+    period = Column(String(10), nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    submissions = Column(Integer, nullable=False, default=0)
+    # JSON list of the Block Kit blocks of the digest
+    blocks = Column(String(), nullable=False)
+    created_at = Column(db.DateTime, default=datetime.utcnow, nullable=True)
+    posted_at = Column(db.DateTime, nullable=True)
+
+
+# Version of a kind of resource (standups, teams, users), bumped by every
+# flush that writes one (see app.versioning). A resource's version is the sum
+# over its shards, writes to different rows bump different shards.
+class ResourceVersion(db.Model):
+    __tablename__ = "resource_version"
+    __table_args__ = {'extend_existing': True}
+
+    resource = Column(String(30), primary_key=True)
+    shard = Column(Integer, primary_key=True, autoincrement=False)
+    version = Column(Integer, nullable=False, default=0)
+
+
 class Auth(db.Model):
     __tablename__ = "auth"
     __table_args__ = {'extend_existing': True}
@@ -0,0 +1,166 @@
+import re
+import logging
+from datetime import date
+from typing import List, Tuple, Optional
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import text
+
+import app.search as search
+from app.models import db
+from app.constants import SUBMISSION_PARTITIONS_AHEAD
+
+logger = logging.getLogger(__name__)
+
+partitions_cli = AppGroup(
+    "partitions",
+    help="Manage the monthly partitions of the submission table (Postgres).")
+
+# On Postgres with SUBMISSION_PARTITIONING=1 the migrations range-partition
+# the submission table by `day`: one partition per month, named after it,
+# and a default partition for days without one.
+PARENT_TABLE = "submission"
+DEFAULT_PARTITION = "submission_default"
+_PARTITION_NAME = re.compile(r"^submission_y(\d{4})m(\d{2})$")
+
+# Advisory lock serializing partition DDL across workers
+_DDL_LOCK_ID = 7306122
+
+_partitioned: Optional[bool] = None
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_y{month.year}m{month.month:02d}"
+
+
+# Whether the submission table is partitioned. Looked up once per process.
+def is_partitioned() -> bool:
+    global _partitioned
+    if _partitioned is None:
+        _partitioned = db.engine.dialect.name == "postgresql" and \
+            bool(db.session.execute(text(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+                "JOIN pg_class c ON c.oid = p.partrelid "
+                "WHERE c.relname = :table AND pg_table_is_visible(c.oid))"
+            ), {"table": PARENT_TABLE}).scalar())
+    return _partitioned
+
+
+# Monthly partitions of the submission table, oldest first
+def partitions() -> List[Tuple[str, date]]:
+    rows = db.session.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table"), {"table": PARENT_TABLE})
+
+    result = []
+    for (name,) in rows:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            result.append((name, date(int(match[1]), int(match[2]), 1)))
+    return sorted(result, key=lambda partition: partition[1])
+
+
+def _lock() -> None:
+    db.session.execute(text("SELECT pg_advisory_xact_lock(:id)"),
+                       {"id": _DDL_LOCK_ID})
+
+
+# Create the partition of `month`. Submissions of the month that went to the
+# default partition meanwhile are moved to it. Does not commit.
+def _create_partition(month: date) -> str:
+    name = partition_name(month)
+    start, end = month.isoformat(), _add_months(month, 1).isoformat()
+
+    db.session.execute(text(
+        f"CREATE TABLE {name} (LIKE {PARENT_TABLE} "
+        "INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    db.session.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+        "WHERE day >= :start AND day < :end RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"),
+        {"start": start, "end": end})
+    db.session.execute(text(
+        f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{start}') TO ('{end}')"))
+    return name
+
+
+# Create the missing partitions from this month to `months_ahead` months
+# ahead. Returns the names of the created partitions.
+def ensure_partitions(months_ahead: int = SUBMISSION_PARTITIONS_AHEAD
+                      ) -> List[str]:
+    _lock()
+    existing = {month for _, month in partitions()}
+    this_month = date.today().replace(day=1)
+
+    created = []
+    for offset in range(months_ahead + 1):
+        month = _add_months(this_month, offset)
+        if month not in existing:
+            created.append(_create_partition(month))
+    db.session.commit()
+
+    if created:
+        logger.info("partitions: created %s", ", ".join(created))
+    return created
+
+
+# Drop the partitions of the months before the month of `cutoff`, with their
+# search index entries. Returns the dropped partitions, their month and their
+# row count.
+def drop_partitions_before(cutoff: date, dry_run: bool = False
+                           ) -> List[Tuple[str, date, int]]:
+    dropped = []
+    for name, month in partitions():
+        if _add_months(month, 1) > cutoff:
+            break
+
+        rows = db.session.execute(
+            text(f"SELECT COUNT(*) FROM {name}")).scalar()
+        if not dry_run:
+            _lock()
+            db.session.execute(text(
+                f"DELETE FROM {search.INDEX_TABLE} WHERE submission_id IN "
+                f"(SELECT id FROM {name})"))
+            db.session.execute(text(
+                f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+            db.session.execute(text(f"DROP TABLE {name}"))
+            db.session.commit()
+            logger.info("partitions: dropped %s (%d submissions)", name, rows)
+        dropped.append((name, month, rows))
+    return dropped
+
+
+@partitions_cli.command("create")
+@click.option("--months-ahead", default=SUBMISSION_PARTITIONS_AHEAD,
+              show_default=True,
+              help="Create partitions up to this many months ahead.")
+def create_command(months_ahead):
+    """Create the missing partitions of the coming months."""
+    if not is_partitioned():
+        raise click.ClickException("The submission table is not partitioned")
+    created = ensure_partitions(months_ahead)
+    click.echo(f"Created {len(created)} partitions"
+               + (f": {', '.join(created)}" if created else ""))
+
+
+@partitions_cli.command("list")
+def list_command():
+    """List the partitions of the submission table."""
+    if not is_partitioned():
+        raise click.ClickException("The submission table is not partitioned")
+    for name, _ in partitions():
+        rows = db.session.execute(
+            text(f"SELECT COUNT(*) FROM {name}")).scalar()
+        click.echo(f"{name}\t{rows}")
+    rows = db.session.execute(
+        text(f"SELECT COUNT(*) FROM {DEFAULT_PARTITION}")).scalar()
+    click.echo(f"{DEFAULT_PARTITION}\t{rows}")
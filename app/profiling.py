@@ -0,0 +1,251 @@
+import os
+import re
+import sys
+import json
+import fcntl
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from flask import g, request
+
+from app.constants import PROFILE_DIR, PROFILE_SAMPLE_INTERVAL
+
+PROFILE_MODES = ("cprofile", "sampling")
+
+# Profiles are armed through a control file in PROFILE_DIR so that the switch
+# reaches every worker, not just the one that served the admin request.
+CONTROL_FILE = os.path.join(PROFILE_DIR, "armed.json")
+
+_armed: Dict[str, Any] = {}
+_armed_mtime: Optional[float] = None
+
+# tracemalloc traces the whole process, so it is started once for the window
+# in which routes are armed with `trace_malloc` and stopped when the last of
+# them is used up or disarmed, not toggled around every profiled request.
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_started = False
+_tracemalloc_requests = 0
+
+
+@contextmanager
+def _locked_control():
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(CONTROL_FILE, "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            content = f.read()
+            armed = json.loads(content) if content else {}
+            yield armed
+            f.seek(0)
+            f.truncate()
+            json.dump(armed, f)
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# Profile the next `count` requests to `route` (a URL rule, e.g.
+# "/slack/submit_standup/")
+def arm(route: str, count: int, mode: str = "cprofile",
+        trace_malloc: bool = False) -> Dict[str, Any]:
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"mode must be one of {', '.join(PROFILE_MODES)}")
+
+    with _locked_control() as armed:
+        armed[route] = {"remaining": count, "mode": mode,
+                        "tracemalloc": trace_malloc,
+                        "armed_at": datetime.utcnow().isoformat()}
+        return dict(armed)
+
+
+def disarm(route: str = None) -> Dict[str, Any]:
+    with _locked_control() as armed:
+        if route:
+            armed.pop(route, None)
+        else:
+            armed.clear()
+        return dict(armed)
+
+
+def armed_routes() -> Dict[str, Any]:
+    if not os.path.exists(CONTROL_FILE):
+        return {}
+    with _locked_control() as armed:
+        return dict(armed)
+
+
+# Profiles captured so far, newest first
+def captures() -> List[Dict[str, Any]]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+
+    files = [name for name in os.listdir(PROFILE_DIR) if name != "armed.json"]
+    files.sort(key=lambda name: os.path.getmtime(
+        os.path.join(PROFILE_DIR, name)), reverse=True)
+    return [{"file": os.path.join(PROFILE_DIR, name),
+             "size": os.path.getsize(os.path.join(PROFILE_DIR, name))}
+            for name in files]
+
+
+# Claim one profiling slot for `route`. The control file is only locked when
+# it says that the route is armed, so unarmed requests pay for one stat().
+def _claim(route: str) -> Optional[Dict[str, Any]]:
+    global _armed, _armed_mtime
+
+    try:
+        mtime = os.stat(CONTROL_FILE).st_mtime
+    except OSError:
+        return None
+
+    if mtime != _armed_mtime:
+        try:
+            with open(CONTROL_FILE) as f:
+                content = f.read()
+            _armed = json.loads(content) if content else {}
+        except ValueError:
+            # Caught a concurrent write, retry on the next request
+            return None
+        _armed_mtime = mtime
+        _stop_tracemalloc()
+
+    if route not in _armed:
+        return None
+
+    with _locked_control() as armed:
+        options = armed.get(route)
+        if not options:
+            return None
+        options["remaining"] -= 1
+        if options["remaining"] <= 0:
+            armed.pop(route)
+        return options
+
+
+def _start_tracemalloc() -> None:
+    global _tracemalloc_started, _tracemalloc_requests
+
+    with _tracemalloc_lock:
+        _tracemalloc_requests += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            _tracemalloc_started = True
+
+
+# Stops tracing once no profiled request needs it and no armed route asks
+# for it any more. Tracing started by someone else (e.g. PYTHONTRACEMALLOC)
+# is left alone.
+def _stop_tracemalloc(finished: bool = False,
+                      window_over: Optional[str] = None) -> None:
+    global _tracemalloc_started, _tracemalloc_requests
+
+    with _tracemalloc_lock:
+        if finished:
+            _tracemalloc_requests -= 1
+        if not _tracemalloc_started or _tracemalloc_requests:
+            return
+        if any(options.get("tracemalloc") for route, options in _armed.items()
+               if route != window_over):
+            return
+        tracemalloc.stop()
+        _tracemalloc_started = False
+
+
+# Samples the stack of one thread at a fixed interval and aggregates the
+# samples as collapsed stacks (the input format of flamegraph.pl/speedscope).
+class SamplingProfiler:
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name="sampling-profiler")
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} "
+                             f"({os.path.basename(code.co_filename)}:"
+                             f"{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def dump(self, path: str) -> None:
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _capture_path(route: str, suffix: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    return os.path.join(PROFILE_DIR, f"{slug}-{stamp}-{os.getpid()}.{suffix}")
+
+
+def _before_request():
+    if request.url_rule is None:
+        return
+    options = _claim(request.url_rule.rule)
+    if not options:
+        return
+
+    profile: Dict[str, Any] = {"options": options,
+                               "route": request.url_rule.rule}
+    if options.get("tracemalloc"):
+        _start_tracemalloc()
+
+    if options["mode"] == "sampling":
+        profiler = SamplingProfiler(threading.get_ident(),
+                                    PROFILE_SAMPLE_INTERVAL)
+    else:
+        profiler = cProfile.Profile()
+    profile["profiler"] = profiler
+    g.profile = profile
+
+    if isinstance(profiler, SamplingProfiler):
+        profiler.start()
+    else:
+        profiler.enable()
+
+
+def _teardown_request(exc):
+    profile = g.pop("profile", None)
+    if profile is None:
+        return
+
+    profiler = profile["profiler"]
+    route = profile["route"]
+    if isinstance(profiler, SamplingProfiler):
+        profiler.stop()
+        profiler.dump(_capture_path(route, "folded"))
+    else:
+        profiler.disable()
+        profiler.dump_stats(_capture_path(route, "prof"))
+
+    options = profile["options"]
+    if options.get("tracemalloc"):
+        tracemalloc.take_snapshot().dump(_capture_path(route, "tracemalloc"))
+        _stop_tracemalloc(finished=True,
+                          window_over=route if options["remaining"] <= 0
+                          else None)
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.teardown_request(_teardown_request)
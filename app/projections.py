@@ -0,0 +1,107 @@
+from datetime import datetime
+from itertools import groupby
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import select, or_
+
+import app.utils as utils
+import app.forms as forms
+import app.serialization as serialization
+from app.models import Standup, Submission, User, Team, association_table, \
+    standup_questions, db
+
+# Read paths of the list APIs. They select only the columns of the response
+# as plain rows and build the response dicts from them, without loading ORM
+# objects into the session. The responses are the same as those built from
+# the ORM objects.
+
+_standup = Standup.__table__
+_user = User.__table__
+_submission = Submission.__table__
+_team = Team.__table__
+
+
+def _standup_dict(row) -> Dict[str, Any]:
+    standup = dict(row)
+    standup["questions"] = serialization.loads(standup["questions"]) \
+        if standup["questions"] is not None \
+        else standup_questions(standup["standup_blocks"])
+    return standup
+
+
+# Standups as returned by the standup APIs, optionally only those with
+# `is_active`
+def standups(is_active: Optional[bool] = None) -> List[Dict[str, Any]]:
+    query = select([_standup])
+    if is_active is not None:
+        query = query.where(_standup.c.is_active == is_active)
+    return [_standup_dict(row) for row in db.session.execute(query)]
+
+
+def standup(standup_id: int) -> Optional[Dict[str, Any]]:
+    row = db.session.execute(
+        select([_standup]).where(_standup.c.id == standup_id)).first()
+    return _standup_dict(row) if row else None
+
+
+# Users as returned by the user APIs, optionally only those whose username
+# or display name contains `name`. The team names of all users are fetched
+# with one more query.
+def users(name: Optional[str] = None) -> List[Dict[str, Any]]:
+    query = select([_user.c.id, _user.c.username, _user.c.display_name,
+                    _user.c.tz, _user.c.is_active, _user.c.user_id])
+    if name:
+        query = query.where(or_(_user.c.username.contains(name),
+                                _user.c.display_name.contains(name)))
+    rows = db.session.execute(query).fetchall()
+    if not rows:
+        return []
+
+    memberships = (
+        select([association_table.c.user_id, _team.c.name])
+        .select_from(association_table.join(
+            _team, _team.c.id == association_table.c.team_id))
+        .order_by(association_table.c.user_id)
+    )
+    if name:
+        memberships = memberships.where(
+            association_table.c.user_id.in_([row.id for row in rows]))
+    teams = {user_id: [team for _, team in user_teams] for user_id, user_teams
+             in groupby(db.session.execute(memberships), key=lambda r: r[0])}
+
+    return [{**dict(row), "team": teams.get(row.id, [])} for row in rows]
+
+
+# Submissions as returned by the submission APIs, latest first, at most
+# `limit` of them. `user_id` is the id of the user in slate.
+def submissions(start_date: Optional[datetime] = None,
+                end_date: Optional[datetime] = None,
+                user_id: Optional[int] = None,
+                limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    query = (
+        select([_submission.c.created_at, _submission.c.id,
+                _submission.c.user_id, _user.c.username,
+                _submission.c.standup_id, _submission.c.form_version,
+                _submission.c.standup_submission])
+        .select_from(_submission.outerjoin(
+            _user, _user.c.id == _submission.c.user_id))
+        .order_by(_submission.c.created_at.desc())
+        .limit(limit)
+    )
+    if start_date:
+        query = query.where(_submission.c.created_at >= start_date)
+    if end_date:
+        query = query.where(_submission.c.created_at <= end_date)
+    if user_id is not None:
+        query = query.where(_submission.c.user_id == user_id)
+
+    rows = db.session.execute(query).fetchall()
+    schemas = forms.schemas((row.standup_id, row.form_version) for row in rows)
+    return [dict(created_at=row.created_at,
+                 submission_id=row.id,
+                 user_id=row.user_id,
+                 username=row.username,
+                 submission=utils.submission_answers(
+                     row.standup_submission,
+                     schemas.get((row.standup_id, row.form_version))))
+            for row in rows]
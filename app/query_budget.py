@@ -0,0 +1,171 @@
+import os
+import sys
+import logging
+import contextvars
+from contextvars import Token
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from typing import List, Tuple, Optional
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.constants import QUERY_BUDGET_MODE, QUERY_BUDGET_DEFAULT
+
+logger = logging.getLogger(__name__)
+
+# Query budgets, for development and tests. A budget is the number of SQL
+# statements a route or handler may execute. In QUERY_BUDGET_MODE "log" an
+# exceeded budget is logged, in "raise" it raises QueryBudgetExceeded, and
+# "off" (the default) doesn't count at all.
+MODES = ("off", "log", "raise")
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_THIS_FILE = os.path.abspath(__file__)
+
+# Budget scopes of the current request or handler, innermost last
+_scopes: contextvars.ContextVar = contextvars.ContextVar(
+    "query_budget_scopes", default=())
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class Scope:
+    def __init__(self, name: str, budget: int, mode: str):
+        self.name = name
+        self.budget = budget
+        self.mode = mode
+        # (call site, statement) of every statement executed in the scope
+        self.statements: List[Tuple[str, str]] = []
+
+    # Statements grouped by the line of the app that executed them, the
+    # most frequent first: [(call site, count, first statement)]
+    def by_call_site(self) -> List[Tuple[str, int, str]]:
+        sites: "OrderedDict[str, List]" = OrderedDict()
+        for site, statement in self.statements:
+            sites.setdefault(site, [0, statement])[0] += 1
+        return sorted(((site, count, statement) for site, (count, statement)
+                       in sites.items()), key=lambda site: -site[1])
+
+    def report(self) -> str:
+        lines = [f"{self.name} executed {len(self.statements)} SQL statements,"
+                 f" budget {self.budget}:"]
+        for site, count, statement in self.by_call_site():
+            statement = " ".join(statement.split())
+            lines.append(f"  {count:>4}x {site}: {statement[:200]}")
+        return "\n".join(lines)
+
+    def check(self) -> None:
+        if len(self.statements) <= self.budget:
+            return
+        if self.mode == "raise":
+            raise QueryBudgetExceeded(self.report())
+        logger.warning(self.report())
+
+
+# Innermost frame of the app (outside of this module) on the stack
+def _call_site() -> str:
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_DIR) and filename != _THIS_FILE:
+            return (f"{os.path.relpath(filename, os.path.dirname(_APP_DIR))}:"
+                    f"{frame.f_lineno} in {frame.f_code.co_name}")
+        frame = frame.f_back
+    return "unknown"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    scopes = _scopes.get()
+    if not scopes:
+        return
+    site = _call_site()
+    for current in scopes:
+        current.statements.append((site, statement))
+
+
+def _listen() -> None:
+    if not event.contains(Engine, "before_cursor_execute",
+                          _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+
+
+def _push(name: str, budget: int, mode: str) -> Tuple[Scope, Token]:
+    _listen()
+    current = Scope(name, budget, mode)
+    return current, _scopes.set(_scopes.get() + (current,))
+
+
+# Count the statements executed in the block against `budget`. `mode`
+# defaults to QUERY_BUDGET_MODE, tests can pass "raise" to check a budget
+# regardless of the environment.
+@contextmanager
+def scope(name: str, budget: int, mode: str = None):
+    mode = mode or QUERY_BUDGET_MODE
+    if mode == "off":
+        yield None
+        return
+
+    current, token = _push(name, budget, mode)
+    try:
+        yield current
+    finally:
+        _scopes.reset(token)
+    current.check()
+
+
+# Declare the query budget of a route or handler. A route's budget replaces
+# QUERY_BUDGET_DEFAULT.
+def budget(max_queries: int):
+    def decorator(func):
+        name = f"{func.__module__.split('.')[-1]}.{func.__name__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with scope(name, max_queries):
+                return func(*args, **kwargs)
+
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
+
+
+def _has_budget(endpoint: Optional[str], app) -> bool:
+    view = app.view_functions.get(endpoint)
+    return view is not None and hasattr(view, "query_budget")
+
+
+# Requests to routes without a budget of their own get QUERY_BUDGET_DEFAULT,
+# if set
+def init_app(app):
+    if QUERY_BUDGET_MODE not in MODES:
+        raise ValueError(
+            f"QUERY_BUDGET_MODE must be one of {', '.join(MODES)}")
+    if QUERY_BUDGET_MODE == "off" or not QUERY_BUDGET_DEFAULT:
+        return
+
+    def _before_request():
+        if not _has_budget(request.endpoint, app):
+            g.query_budget = _push(f"{request.method} {request.path}",
+                                   QUERY_BUDGET_DEFAULT, QUERY_BUDGET_MODE)
+
+    def _after_request(response):
+        if "query_budget" in g:
+            current, token = g.pop("query_budget")
+            _scopes.reset(token)
+            current.check()
+        return response
+
+    # The request failed before after_request
+    def _teardown_request(exc):
+        if "query_budget" in g:
+            _scopes.reset(g.pop("query_budget")[1])
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
@@ -0,0 +1,94 @@
+import copy
+import logging
+from itertools import groupby
+from typing import Dict, Any, List, Tuple
+
+from slack_sdk.errors import SlackApiError
+from sqlalchemy import and_
+from sqlalchemy.orm import contains_eager
+
+import app.utils as utils
+import app.workspaces as workspaces
+from app import client
+from app.slack import Throttle
+from app.models import User, Team, Standup, Submission, Workspace, \
+    association_table, db, standup_day
+from app.constants import NOTIFICATION_BLOCKS, REMINDER_SEND_RATE
+
+logger = logging.getLogger(__name__)
+
+
+# Teams of every active user whose standup the user hasn't submitted today,
+# in one query: (user, [teams]) ordered by user
+def pending_standups() -> List[Tuple[User, List[Team]]]:
+    rows = (
+        db.session.query(User, Team)
+        .join(association_table, association_table.c.user_id == User.id)
+        .join(Team, Team.id == association_table.c.team_id)
+        .join(Standup, Standup.team_id == Team.id)
+        .outerjoin(Submission, and_(Submission.user_id == User.id,
+                                    Submission.standup_id == Standup.id,
+                                    Submission.day == standup_day()))
+        .filter(User.is_active, Standup.is_active, Submission.id.is_(None))
+        .options(contains_eager(Team.standup))
+        .order_by(User.workspace_id, User.id, Team.name)
+    )
+    return [(user, [team for _, team in user_rows])
+            for user, user_rows in groupby(rows, key=lambda row: row[0])]
+
+
+# One DM for all the pending standups of a user. A single standup gets the
+# "Open Dialog" button, several are listed with their slash commands.
+def reminder_message(teams: List[Team]) -> Tuple[str, List[Dict[str, Any]]]:
+    if len(teams) == 1:
+        team = teams[0]
+        text = (f"The standup will be reported in "
+                f"{utils.time_left(team.standup.publish_time)}.\n"
+                f"You can click on the button below or use command: "
+                f"`/standup {team.name}`")
+        blocks = copy.deepcopy(NOTIFICATION_BLOCKS)
+        blocks[1]["block_id"] = f"open_standup%{team.name}"
+        blocks.insert(1, {"type": "section",
+                          "text": {"type": "mrkdwn", "text": text}})
+        return text, blocks
+
+    lines = [f"• `/standup {team.name}`, reported in "
+             f"{utils.time_left(team.standup.publish_time).strip()}"
+             for team in teams]
+    text = "Please submit your standups using:\n" + "\n".join(lines)
+    blocks = [copy.deepcopy(NOTIFICATION_BLOCKS[0]),
+              {"type": "section", "text": {"type": "mrkdwn", "text": text}}]
+    return text, blocks
+
+
+# Remind every active user of all their pending standups with one DM per
+# user. A dry run only returns the plan.
+def remind_all(dry_run: bool = False) -> Dict[str, Any]:
+    pending = pending_standups()
+    plan = [{"user_id": user.user_id, "username": user.username,
+             "teams": [team.name for team in teams]}
+            for user, teams in pending]
+    result = {"dry_run": dry_run, "users": len(plan), "reminders": plan,
+              "sent": 0, "failed": []}
+    if dry_run:
+        return result
+
+    throttle = Throttle(REMINDER_SEND_RATE)
+    workspace_ids = {user.workspace_id for user, _ in pending} - {None}
+    workspaces_by_id = {workspace.id: workspace for workspace in
+                        Workspace.query.filter(Workspace.id.in_(workspace_ids))
+                        } if workspace_ids else {}
+
+    for user, teams in pending:
+        workspaces.activate(workspaces_by_id.get(user.workspace_id))
+        text, blocks = reminder_message(teams)
+        try:
+            throttle.call(client.chat_postMessage, channel=user.user_id,
+                          text=text, blocks=blocks)
+            result["sent"] += 1
+        except SlackApiError as e:
+            logger.warning("reminders: failed to remind %s: %s",
+                           user.user_id, e.response.get("error"))
+            result["failed"].append(user.user_id)
+    workspaces.activate(None)
+    return result
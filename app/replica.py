@@ -0,0 +1,138 @@
+import time
+import logging
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, request, has_request_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import orm, event, text
+from sqlalchemy.sql import Select
+
+from app import metrics
+from app.constants import (
+    SQLALCHEMY_REPLICA_URI,
+    REPLICA_MAX_LAG,
+    REPLICA_LAG_CHECK_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+# Bind key of the read replica in SQLALCHEMY_BINDS
+REPLICA_BIND = "replica"
+
+# Last measured replication lag, shared by the requests of a worker
+_lag = {"checked_at": None, "seconds": 0.0}
+
+
+# Session that sends the reads of read-only requests (see `read_only`) to
+# the replica. Everything else goes to the primary: writes, locking reads,
+# raw SQL, and all reads of a session after it wrote, so that a request
+# reads its own writes.
+class RoutingSession(SignallingSession):
+    def __init__(self, db, **options):
+        self.db = db
+        self.wrote = False
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None):
+        if self._use_replica(clause):
+            return self.db.get_engine(self.app, bind=REPLICA_BIND)
+        if clause is not None and not isinstance(clause, Select):
+            self.wrote = True
+        return super().get_bind(mapper, clause)
+
+    def _use_replica(self, clause) -> bool:
+        return (
+            has_request_context() and g.get("db_route") == REPLICA_BIND and
+            not self.wrote and not self._flushing and
+            isinstance(clause, Select) and clause._for_update_arg is None and
+            is_fresh()
+        )
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _after_flush(session, flush_context):
+    session.wrote = True
+
+
+def enabled() -> bool:
+    return bool(SQLALCHEMY_REPLICA_URI)
+
+
+# Replication lag of the replica in seconds. Postgres standbys report the
+# age of the last replayed transaction, zero when they are caught up. Other
+# databases (e.g. a copy of a SQLite file in development) can't tell and
+# are assumed to be current.
+def measure_lag(engine) -> float:
+    if engine.dialect.name != "postgresql":
+        return 0.0
+    with engine.connect() as connection:
+        lag = connection.execute(text(
+            "SELECT CASE WHEN NOT pg_is_in_recovery() "
+            "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) "
+            "END")).scalar()
+    return float(lag or 0)
+
+
+# Whether the replica is within the staleness bound (REPLICA_MAX_LAG). The
+# lag is measured at most every REPLICA_LAG_CHECK_INTERVAL seconds per
+# worker. A replica whose lag can't be measured is considered stale.
+def is_fresh() -> bool:
+    now = time.monotonic()
+    if _lag["checked_at"] is None or \
+            now - _lag["checked_at"] >= REPLICA_LAG_CHECK_INTERVAL:
+        from app import db
+        try:
+            _lag["seconds"] = measure_lag(db.get_engine(bind=REPLICA_BIND))
+        except Exception:
+            logger.exception("replica: failed to measure the replication lag")
+            _lag["seconds"] = float("inf")
+        _lag["checked_at"] = now
+        metrics.observe_replica_lag(_lag["seconds"])
+    return _lag["seconds"] <= REPLICA_MAX_LAG
+
+
+# Serve the reads of a read-only endpoint from the replica. Clients that
+# need to read their own writes from another request send
+# `X-Slate-Consistency: strong` to read from the primary.
+def read_only(func):
+    @wraps(func)
+    def route_to_replica(*args, **kwargs):
+        if enabled() and \
+                request.headers.get("X-Slate-Consistency") != "strong":
+            g.db_route = REPLICA_BIND
+        return func(*args, **kwargs)
+
+    return route_to_replica
+
+
+# Whether the reads of the current request are sent to the replica
+def is_routed() -> bool:
+    return has_request_context() and g.get("db_route") == REPLICA_BIND
+
+
+# Send the reads of the block to the primary, e.g. reads that decide what a
+# client has already seen
+@contextmanager
+def primary():
+    route = g.pop("db_route", None) if has_request_context() else None
+    try:
+        yield
+    finally:
+        if route is not None:
+            g.db_route = route
+
+
+# Pool and query metrics of the primary and replica engines
+def init_app(app, db) -> None:
+    with app.app_context():
+        metrics.instrument_engine("primary", db.get_engine(app))
+        if enabled():
+            metrics.instrument_engine(
+                "replica", db.get_engine(app, bind=REPLICA_BIND))
@@ -0,0 +1,228 @@
+import time
+import uuid
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, Callable, Optional
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import and_
+
+import app.search as search
+import app.partitions as partitions
+import app.serialization as serialization
+from app import shared_cache
+from app.models import Submission, Standup, StandupThread, db
+from app.constants import (
+    RETENTION_DAYS,
+    RETENTION_BATCH_SIZE,
+    RETENTION_BATCH_SLEEP,
+)
+
+logger = logging.getLogger(__name__)
+
+retention_cli = AppGroup("retention", help="Purge old standup submissions.")
+
+# Only one retention run at a time across all workers. The lock and the
+# progress of the run are kept in the shared cache; the lock expires if its
+# worker dies without releasing it.
+_LOCK_KEY = "retention:lock"
+_STATUS_KEY = "retention:status"
+_LOCK_TTL = 3600
+
+
+# Midnight of the day `days` days before today
+def retention_cutoff(days: int) -> datetime:
+    today = datetime(
+        datetime.today().year, datetime.today().month, datetime.today().day
+    )
+    return today - timedelta(days=days)
+
+
+# Delete rows matched by `query` in batches of `batch_size` primary keys.
+# Every batch runs in its own short transaction so that live traffic never
+# waits on a long running lock.
+def _delete_in_batches(query, model, batch_size: int, sleep: float,
+                       progress: Dict[str, Any], counter: str,
+                       dry_run: bool = False,
+                       report: Callable[[Dict[str, Any]], None] = None) -> int:
+    deleted = 0
+    last_id = 0
+
+    while True:
+        ids = [
+            row.id for row in query.with_entities(model.id)
+            .filter(model.id > last_id)
+            .order_by(model.id)
+            .limit(batch_size)
+        ]
+        if not ids:
+            break
+        last_id = ids[-1]
+
+        if not dry_run:
+            model.query.filter(model.id.in_(ids)).delete(
+                synchronize_session=False)
+            if model is Submission:
+                search.remove_submissions(ids)
+            db.session.commit()
+        else:
+            db.session.rollback()
+
+        deleted += len(ids)
+        progress[counter] += len(ids)
+        progress["batches"] += 1
+        logger.info("retention: %s %d %s", "would delete" if dry_run
+                    else "deleted", progress[counter], counter)
+        if report:
+            report(progress)
+
+        if len(ids) < batch_size:
+            break
+        if sleep:
+            time.sleep(sleep)
+
+    return deleted
+
+
+# Purge submissions older than `days` days and standup threads that no
+# longer belong to a standup. `report` is called with the progress after
+# every batch.
+def purge(days: int = RETENTION_DAYS,
+          batch_size: int = RETENTION_BATCH_SIZE,
+          sleep: float = RETENTION_BATCH_SLEEP,
+          dry_run: bool = False,
+          progress: Optional[Dict[str, Any]] = None,
+          report: Callable[[Dict[str, Any]], None] = None) -> Dict[str, Any]:
+    if days < 1 or batch_size < 1:
+        raise ValueError("days and batch_size must be at least 1")
+    progress = progress if progress is not None else {}
+    cutoff = retention_cutoff(days)
+
+    progress.update({
+        "state": "running",
+        "cutoff": cutoff,
+        "dry_run": dry_run,
+        "submissions": 0,
+        "partitions": 0,
+        "threads": 0,
+        "batches": 0,
+        "started_at": datetime.utcnow(),
+        "finished_at": None,
+    })
+
+    try:
+        submissions = Submission.query.filter(Submission.created_at < cutoff)
+        if partitions.is_partitioned():
+            # Whole months go by dropping their partition, the rest of the
+            # cutoff's month row by row. The day filter prunes partitions.
+            dropped = partitions.drop_partitions_before(cutoff.date(),
+                                                        dry_run)
+            for _, _, rows in dropped:
+                progress["submissions"] += rows
+                progress["partitions"] += 1
+            if not dry_run:
+                partitions.ensure_partitions()
+            submissions = submissions.filter(Submission.day < cutoff.date())
+            if dry_run and dropped:
+                # The partitions are still there, their rows are counted
+                first, last = dropped[0][1], dropped[-1][1]
+                submissions = submissions.filter(
+                    (Submission.day < first) | (Submission.day >= (
+                        last + timedelta(days=32)).replace(day=1)))
+        _delete_in_batches(submissions, Submission, batch_size, sleep,
+                           progress, "submissions", dry_run, report)
+
+        orphaned_threads = (
+            StandupThread.query
+            .outerjoin(Standup, StandupThread.standup_id == Standup.id)
+            .filter(Standup.id.is_(None))
+        )
+        _delete_in_batches(orphaned_threads, StandupThread, batch_size, sleep,
+                           progress, "threads", dry_run, report)
+
+        # Threads of days whose submissions are gone are orphaned as well
+        expired_threads = StandupThread.query.filter(
+            and_(StandupThread.created_at.isnot(None),
+                 StandupThread.created_at < cutoff))
+        _delete_in_batches(expired_threads, StandupThread, batch_size, sleep,
+                           progress, "threads", dry_run, report)
+
+        progress["state"] = "finished"
+    except Exception as e:
+        db.session.rollback()
+        progress["state"] = "failed"
+        progress["error"] = str(e)
+        logger.exception("retention: run failed")
+        raise
+    finally:
+        progress["finished_at"] = datetime.utcnow()
+
+    return progress
+
+
+# Status of the last (or current) retention run of any worker
+def job_status() -> Dict[str, Any]:
+    status = shared_cache.get(_STATUS_KEY)
+    return serialization.loads(status) if status else {"state": "idle"}
+
+
+def _save_status(progress: Dict[str, Any]) -> None:
+    shared_cache.set(_STATUS_KEY, serialization.dumps(progress))
+
+
+# Run the purge on a background thread. Returns False if a run is already in
+# progress in any worker.
+def start_background_purge(**kwargs) -> bool:
+    token = uuid.uuid4().hex
+    if not shared_cache.add(_LOCK_KEY, token, ttl=_LOCK_TTL):
+        return False
+    _save_status({"state": "starting"})
+
+    app = current_app._get_current_object()
+
+    # Every batch extends the lock of a long run
+    def report(progress):
+        shared_cache.set(_LOCK_KEY, token, ttl=_LOCK_TTL)
+        _save_status(progress)
+
+    def run():
+        progress: Dict[str, Any] = {}
+        try:
+            with app.app_context():
+                purge(progress=progress, report=report, **kwargs)
+        except Exception:
+            pass
+        finally:
+            _save_status(progress)
+            lock = shared_cache.get(_LOCK_KEY)
+            if lock in (token, token.encode()):
+                shared_cache.delete(_LOCK_KEY)
+
+    thread = threading.Thread(target=run, name="retention", daemon=True)
+    thread.start()
+    return True
+
+
+@retention_cli.command("run")
+@click.option("--days", default=RETENTION_DAYS, show_default=True,
+              help="Delete submissions older than this many days.")
+@click.option("--batch-size", default=RETENTION_BATCH_SIZE, show_default=True,
+              help="Rows deleted per transaction.")
+@click.option("--sleep", default=RETENTION_BATCH_SLEEP, show_default=True,
+              help="Seconds to pause between batches.")
+@click.option("--dry-run", is_flag=True,
+              help="Only count the rows that would be deleted.")
+def run_command(days, batch_size, sleep, dry_run):
+    """Purge old submissions and orphaned standup threads."""
+    logging.basicConfig(level=logging.INFO)
+    result = purge(days=days, batch_size=batch_size, sleep=sleep,
+                   dry_run=dry_run)
+    click.echo(f"{'Would delete' if dry_run else 'Deleted'} "
+               f"{result['submissions']} submissions and "
+               f"{result['threads']} standup threads older than "
+               f"{result['cutoff']:%Y-%m-%d}"
+               + (f" ({result['partitions']} monthly partitions dropped)"
+                  if result["partitions"] else ""))
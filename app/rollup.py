@@ -0,0 +1,205 @@
+import logging
+from datetime import datetime, date, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import and_, func, case
+from sqlalchemy.exc import IntegrityError
+
+from app.models import Submission, Standup, StandupDailyStats, Team, User, \
+    association_table, db, local_time, standup_day
+
+logger = logging.getLogger(__name__)
+
+rollup_cli = AppGroup("rollup", help="Manage the daily participation rollup.")
+
+
+# Active members of the team of a standup
+def expected_members(standup: Standup) -> int:
+    return (
+        db.session.query(func.count(User.id))
+        .join(association_table, association_table.c.user_id == User.id)
+        .filter(association_table.c.team_id == standup.team_id, User.is_active)
+        .scalar()
+    )
+
+
+# Whether a submission made at `submitted_at` (UTC) came after the publish
+# time, which is in the server's local clock like in utils.after_submission
+def is_late(standup: Standup, submitted_at: datetime) -> bool:
+    return bool(standup.publish_time) and \
+        local_time(submitted_at).time() > standup.publish_time
+
+
+# Stats row of a standup for a day, created if missing. Commits the new row.
+def _daily_stats(standup: Standup, day: date) -> StandupDailyStats:
+    query = StandupDailyStats.query.filter_by(standup_id=standup.id, day=day)
+    stats = query.first()
+    if stats:
+        return stats
+
+    stats = StandupDailyStats(standup_id=standup.id, day=day,
+                              expected_members=expected_members(standup),
+                              submitted=0, late=0)
+    db.session.add(stats)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Created concurrently by another request
+        db.session.rollback()
+        stats = query.one()
+    return stats
+
+
+# Count a new submission in the rollup of its day. The counters are updated
+# in SQL so that concurrent submissions don't overwrite each other.
+def record_submission(submission: Submission) -> None:
+    try:
+        standup = submission.standup
+        submitted_at = submission.created_at
+        stats = _daily_stats(standup, submission.day or
+                             standup_day(submitted_at))
+
+        StandupDailyStats.query.filter_by(id=stats.id).update({
+            StandupDailyStats.submitted: StandupDailyStats.submitted + 1,
+            StandupDailyStats.late: StandupDailyStats.late +
+            (1 if is_late(standup, submitted_at) else 0),
+            StandupDailyStats.first_submitted_at: func.coalesce(
+                StandupDailyStats.first_submitted_at, submitted_at),
+            StandupDailyStats.last_submitted_at: case(
+                [(StandupDailyStats.last_submitted_at > submitted_at,
+                  StandupDailyStats.last_submitted_at)],
+                else_=submitted_at),
+        }, synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        # Reporting must never break a submission
+        db.session.rollback()
+        logger.exception("Failed to record submission %s in the rollup",
+                         submission.id)
+
+
+# Record that the standup of `day` (today by default) was published to
+# `expected` members
+def record_publish(standup: Standup, expected: int,
+                   published_at: Optional[datetime] = None,
+                   day: Optional[date] = None) -> None:
+    published_at = published_at or datetime.utcnow()
+    try:
+        stats = _daily_stats(standup, day or standup_day(published_at))
+        stats.expected_members = expected
+        stats.published_at = published_at
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.exception("Failed to record publish of standup %s in the "
+                         "rollup", standup.id)
+
+
+# Recompute the rollup of [start, end] from the submissions. Days that have
+# no rollup row yet use the current team size as the expected members.
+def rebuild(start: date, end: date) -> int:
+    standups = {standup.id: standup for standup in Standup.query.all()}
+    stats: Dict[Tuple[int, date], Dict[str, Any]] = {}
+
+    rows = (
+        db.session.query(Submission.standup_id, Submission.day,
+                         Submission.created_at)
+        .filter(
+            and_(
+                Submission.standup_id.isnot(None),
+                Submission.day >= start,
+                Submission.day <= end,
+            )
+        )
+        .yield_per(1000)
+    )
+    for standup_id, submission_day, created_at in rows:
+        standup = standups.get(standup_id)
+        if standup is None:
+            continue
+        day = stats.setdefault((standup_id, submission_day), {
+            "submitted": 0, "late": 0,
+            "first_submitted_at": created_at, "last_submitted_at": created_at,
+        })
+        day["submitted"] += 1
+        day["late"] += is_late(standup, created_at)
+        day["first_submitted_at"] = min(day["first_submitted_at"], created_at)
+        day["last_submitted_at"] = max(day["last_submitted_at"], created_at)
+
+    existing = StandupDailyStats.query.filter(
+        StandupDailyStats.day >= start, StandupDailyStats.day <= end).all()
+    for row in existing:
+        counts = stats.pop((row.standup_id, row.day), None) or {
+            "submitted": 0, "late": 0,
+            "first_submitted_at": None, "last_submitted_at": None,
+        }
+        for key, value in counts.items():
+            setattr(row, key, value)
+
+    members: Dict[int, int] = {}
+    for (standup_id, day), counts in stats.items():
+        if standup_id not in members:
+            members[standup_id] = expected_members(standups[standup_id])
+        db.session.add(StandupDailyStats(standup_id=standup_id, day=day,
+                                         expected_members=members[standup_id],
+                                         **counts))
+
+    db.session.commit()
+    return len(existing) + len(stats)
+
+
+# Daily participation of every standup (or the standup of `team`) between
+# `start` and `end`, with totals per team
+def participation(start: date, end: date,
+                  team: str = None) -> Dict[str, Any]:
+    query = (
+        db.session.query(StandupDailyStats, Team.name)
+        .join(Standup, Standup.id == StandupDailyStats.standup_id)
+        .outerjoin(Team, Team.id == Standup.team_id)
+        .filter(StandupDailyStats.day >= start, StandupDailyStats.day <= end)
+    )
+    if team:
+        query = query.filter(Team.name == team)
+
+    days: List[Dict[str, Any]] = []
+    totals: Dict[str, Dict[str, int]] = {}
+    for stats, team_name in query.order_by(StandupDailyStats.day,
+                                           Team.name):
+        days.append({
+            "team": team_name,
+            "standup_id": stats.standup_id,
+            "day": stats.day,
+            "expected_members": stats.expected_members,
+            "submitted": stats.submitted,
+            "on_time": stats.submitted - stats.late,
+            "late": stats.late,
+            "first_submitted_at": stats.first_submitted_at,
+            "last_submitted_at": stats.last_submitted_at,
+            "published_at": stats.published_at,
+        })
+        total = totals.setdefault(team_name, {
+            "days": 0, "expected": 0, "submitted": 0, "late": 0})
+        total["days"] += 1
+        total["expected"] += stats.expected_members
+        total["submitted"] += stats.submitted
+        total["late"] += stats.late
+
+    for total in totals.values():
+        total["participation"] = round(
+            total["submitted"] / total["expected"], 4) \
+            if total["expected"] else None
+
+    return {"days": days, "teams": totals}
+
+
+@rollup_cli.command("rebuild")
+@click.option("--days", default=90, show_default=True,
+              help="Rebuild the rollup of this many past days.")
+def rebuild_command(days):
+    """Recompute the daily participation rollup from the submissions."""
+    end = standup_day()
+    start = end - timedelta(days=days)
+    count = rebuild(start, end)
+    click.echo(f"Rebuilt {count} daily rollup rows from {start} to {end}")
@@ -1,15 +1,32 @@
-import json
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from flask import request, make_response, jsonify
+from flask import request, make_response, jsonify, Response
 from flask import current_app as app
 from slack_sdk.errors import SlackApiError
-from sqlalchemy import and_
+from sqlalchemy import and_, func
+from sqlalchemy.orm import joinedload, selectinload
 
 import app.utils as utils
+import app.forms as forms
 import app.handlers as handlers
-from app import client, signature_verifier
-from app.models import Submission, Standup, User, Team, StandupThread, db
+import app.retention as retention
+import app.search as search
+import app.rollup as rollup
+import app.metrics as metrics
+import app.tracing as tracing
+import app.profiling as profiling
+import app.workspaces as workspaces
+import app.serialization as serialization
+import app.versioning as versioning
+import app.replica as replica
+import app.query_budget as query_budget
+import app.reminders as reminders
+import app.directory as directory
+import app.digests as digests
+import app.projections as projections
+from app import client, schema_head
+from app.models import Submission, Standup, User, Team, StandupThread, \
+    Workspace, Digest, db, standup_day
 from app.utils import authenticate
 from app.constants import (
     ALL,
@@ -17,7 +34,6 @@ from app.constants import (
     INACTIVE,
     BUTTON_TRIGGER,
     SLASH_COMMAND_TRIGGER,
-    BLOCK_SIZE,
     STANDUP_INFO_SECTION,
     POST_PUBLISH_STATS,
     NO_USER_SUBMIT_MESSAGE,
@@ -26,10 +42,8 @@ from app.constants import (
 
 # Callback for entrypoint trigger on Slack (slash command etc.)
 @app.route("/slack/standup-trigger/", methods=["POST", "GET"])
+@utils.slack_request
 def standup_trigger(payload: str = ""):
-    if not signature_verifier.is_valid_request(request.get_data(), request.headers):
-        return make_response("invalid request", 403)
-
     data = request.form
 
     handler_map = {
@@ -46,11 +60,10 @@ def standup_trigger(payload: str = ""):
 
 # Callback for form submission on Slack
 @app.route("/slack/submit_standup/", methods=["POST"])
+@utils.slack_request
 def standup_modal():
-    if not signature_verifier.is_valid_request(request.get_data(), request.headers):
-        return make_response("invalid request", 403)
-
-    payload = json.loads(request.form.get("payload"))
+    with tracing.span("json.parse"):
+        payload = utils.slack_payload()
 
     handler_map = {
         "open_standup": handlers.open_standup_view,
@@ -74,19 +87,40 @@ def standup_modal():
     return make_response("", 200)
 
 
-# Request to publish standup to a Slack channel
+# Team a publish or notify API is called for. Team names are unique per
+# workspace: when a name is used in several workspaces, the caller passes
+# Slack's team id of the workspace as `workspace`.
+def _find_team(team_name):
+    teams = workspaces.teams_named(team_name, request.args.get("workspace"))
+    if not teams:
+        return None, make_response(f'Team "{team_name}" does not exist', 404)
+    if len(teams) > 1:
+        return None, make_response(
+            f'Team "{team_name}" exists in several workspaces. Pass the Slack '
+            'team id of its workspace as `workspace`.', 400)
+    return teams[0], None
+
+
+# Request to publish standup to a Slack channel. Publishing is idempotent
+# per standup and day: a re-run reuses today's thread and only posts the
+# submissions that were not published yet.
 @app.route("/slack/publish_standup/<team_name>/", methods=["GET"])
 @authenticate
 def publish_standup(team_name):
 
-    try:
-        todays_datetime = datetime(
-            datetime.today().year, datetime.today().month, datetime.today().day
-        )
+    team, error = _find_team(team_name)
+    if error:
+        return error
+    workspaces.activate(team.workspace)
+
+    standup = team.standup
+    lock = utils.acquire_publish_lock(standup)
+    if lock is None:
+        return make_response(
+            f'Standup "{team_name}" is already being published', 409)
 
-        team = Team.query.filter_by(name=team_name).first()
-        if not team:
-            return make_response(f'Team "{team_name}" does not exist', 404)
+    try:
+        today = standup_day()
 
         # Get all active users for this team
         users = (
@@ -95,48 +129,82 @@ def publish_standup(team_name):
             .filter(Team.id == team.id, User.is_active)
         )
 
-        standup = Standup.query.filter(Standup.trigger == team_name).first()
         submissions = Submission.query.filter(
             and_(
-                Submission.created_at >= todays_datetime,
+                Submission.day == today,
                 Submission.user_id.in_([user.id for user in users]),
                 Submission.standup == standup,
             )
         )
+        pending = submissions.filter(Submission.published_at.is_(None)) \
+            .order_by(Submission.id).all()
 
         no_submission_users = utils.post_publish_stat(users)
-        message_response = client.chat_postMessage(
-            channel=team.standup.publish_channel,
-            text="Standup complete",
-            blocks=[STANDUP_INFO_SECTION] + utils.users_left_section(no_submission_users),
-        )
+        header_blocks = [STANDUP_INFO_SECTION] + \
+            utils.users_left_section(no_submission_users)
 
-        standup_thread = StandupThread(standup=standup,
-                                       standup_id=standup.id,
-                                       thread_id=message_response.get("ts"))
-        db.session.add(standup_thread)
-        db.session.commit()
-
-        blocks_chunk = utils.chunk_blocks(utils.build_standup(submissions, True),
-                                          BLOCK_SIZE)
-        for blocks in blocks_chunk:
-            client.chat_postMessage(
+        standup_thread = utils.todays_thread(standup)
+        is_first_publish = standup_thread is None
+        if is_first_publish:
+            message_response = client.chat_postMessage(
                 channel=team.standup.publish_channel,
                 text="Standup complete",
-                thread_ts=message_response.get("ts"),
-                blocks=blocks,
+                blocks=header_blocks,
             )
-        if POST_PUBLISH_STATS:
+
+            standup_thread = StandupThread(standup=standup,
+                                           standup_id=standup.id,
+                                           thread_id=message_response.get("ts"),
+                                           day=today)
+            db.session.add(standup_thread)
+            db.session.commit()
+        elif pending:
+            client.chat_update(channel=team.standup.publish_channel,
+                               ts=standup_thread.thread_id,
+                               blocks=header_blocks)
+
+        # Only the submissions this publish claims are posted, a late
+        # submission posting itself to the thread meanwhile keeps its own.
+        # The ones not posted after a failure are released so that a re-run
+        # resumes where this one stopped.
+        published_at = datetime.utcnow()
+        with utils.keep_loaded():
+            claimed = utils.claim_submissions(
+                [submission.id for submission in pending], published_at)
+        pending = [submission for submission in pending
+                   if submission.id in claimed]
+        groups = [utils.submission_blocks(submission) for submission in pending]
+        published = 0
+        try:
+            for blocks, completed in utils.pack_blocks(groups):
+                client.chat_postMessage(
+                    channel=team.standup.publish_channel,
+                    text="Standup complete",
+                    thread_ts=standup_thread.thread_id,
+                    blocks=blocks,
+                )
+                published += completed
+        except Exception:
+            utils.unclaim_submissions(
+                [submission.id for submission in pending[published:]],
+                published_at)
+            raise
+        rollup.record_publish(standup, users.count(), day=today)
+
+        if POST_PUBLISH_STATS and is_first_publish:
             no_submit_users = utils.post_publish_stat(users)
             message = f"{NO_USER_SUBMIT_MESSAGE} {', '.join(no_submit_users)}"
 
             client.chat_postMessage(
                 channel=team.standup.publish_channel, text=message)
 
-        return make_response(json.dumps(utils.build_standup(submissions)), 200)
+        return make_response(
+            serialization.dumps(utils.build_standup(submissions)), 200)
     except SlackApiError as e:
         code = e.response["error"]
         return make_response(f"Failed due to {code}", 200)
+    finally:
+        utils.release_publish_lock(standup, lock)
 
 
 # APIs start here
@@ -188,17 +256,22 @@ def update_user(user_id):
 # Get user by username
 @app.route("/api/get_user/<username>/", methods=["GET"])
 @authenticate
+@replica.read_only
+@versioning.conditional("user", "team")
+@query_budget.budget(2)
 def get_user(username):
-    users = User.query.filter(User.username.contains(username)).all()
-    return jsonify({"success": True, "users": utils.prepare_user_response(users)})
+    return jsonify({"success": True,
+                    "users": projections.users(name=username)})
 
 
 # Get all users
 @app.route("/api/get_users/", methods=["GET"])
 @authenticate
+@replica.read_only
+@versioning.conditional("user", "team")
+@query_budget.budget(2)
 def get_users():
-    users = User.query.all()
-    return jsonify({"success": True, "users": utils.prepare_user_response(users)})
+    return jsonify({"success": True, "users": projections.users()})
 
 
 # Add a new standup to DB
@@ -207,13 +280,11 @@ def get_users():
 def add_standup():
     payload = request.json
     if utils.is_standup_valid(**payload):
-        payload["standup_blocks"] = utils.questions_to_blockkit(
-            payload.get("questions")
-        )
         data = utils.prepare_standup_table_data(**payload)
 
         try:
             standup = Standup(**data)
+            forms.set_questions(standup, payload.get("questions"))
             team_id = payload.get("team_id")
             team = Team.query.filter(Team.id == team_id).first()
             standup.team = team
@@ -244,12 +315,11 @@ def update_standup(standup_id):
     payload = request.json
     if utils.is_standup_valid(**payload):
         try:
-            payload["standup_blocks"] = utils.questions_to_blockkit(
-                payload.get("questions")
-            )
             data = utils.prepare_standup_table_data(**payload)
 
-            Standup.query.get(standup_id).update(**data)
+            standup = Standup.query.get(standup_id)
+            standup.update(**data)
+            forms.set_questions(standup, payload.get("questions"))
             db.session.commit()
             return jsonify({"success": True})
         except Exception:
@@ -269,110 +339,151 @@ def update_standup(standup_id):
 
 @app.route("/api/get_standup/<standup_id>/", methods=["GET"])
 @authenticate
+@replica.read_only
+@versioning.conditional("standup")
+@query_budget.budget(1)
 def get_standup(standup_id):
-    # remove all keys from dict starting with "_"
-    filter_keys = lambda x: {k: v for k, v in x.items() if not k.startswith("_")}
-
     # If id in request args then return standup for id
     if standup_id.isnumeric():
-        try:
-            standup = Standup.query.filter_by(id=standup_id).first()
-            return jsonify(
-                {
-                    "success": True,
-                    "standup": utils.format_standup(filter_keys(standup.__dict__)),
-                }
-            )
-        except Exception:
-            return jsonify(
-                {
-                    "success": False,
-                    "reason": f"Standup for id {standup_id} does not exist",
-                }
-            )
+        standup = projections.standup(int(standup_id))
+        if standup:
+            return jsonify({"success": True, "standup": standup})
+        return jsonify(
+            {
+                "success": False,
+                "reason": f"Standup for id {standup_id} does not exist",
+            }
+        )
     return jsonify({"success": False, "reason": "Incorrect standup_id."})
 
 
 # Fetch standups based on their status (active, inactive, all)
 @app.route("/api/get_standups/", methods=["GET"])
 @authenticate
+@replica.read_only
+@versioning.conditional("standup")
+@query_budget.budget(1)
 def get_standups():
     status = request.args.get("status", ALL)
 
-    # remove all keys from dict starting with "_"
-    filter_keys = lambda x: {k: v for k, v in x.items() if not k.startswith("_")}
-
     if status == ACTIVE:
-        standups = Standup.query.filter_by(is_active=True).all()
+        standups = projections.standups(is_active=True)
     elif status == INACTIVE:
-        standups = Standup.query.filter_by(is_active=False).all()
+        standups = projections.standups(is_active=False)
     else:
-        standups = Standup.query.all()
-
-    filtered_standups = [
-        utils.format_standup(filter_keys(standup.__dict__)) for standup in standups
-    ]
+        standups = projections.standups()
 
-    return jsonify({"success": True, "standups": filtered_standups})
+    return jsonify({"success": True, "standups": standups})
 
 
 # Delete a standup
 @app.route("/api/delete_standup/<standup_id>/", methods=["DELETE"])
 @authenticate
 def delete_standup(standup_id):
+    forms.delete(standup_id)
+    Digest.query.filter_by(standup_id=standup_id).delete()
     Standup.query.filter_by(id=standup_id).delete()
     db.session.commit()
     return jsonify({"success": True})
 
 
-# Delete all previous submissions
-@app.route("/api/delete_submissions/", methods=["DELETE"])
+# Purge old submissions in the background. GET reports progress of the
+# current or last run.
+@app.route("/api/delete_submissions/", methods=["DELETE", "GET"])
 @authenticate
 def delete_submissions():
-    todays_datetime = datetime(
-        datetime.today().year, datetime.today().month, datetime.today().day
-    )
-    Submission.query.filter(Submission.created_at < todays_datetime).delete()
+    if request.method == "GET":
+        return jsonify({"success": True, "job": retention.job_status()})
+
+    try:
+        days = int(request.args.get("days", retention.RETENTION_DAYS))
+        batch_size = int(request.args.get("batch_size",
+                                          retention.RETENTION_BATCH_SIZE))
+    except ValueError:
+        return make_response(jsonify({
+            "success": False,
+            "reason": "days and batch_size must be integers"}), 400)
+    if days < 1 or batch_size < 1:
+        return make_response(jsonify({
+            "success": False,
+            "reason": "days and batch_size must be at least 1"}), 400)
+
+    if not retention.start_background_purge(days=days, batch_size=batch_size):
+        return make_response(jsonify({
+            "success": False,
+            "reason": "A retention job is already running",
+            "job": retention.job_status(),
+        }), 409)
+
+    return make_response(jsonify({"success": True,
+                                  "cutoff": retention.retention_cutoff(days)}),
+                         202)
 
 
 # Notify users who have not submitted the standup yet
 @app.route("/api/notify_users/<team_name>/", methods=["GET"])
 @authenticate
+@query_budget.budget(4)
 def notify_users(team_name):
-    team = Team.query.filter_by(name=team_name).first()
+    team, error = _find_team(team_name)
+    if error:
+        return error
+    workspaces.activate(team.workspace)
 
-    # Get all active users for this team
+    # Get all active users for this team, with their teams and standups
     users = (
         db.session.query(User)
         .join(Team.user)
         .filter(Team.id == team.id, User.is_active)
+        .options(selectinload(User.team).joinedload(Team.standup))
     ).all()
 
+    # Today's submissions of these users, in one query
+    submitted = dict(
+        db.session.query(Submission.user_id, func.count(Submission.id))
+        .filter(Submission.user_id.in_([user.id for user in users]),
+                Submission.day == standup_day())
+        .group_by(Submission.user_id)
+    ) if users else {}
+
     for user in users:
         num_teams = len(user.team)
 
-        todays_datetime = datetime(
-            datetime.today().year, datetime.today().month, datetime.today().day
-        )
-
-        submissions = user.submission.filter(
-            Submission.created_at >= todays_datetime
-        ).all()
-
         # TODO: This assumes submissions for all teams. It should check
         # submission for only this team (requested in the API request)
         # This will need to submission object to have reference to
         # the standup it's associated with.
-        if len(submissions) < num_teams:
+        if submitted.get(user.id, 0) < num_teams:
             text, blocks = utils.prepare_notification_message(user)
             client.chat_postMessage(
                 channel=user.user_id, text=text, blocks=blocks)
     return jsonify({"success": True})
 
 
+# Remind all active users of every standup they haven't submitted today,
+# with one DM per user. `dry_run=1` only returns who would be reminded.
+@app.route("/api/notify_all_users/", methods=["GET"])
+@authenticate
+@query_budget.budget(2)
+def notify_all_users():
+    dry_run = request.args.get("dry_run", "0") in ("1", "true")
+    return jsonify({"success": True, **reminders.remind_all(dry_run=dry_run)})
+
+
+# Sync user names, time zones and deactivations from the Slack directory
+@app.route("/api/sync_directory/", methods=["POST"])
+@authenticate
+def sync_directory():
+    full = request.args.get("full", "0") in ("1", "true")
+    result = directory.sync(full=full)
+    return jsonify({"success": not result["failed"], **result})
+
+
 # Get submission for user id
 @app.route("/api/get_submission/<user_id>/", methods=["GET"])
 @authenticate
+@replica.read_only
+@query_budget.budget(2)
 def get_submission(user_id):
     start_date = request.args.get("start_date")
     end_date = request.args.get("end_date")
@@ -390,51 +501,13 @@ def get_submission(user_id):
             }
         )
 
-    if start_date and end_date:
-        submissions = Submission.query.filter(
-            and_(
-                Submission.user_id == user_id,
-                Submission.created_at >= start_date,
-                Submission.created_at <= end_date,
-            )
-            .order_by(Submission.created_at.desc())
-            .all()
-        )
-
-    elif start_date:
-        submissions = Submission.query.filter(
-            and_(
-                Submission.user_id == user_id,
-                Submission.created_at >= start_date,
-            )
-            .order_by(Submission.created_at.desc())
-            .all()
-        )
-
-    elif end_date:
-        submissions = Submission.query.filter(
-            and_(
-                Submission.user_id == user_id,
-                Submission.created_at <= end_date,
-            )
-            .order_by(Submission.created_at.desc())
-            .all()
-        )
-
-    else:
-        submissions = (
-            Submission.query.filter_by(user_id=user_id)
-            .order_by(Submission.created_at.desc())
-            .limit(50)
-            .all()
-        )
-
+    # Without dates only the latest 50 submissions
+    limit = None if start_date or end_date else 50
     return jsonify(
         {
             "success": True,
-            "submissions": [
-                utils.prepare_user_submission(submission) for submission in submissions
-            ],
+            "submissions": projections.submissions(
+                start_date, end_date, user_id=user_id, limit=limit),
         }
     )
 
@@ -442,6 +515,8 @@ def get_submission(user_id):
 # Get submissions
 @app.route("/api/get_submissions/", methods=["GET"])
 @authenticate
+@replica.read_only
+@query_budget.budget(2)
 def get_submissions():
     start_date = request.args.get("start_date")
     end_date = request.args.get("end_date")
@@ -459,43 +534,107 @@ def get_submissions():
             }
         )
 
-    if start_date and end_date:
-        submissions = (
-            Submission.query.filter(
-                Submission.created_at >= start_date,
-                Submission.created_at <= end_date,
-            )
-            .order_by(Submission.created_at.desc())
-            .all()
-        )
-    elif start_date:
-        submissions = (
-            Submission.query.filter(Submission.created_at >= start_date)
-            .order_by(Submission.created_at.desc())
-            .all()
-        )
-    elif end_date:
-        submissions = (
-            Submission.query.filter(Submission.created_at <= end_date)
-            .order_by(Submission.created_at.desc())
-            .all()
-        )
-    else:
-        submissions = (
-            Submission.query.order_by(
-                Submission.created_at.desc()).limit(50).all()
-        )
-
+    # Without dates only the latest 50 submissions
+    limit = None if start_date or end_date else 50
     return jsonify(
         {
             "success": True,
-            "submissions": [
-                utils.prepare_user_submission(submission) for submission in submissions
-            ],
+            "submissions": projections.submissions(start_date, end_date,
+                                                   limit=limit),
         }
     )
 
 
+# Full-text search over submission answers
+@app.route("/api/search_submissions/", methods=["GET"])
+@authenticate
+def search_submissions():
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"success": False, "reason": "Missing search query q"})
+
+    start_date = request.args.get("start_date")
+    end_date = request.args.get("end_date")
+
+    try:
+        if start_date:
+            start_date = datetime.strptime(start_date, "%Y-%m-%d")
+        if end_date:
+            end_date = datetime.strptime(end_date, "%Y-%m-%d")
+        page = max(1, int(request.args.get("page", 1)))
+        per_page = min(100, max(1, int(request.args.get("per_page", 20))))
+        user_id = int(request.args["user_id"]) \
+            if request.args.get("user_id") else None
+    except ValueError:
+        return jsonify(
+            {
+                "success": False,
+                "reason": "Invalid parameters. Use format yyyy-mm-dd for "
+                          "dates and integers for user_id, page, per_page",
+            }
+        )
+
+    results = search.search(query, team=request.args.get("team"),
+                            user_id=user_id, start_date=start_date,
+                            end_date=end_date, page=page, per_page=per_page)
+    return jsonify({"success": True, **results})
+
+
+# Daily participation per standup from the rollup table. Defaults to the
+# last 90 days.
+@app.route("/api/participation/", methods=["GET"])
+@authenticate
+@replica.read_only
+def participation():
+    try:
+        end_date = datetime.strptime(request.args["end_date"], "%Y-%m-%d") \
+            .date() if request.args.get("end_date") \
+            else standup_day()
+        start_date = datetime.strptime(request.args["start_date"],
+                                       "%Y-%m-%d").date() \
+            if request.args.get("start_date") \
+            else end_date - timedelta(days=90)
+    except ValueError:
+        return jsonify(
+            {
+                "success": False,
+                "reason": "Invalid date format. Use format yyyy-mm-dd",
+            }
+        )
+
+    report = rollup.participation(start_date, end_date,
+                                  team=request.args.get("team"))
+    return jsonify({"success": True, "start_date": start_date,
+                    "end_date": end_date, **report})
+
+
+# Saved weekly or monthly digests, by default of the latest period built.
+# Digests are built by `flask digests build`.
+@app.route("/api/get_digests/", methods=["GET"])
+@authenticate
+@replica.read_only
+def get_digests():
+    period = request.args.get("period", "week")
+    if period not in digests.PERIODS:
+        return jsonify({"success": False,
+                        "reason": "period must be week or month"})
+    try:
+        start_date = datetime.strptime(request.args["start_date"],
+                                       "%Y-%m-%d").date() \
+            if request.args.get("start_date") else None
+    except ValueError:
+        return jsonify(
+            {
+                "success": False,
+                "reason": "Invalid date format. Use format yyyy-mm-dd",
+            }
+        )
+    user_id = request.args.get("user_id", type=int)
+
+    return jsonify({"success": True, "digests": digests.digests(
+        period, start_date, team=request.args.get("team"), user_id=user_id)})
+
+
 # Add a team to DB
 @app.route("/api/add_team/", methods=["POST"])
 @authenticate
@@ -506,7 +645,8 @@ def add_team():
         standup = Standup.query.filter(
             Standup.id == payload.get("standup_id")).first()
 
-        team = Team(standup=standup, name=payload.get("name"))
+        team = Team(standup=standup, name=payload.get("name"),
+                    workspace_id=payload.get("workspace_id"))
 
         db.session.add(team)
         db.session.commit()
@@ -517,8 +657,12 @@ def add_team():
 # Get all teams
 @app.route("/api/get_teams/", methods=["GET"])
 @authenticate
+@replica.read_only
+@versioning.conditional("team", "standup", "user")
+@query_budget.budget(2)
 def fetch_teams():
-    teams = Team.query.all()
+    teams = Team.query.options(
+        joinedload(Team.standup), selectinload(Team.user)).all()
     response = []
     for team in teams:
         team_data = {
@@ -530,9 +674,116 @@ def fetch_teams():
     return jsonify(response)
 
 
+# Add a Slack workspace (multi-workspace mode) or update its credentials
+@app.route("/api/add_workspace/", methods=["POST"])
+@authenticate
+def add_workspace():
+    payload = request.json or {}
+    if not payload.get("slack_team_id") or not payload.get("bot_token"):
+        return jsonify({"success": False,
+                        "reason": "Incorrect payload. Required: slack_team_id, bot_token"})
+
+    workspace = Workspace.query.filter_by(
+        slack_team_id=payload["slack_team_id"]).first()
+    if not workspace:
+        workspace = Workspace(slack_team_id=payload["slack_team_id"])
+
+    workspace.name = payload.get("name", workspace.name)
+    workspace.bot_token = payload["bot_token"]
+    workspace.signing_secret = payload.get("signing_secret",
+                                           workspace.signing_secret)
+    workspace.is_active = payload.get("is_active", True)
+
+    db.session.add(workspace)
+    db.session.commit()
+    return jsonify({"success": True, "workspace_id": workspace.id})
+
+
+# Get all workspaces, without their credentials
+@app.route("/api/get_workspaces/", methods=["GET"])
+@authenticate
+@replica.read_only
+def get_workspaces():
+    teams: dict = {}
+    for team in Team.query.filter(Team.workspace_id.isnot(None)):
+        teams.setdefault(team.workspace_id, []).append(team.name)
+
+    return jsonify({
+        "success": True,
+        "workspaces": [
+            {
+                "id": workspace.id,
+                "slack_team_id": workspace.slack_team_id,
+                "name": workspace.name,
+                "is_active": workspace.is_active,
+                "teams": teams.get(workspace.id, []),
+            }
+            for workspace in Workspace.query.all()
+        ],
+    })
+
+
+# Readiness probe. Unauthenticated so that orchestrators can call it. Unless
+# the tables are created on startup (CREATE_SCHEMA), the database must be
+# migrated to the newest migration of this build.
+@app.route("/api/ready/", methods=["GET"])
+def readiness_check():
+    try:
+        if app.config["CREATE_SCHEMA"]:
+            db.session.execute("SELECT 1")
+        else:
+            revision = db.session.execute(
+                "SELECT version_num FROM alembic_version").scalar()
+            if revision != schema_head():
+                return make_response(jsonify({
+                    "ready": False,
+                    "reason": f"Database schema is at revision {revision}, "
+                              f"expected {schema_head()}. Run "
+                              "`flask schema upgrade`.",
+                }), 503)
+    except Exception as e:
+        db.session.rollback()
+        return make_response(jsonify({"ready": False, "reason": str(e)}), 503)
+
+    return jsonify({"ready": True,
+                    "startup_seconds": app.config.get("STARTUP_SECONDS")})
+
+
 # Health check for the server
 @app.route("/api/health/", methods=["GET"])
 @authenticate
 def health_check():
     return make_response("Alive!", 200)
 
+
+# Profile the next requests to a route. POST arms the profiler, DELETE
+# disarms it and GET lists armed routes and captured profiles.
+@app.route("/api/profile/", methods=["GET", "POST", "DELETE"])
+@authenticate
+def profile():
+    if request.method == "POST":
+        payload = request.json or {}
+        if not payload.get("route"):
+            return jsonify({"success": False,
+                            "reason": "Incorrect payload. Required: route"})
+        try:
+            armed = profiling.arm(payload["route"],
+                                  int(payload.get("count", 1)),
+                                  payload.get("mode", "cprofile"),
+                                  bool(payload.get("tracemalloc", False)))
+        except ValueError as e:
+            return jsonify({"success": False, "reason": str(e)})
+        return jsonify({"success": True, "armed": armed})
+
+    if request.method == "DELETE":
+        return jsonify({"success": True,
+                        "armed": profiling.disarm(request.args.get("route"))})
+
+    return jsonify({"success": True, "armed": profiling.armed_routes(),
+                    "captures": profiling.captures()})
+
+
+# Prometheus scrape endpoint, aggregated across all workers
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.scrape(), mimetype=metrics.CONTENT_TYPE_LATEST)
@@ -0,0 +1,38 @@
+import logging
+
+import click
+import flask_migrate
+from flask.cli import AppGroup
+from sqlalchemy import inspect
+
+import app.search as search
+from app.models import db
+
+logger = logging.getLogger(__name__)
+
+schema_cli = AppGroup("schema", help="Create and migrate the database schema.")
+
+
+# The migrations start from the tables of the first releases, which were
+# created by `create_all`, so they can't build the schema of an empty
+# database. An empty database gets the tables of the models and the objects
+# only the migrations create, and is stamped with the newest migration.
+def create_schema() -> None:
+    db.create_all()
+    search.create_index()
+
+
+def is_empty() -> bool:
+    return not inspect(db.engine).get_table_names()
+
+
+@schema_cli.command("upgrade")
+def upgrade_command():
+    """Migrate the database to the newest migration, creating the schema of
+    an empty database."""
+    if is_empty():
+        create_schema()
+        flask_migrate.stamp()
+        click.echo("Created the schema of the empty database")
+    else:
+        flask_migrate.upgrade()
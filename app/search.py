@@ -0,0 +1,300 @@
+import re
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Iterable, Optional
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import text
+
+import app.utils as utils
+from app.models import Submission, User, Standup, Team, db
+
+logger = logging.getLogger(__name__)
+
+search_cli = AppGroup("search", help="Manage the submission search index.")
+
+INDEX_TABLE = "submission_search"
+
+# Databases with a full-text index. Search falls back to LIKE matching on
+# the others.
+INDEXED_DIALECTS = ("postgresql", "sqlite")
+
+
+def _dialect() -> str:
+    return db.engine.dialect.name
+
+
+def is_indexed(dialect: str = None) -> bool:
+    return (dialect or _dialect()) in INDEXED_DIALECTS
+
+
+# Keep alembic autogenerate away from the index tables (and the FTS5 shadow
+# tables on Sqlite), they are not part of the models' metadata.
+def include_object(object, name, type_, reflected, compare_to):
+    return not (type_ == "table" and name and name.startswith(INDEX_TABLE))
+
+
+# DDL of the search index for the current database
+def index_ddl(dialect: str) -> List[str]:
+    if dialect == "postgresql":
+        return [
+            f"CREATE TABLE IF NOT EXISTS {INDEX_TABLE} ("
+            "submission_id INTEGER PRIMARY KEY, "
+            "content TEXT NOT NULL, "
+            "document TSVECTOR NOT NULL)",
+            f"CREATE INDEX IF NOT EXISTS ix_{INDEX_TABLE}_document "
+            f"ON {INDEX_TABLE} USING GIN (document)",
+        ]
+    if dialect == "sqlite":
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} "
+            "USING fts5(content, tokenize='porter unicode61')",
+        ]
+    raise NotImplementedError(f"Search is not supported on {dialect}")
+
+
+# Create the index. The migrations and `flask schema upgrade` create it (and
+# create_app when CREATE_SCHEMA is on), requests never run DDL.
+def create_index() -> None:
+    if not is_indexed():
+        logger.warning("search: no full-text index on %s, search falls back "
+                       "to LIKE matching", _dialect())
+        return
+    for statement in index_ddl(_dialect()):
+        db.session.execute(text(statement))
+    db.session.commit()
+
+
+# Text indexed for a submission: all the answers
+def document(submission: Submission) -> str:
+    return _content(submission.standup_submission)
+
+
+def _content(standup_submission: str) -> str:
+    try:
+        answers = utils.submission_answers(standup_submission)
+    except (KeyError, TypeError, ValueError):
+        return ""
+    return "\n".join(answer["answer"] or "" for answer in answers)
+
+
+def _upsert_statement():
+    if _dialect() == "postgresql":
+        return text(
+            f"INSERT INTO {INDEX_TABLE} (submission_id, content, document) "
+            "VALUES (:id, :content, to_tsvector('english', :content)) "
+            "ON CONFLICT (submission_id) DO UPDATE "
+            "SET content = excluded.content, document = excluded.document")
+    return text(f"INSERT OR REPLACE INTO {INDEX_TABLE} (rowid, content) "
+                "VALUES (:id, :content)")
+
+
+# Add or update submissions in the index. Does not commit.
+def index_submissions(submissions: Iterable[Submission]) -> int:
+    if not is_indexed():
+        return 0
+    rows = [{"id": submission.id, "content": document(submission)}
+            for submission in submissions]
+    if rows:
+        db.session.execute(_upsert_statement(), rows)
+    return len(rows)
+
+
+# Index one submission after it was saved. Search must never break a
+# submission, so failures are only logged.
+def index_submission(submission: Submission) -> None:
+    try:
+        index_submissions([submission])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.exception("Failed to index submission %s", submission.id)
+
+
+# Remove submissions from the index. Does not commit.
+def remove_submissions(submission_ids: List[int]) -> None:
+    if not submission_ids or not is_indexed():
+        return
+    column = "submission_id" if _dialect() == "postgresql" else "rowid"
+    db.session.execute(
+        text(f"DELETE FROM {INDEX_TABLE} WHERE {column} = :id"),
+        [{"id": submission_id} for submission_id in submission_ids])
+
+
+# FTS5 query matching all the words of `query`. Every word is quoted so that
+# user input can't use (or break on) the FTS5 query syntax.
+def _fts5_query(query: str) -> str:
+    words = re.findall(r"\w+", query)
+    return " ".join(f'"{word}"' for word in words)
+
+
+# Ranked, paginated search over submission answers
+def search(query: str, team: str = None, user_id: int = None,
+           start_date: Optional[datetime] = None,
+           end_date: Optional[datetime] = None,
+           page: int = 1, per_page: int = 20) -> Dict[str, Any]:
+    dialect = _dialect()
+    if not is_indexed(dialect):
+        return _like_search(query, team, user_id, start_date, end_date, page,
+                            per_page)
+    params: Dict[str, Any] = {"limit": per_page,
+                              "offset": (page - 1) * per_page}
+
+    if dialect == "postgresql":
+        params["query"] = query
+        select = (
+            "SELECT s.id AS submission_id, s.user_id, u.username, "
+            "u.user_id AS slack_user_id, t.name AS team, s.created_at, "
+            "ts_rank(i.document, q) AS score, "
+            "ts_headline('english', i.content, q, "
+            "'StartSel=*, StopSel=*, MaxFragments=2') AS snippet "
+        )
+        source = (
+            f"FROM {INDEX_TABLE} i "
+            "CROSS JOIN plainto_tsquery('english', :query) q "
+            "JOIN submission s ON s.id = i.submission_id "
+        )
+        conditions = ["i.document @@ q"]
+    else:
+        params["query"] = _fts5_query(query)
+        if not params["query"]:
+            return {"total": 0, "page": page, "per_page": per_page,
+                    "results": []}
+        select = (
+            "SELECT s.id AS submission_id, s.user_id, u.username, "
+            "u.user_id AS slack_user_id, t.name AS team, s.created_at, "
+            f"-bm25({INDEX_TABLE}) AS score, "
+            f"snippet({INDEX_TABLE}, 0, '*', '*', '…', 16) AS snippet "
+        )
+        source = (
+            f"FROM {INDEX_TABLE} "
+            f"JOIN submission s ON s.id = {INDEX_TABLE}.rowid "
+        )
+        conditions = [f"{INDEX_TABLE} MATCH :query"]
+
+    source += (
+        'JOIN "user" u ON u.id = s.user_id '
+        "LEFT JOIN standup st ON st.id = s.standup_id "
+        "LEFT JOIN team t ON t.id = st.team_id "
+    )
+
+    if team:
+        conditions.append("t.name = :team")
+        params["team"] = team
+    if user_id:
+        conditions.append("s.user_id = :user_id")
+        params["user_id"] = user_id
+    if start_date:
+        conditions.append("s.created_at >= :start_date")
+        params["start_date"] = start_date
+    if end_date:
+        conditions.append("s.created_at <= :end_date")
+        params["end_date"] = end_date
+
+    where = "WHERE " + " AND ".join(conditions)
+    total = db.session.execute(
+        text(f"SELECT COUNT(*) {source} {where}"), params).scalar()
+    rows = db.session.execute(
+        text(f"{select} {source} {where} ORDER BY score DESC, s.id DESC "
+             "LIMIT :limit OFFSET :offset"), params)
+
+    return {
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "results": [dict(row) for row in rows],
+    }
+
+
+# Search on databases without an index: the submissions whose stored view
+# contains all the words are matched again on their answers (the view also
+# holds the questions) and ranked by how often the words occur. It scans
+# the submissions, so it only suits small databases.
+def _like_search(query: str, team: str = None, user_id: int = None,
+                 start_date: Optional[datetime] = None,
+                 end_date: Optional[datetime] = None,
+                 page: int = 1, per_page: int = 20) -> Dict[str, Any]:
+    words = [word.lower() for word in re.findall(r"\w+", query)]
+    if not words:
+        return {"total": 0, "page": page, "per_page": per_page,
+                "results": []}
+
+    rows = (
+        db.session.query(
+            Submission.id, Submission.user_id, User.username,
+            User.user_id.label("slack_user_id"), Team.name.label("team"),
+            Submission.created_at, Submission.standup_submission)
+        .join(User, User.id == Submission.user_id)
+        .outerjoin(Standup, Standup.id == Submission.standup_id)
+        .outerjoin(Team, Team.id == Standup.team_id)
+    )
+    for word in words:
+        pattern = word.replace("_", "\\_")
+        rows = rows.filter(Submission.standup_submission.ilike(
+            f"%{pattern}%", escape="\\"))
+    if team:
+        rows = rows.filter(Team.name == team)
+    if user_id:
+        rows = rows.filter(Submission.user_id == user_id)
+    if start_date:
+        rows = rows.filter(Submission.created_at >= start_date)
+    if end_date:
+        rows = rows.filter(Submission.created_at <= end_date)
+
+    results = []
+    for row in rows:
+        content = _content(row.standup_submission)
+        lowered = content.lower()
+        if not all(word in lowered for word in words):
+            continue
+        snippet = next(line for line in content.splitlines()
+                       if any(word in line.lower() for word in words))
+        results.append({
+            "submission_id": row.id,
+            "user_id": row.user_id,
+            "username": row.username,
+            "slack_user_id": row.slack_user_id,
+            "team": row.team,
+            "created_at": row.created_at,
+            "score": float(sum(lowered.count(word) for word in words)),
+            "snippet": snippet[:200],
+        })
+    results.sort(key=lambda result: (result["score"],
+                                     result["submission_id"]), reverse=True)
+
+    return {
+        "total": len(results),
+        "page": page,
+        "per_page": per_page,
+        "results": results[(page - 1) * per_page:page * per_page],
+    }
+
+
+@search_cli.command("backfill")
+@click.option("--batch-size", default=500, show_default=True,
+              help="Submissions indexed per transaction.")
+def backfill_command(batch_size):
+    """Index all existing submissions."""
+    if not is_indexed():
+        raise click.ClickException(
+            f"Search has no index on {_dialect()}, nothing to backfill")
+    last_id = 0
+    indexed = 0
+
+    while True:
+        submissions = (
+            Submission.query.filter(Submission.id > last_id)
+            .order_by(Submission.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not submissions:
+            break
+        last_id = submissions[-1].id
+        indexed += index_submissions(submissions)
+        db.session.commit()
+        db.session.expunge_all()
+        click.echo(f"Indexed {indexed} submissions")
+
+    click.echo(f"Done, indexed {indexed} submissions")
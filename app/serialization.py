@@ -0,0 +1,71 @@
+import json
+import logging
+import datetime
+from typing import Any, Union
+
+from app.constants import JSON_BACKEND
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# JSON backend of the API responses and stored Slack views: orjson when it is
+# installed (JSON_BACKEND "auto" or "orjson"), the stdlib json module
+# otherwise.
+if JSON_BACKEND == "orjson" and orjson is None:
+    logger.warning("JSON_BACKEND=orjson but orjson is not installed, "
+                   "using the stdlib json module")
+BACKEND = "orjson" if orjson is not None and \
+    JSON_BACKEND in ("auto", "orjson") else "stdlib"
+
+# orjson serializes dates and times itself, in a format that differs from
+# the API's for times. Pass them through to `default` instead.
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) \
+    if orjson is not None else 0
+
+
+# Serialization of the types json can't handle: dates as ISO 8601, times as
+# HH:MM, anything else as null
+def default(obj: Any) -> Any:
+    if isinstance(obj, (datetime.date, datetime.datetime)):
+        return obj.isoformat()
+    elif isinstance(obj, datetime.time):
+        return obj.strftime("%H:%M")
+    return None
+
+
+def dumps_bytes(obj: Any, sort_keys: bool = False,
+                indent: int = None) -> bytes:
+    if BACKEND == "orjson" and indent in (None, 2):
+        options = _ORJSON_OPTIONS
+        if sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=default, option=options)
+        except TypeError:
+            # e.g. integers larger than 64 bits, which only json handles
+            pass
+    return _stdlib_dumps(obj, sort_keys, indent).encode()
+
+
+def dumps(obj: Any, sort_keys: bool = False, indent: int = None) -> str:
+    if BACKEND == "orjson":
+        return dumps_bytes(obj, sort_keys, indent).decode()
+    return _stdlib_dumps(obj, sort_keys, indent)
+
+
+def _stdlib_dumps(obj: Any, sort_keys: bool, indent: int) -> str:
+    return json.dumps(obj, default=default, sort_keys=sort_keys,
+                      indent=indent, ensure_ascii=False,
+                      separators=(",", ":") if indent is None else None)
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    if BACKEND == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
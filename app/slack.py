@@ -0,0 +1,92 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Tuple, Callable
+
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+
+from app import metrics, tracing
+
+
+# WebClient that records latency, errors and rate limiting of every call
+class SlackClient(WebClient):
+    def api_call(self, api_method: str, **kwargs):
+        with tracing.span(f"slack.{api_method}", kind="CLIENT",
+                          **{"slack.method": api_method}):
+            return self._api_call(api_method, **kwargs)
+
+    def _api_call(self, api_method: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = super().api_call(api_method, **kwargs)
+        except SlackApiError as e:
+            metrics.observe_slack_call(api_method, time.perf_counter() - start,
+                                       error=e.response.get("error", "unknown"),
+                                       status=e.response.status_code)
+            raise
+        except Exception as e:
+            metrics.observe_slack_call(api_method, time.perf_counter() - start,
+                                       error=type(e).__name__)
+            raise
+
+        metrics.observe_slack_call(api_method, time.perf_counter() - start,
+                                   status=response.status_code)
+        return response
+
+
+# Bounded pool of clients, one per workspace. The least recently used client
+# is dropped when the pool is full, so a deployment serving many workspaces
+# keeps a fixed number of HTTP clients around.
+class ClientPool:
+    def __init__(self, size: int, base_url: str = WebClient.BASE_URL):
+        self.size = size
+        self.base_url = base_url
+        self._clients: "OrderedDict[Any, Tuple[str, SlackClient]]" = \
+            OrderedDict()
+        self._lock = threading.Lock()
+
+    # Client of workspace `key`. A new client is built when the workspace's
+    # token changed, e.g. after a reinstall.
+    def get(self, key, token: str) -> SlackClient:
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry and entry[0] == token:
+                self._clients.move_to_end(key)
+                return entry[1]
+
+            client = SlackClient(token=token, base_url=self.base_url)
+            self._clients[key] = (token, client)
+            self._clients.move_to_end(key)
+            while len(self._clients) > self.size:
+                self._clients.popitem(last=False)
+            return client
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+
+# Paces calls to at most `rate` per second and retries the calls that Slack
+# rejected with HTTP 429 after the Retry-After it asked for
+class Throttle:
+    def __init__(self, rate: float, retries: int = 3):
+        self.interval = 1 / rate if rate else 0
+        self.retries = retries
+        self._next_call = 0.0
+
+    def _wait(self) -> None:
+        now = time.monotonic()
+        if now < self._next_call:
+            time.sleep(self._next_call - now)
+        self._next_call = max(now, self._next_call) + self.interval
+
+    def call(self, func: Callable, *args, **kwargs):
+        for attempt in range(self.retries + 1):
+            self._wait()
+            try:
+                return func(*args, **kwargs)
+            except SlackApiError as e:
+                if e.response.status_code != 429 or attempt == self.retries:
+                    raise
+                retry_after = float(e.response.headers.get("Retry-After", 1))
+                self._next_call = time.monotonic() + retry_after
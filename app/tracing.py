@@ -0,0 +1,231 @@
+import json
+import time
+import queue
+import random
+import logging
+import threading
+import contextvars
+from functools import wraps
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+import requests as http
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.constants import (
+    TRACING_EXPORTER,
+    TRACING_ENDPOINT,
+    TRACING_SAMPLE_RATE,
+    TRACING_SERVICE_NAME,
+)
+
+logger = logging.getLogger(__name__)
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar(
+    "current_span", default=None)
+
+
+def _new_id(bits: int = 64) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Span:
+    def __init__(self, name: str, parent: Optional["Span"] = None,
+                 kind: str = None, **attributes):
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else _new_id(128)
+        self.span_id = _new_id()
+        self.parent_id = parent.span_id if parent else None
+        self.root = parent.root if parent else self
+        self.attributes: Dict[str, Any] = attributes
+        self.start = time.time()
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+        # Finished spans of the trace, collected on the root span
+        self.spans: List["Span"] = [] if parent is None else None
+
+    def set(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def finish(self) -> None:
+        self.duration = time.time() - self.start
+        self.root.spans.append(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+    # Span in the Zipkin v2 JSON format
+    def to_zipkin(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "id": self.span_id,
+            "name": self.name,
+            "timestamp": int(self.start * 1e6),
+            "duration": max(1, int(self.duration * 1e6)),
+            "localEndpoint": {"serviceName": TRACING_SERVICE_NAME},
+            "tags": {k: str(v) for k, v in self.attributes.items()},
+        }
+        if self.parent_id:
+            span["parentId"] = self.parent_id
+        if self.kind:
+            span["kind"] = self.kind
+        if self.error:
+            span["tags"]["error"] = self.error
+        return span
+
+
+# Exports finished traces from a background thread so that requests never
+# wait on the collector.
+class Exporter:
+    def __init__(self, kind: str, endpoint: str = ""):
+        self.kind = kind
+        self.endpoint = endpoint
+        self.queue: queue.Queue = queue.Queue(maxsize=1000)
+        self.thread = None
+
+    def export(self, spans: List[Span]) -> None:
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, name="tracing",
+                                           daemon=True)
+            self.thread.start()
+        try:
+            self.queue.put_nowait(spans)
+        except queue.Full:
+            pass
+
+    def _run(self) -> None:
+        while True:
+            spans = self.queue.get()
+            try:
+                if self.kind == "zipkin":
+                    http.post(self.endpoint,
+                              json=[span.to_zipkin() for span in spans],
+                              timeout=2)
+                else:
+                    logger.info("trace %s", json.dumps(
+                        [span.to_dict() for span in spans], default=str))
+            except Exception as e:
+                logger.warning("Failed to export trace: %s", e)
+
+
+exporter = Exporter(TRACING_EXPORTER, TRACING_ENDPOINT) \
+    if TRACING_EXPORTER != "off" else None
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+# Child span of the current span. Does nothing outside of a sampled trace.
+@contextmanager
+def span(name: str, kind: str = None, **attributes):
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(name, parent, kind, **attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        child.finish()
+
+
+# Decorator wrapping every call of a function in a span
+def traced(name: str = None):
+    def decorator(func):
+        span_name = name or f"{func.__module__.split('.')[-1]}.{func.__name__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _before_request():
+    if exporter is None or random.random() >= TRACING_SAMPLE_RATE:
+        return
+
+    rule = request.url_rule.rule if request.url_rule else "unmatched"
+    root = Span(f"{request.method} {rule}", kind="SERVER",
+                **{"http.method": request.method, "http.path": request.path,
+                   "http.route": rule})
+    g.trace_span = root
+    g.trace_token = _current_span.set(root)
+
+
+def _after_request(response):
+    root = g.get("trace_span")
+    if root is not None:
+        root.set("http.status_code", response.status_code)
+        response.headers["X-Trace-Id"] = root.trace_id
+    return response
+
+
+def _teardown_request(exc):
+    root = g.pop("trace_span", None)
+    if root is None:
+        return
+    if exc is not None:
+        root.error = f"{type(exc).__name__}: {exc}"
+    _current_span.reset(g.pop("trace_token"))
+    root.finish()
+    exporter.export(root.spans)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    parent = _current_span.get()
+    if parent is not None:
+        conn.info.setdefault("trace_spans", []).append(
+            Span("db.query", parent, "CLIENT",
+                 **{"db.statement": statement[:500],
+                    "db.system": conn.dialect.name}))
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    spans = conn.info.get("trace_spans")
+    if spans:
+        query_span = spans.pop()
+        query_span.set("db.rows", cursor.rowcount)
+        query_span.finish()
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    spans = context.connection.info.get("trace_spans") \
+        if context.connection is not None else None
+    if spans:
+        query_span = spans.pop()
+        query_span.error = str(context.original_exception)
+        query_span.finish()
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
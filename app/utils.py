@@ -1,17 +1,27 @@
 import os
 import json
 import math
-from datetime import datetime
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from contextlib import contextmanager
 from functools import wraps
-from typing import List, Dict, Any, Iterator, Tuple
+from typing import List, Dict, Any, Iterator, Tuple, Optional, Set
 
 import requests
-from flask import request, jsonify
-from sqlalchemy import and_
-
-from app import app_cache, client
+from flask import request, jsonify, g, make_response
+from sqlalchemy import and_, or_, text, bindparam, Integer, Date, DateTime, \
+    Boolean
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+import app.forms as forms
+import app.workspaces as workspaces
+import app.serialization as serialization
+from app import app_cache, slack_dedupe_cache, client, signature_verifier, \
+    metrics
 from app.models import Submission, PostSubmitActionEnum, User, Standup, \
-    StandupThread, Team, db
+    StandupThread, Team, Auth, association_table, db, standup_day
 from app.constants import (
     STANDUP_INFO_SECTION,
     STANDUP_SECTION_DIVIDER,
@@ -22,9 +32,19 @@ from app.constants import (
     EDIT_DIALOG_SECTION,
     APP_CONTEXT_SECTION,
     CAT_API_HOST,
+    AUTH_NEGATIVE_TTL,
     NOTIFICATION_BLOCKS,
+    SLACK_CAPTURE_FILE,
+    PUBLISH_LOCK_TIMEOUT,
+    MULTI_WORKSPACE,
+    BLOCK_SIZE,
+    SECTION_TEXT_SIZE,
+    MESSAGE_PAYLOAD_SIZE,
+    SLACK_DEDUPE_TTL,
 )
 
+_capture_lock = threading.Lock()
+
 
 def authenticate(func):
     @wraps(func)
@@ -33,7 +53,7 @@ def authenticate(func):
             return func(*args, **kwargs)
         else:
             auth_key = request.headers.get("Authorization", "")
-            if app_cache.get(auth_key):
+            if is_valid_token(auth_key):
                 return func(*args, **kwargs)
             else:
                 return (
@@ -49,6 +69,123 @@ def authenticate(func):
     return check_authorization
 
 
+# Check an API token against the auth cache. Tokens missing from the cache
+# are looked up in the DB and cached, so the cache fills up lazily. Unknown
+# tokens are cached as "" for AUTH_NEGATIVE_TTL seconds.
+def is_valid_token(token: str) -> bool:
+    if not token:
+        return False
+    user = app_cache.get(token)
+    if user is not None:
+        return bool(user)
+
+    key = Auth.query.filter(Auth.token == token).first()
+    if key and key.user:
+        app_cache.set(key.token, key.user)
+        return True
+    app_cache.set(token, "", ttl=AUTH_NEGATIVE_TTL)
+    return False
+
+
+# Interactivity payload of the current Slack request, parsed once
+def slack_payload() -> Dict[str, Any]:
+    if "slack_payload" not in g:
+        g.slack_payload = serialization.loads(
+            request.form.get("payload") or "{}")
+    return g.slack_payload
+
+
+# Slack's team id of the workspace that sent the current request
+def slack_team_id() -> Optional[str]:
+    if request.form.get("team_id"):
+        return request.form["team_id"]
+    payload = slack_payload()
+    return (payload.get("team") or {}).get("id") or \
+        payload.get("user", {}).get("team_id")
+
+
+# Check the Slack signature of the current request. In multi-workspace mode
+# the workspace that sent it is resolved first: its signing secret verifies
+# the request and its token is used for the Slack calls made while handling
+# it. Requests of unknown workspaces are rejected.
+def verify_slack_request() -> bool:
+    # Read the raw body before the form is parsed, which consumes it
+    body = request.get_data()
+    if MULTI_WORKSPACE:
+        try:
+            workspace = workspaces.for_slack_team(slack_team_id())
+        except ValueError:
+            return False
+        if workspace is None:
+            return False
+        workspaces.activate(workspace)
+
+    return signature_verifier.is_valid_request(body, request.headers)
+
+
+# Append the current Slack request to SLACK_CAPTURE_FILE
+def capture_slack_request() -> None:
+    if not SLACK_CAPTURE_FILE:
+        return
+
+    record = json.dumps({
+        "path": request.path,
+        "content_type": request.content_type,
+        "body": request.get_data(as_text=True),
+        "captured_at": datetime.utcnow().isoformat(),
+    })
+    with _capture_lock, open(SLACK_CAPTURE_FILE, "a") as f:
+        f.write(record + "\n")
+
+
+# Identity of the current Slack delivery, the same for all retries of it.
+# A view submission is identified by the view and its hash, which also
+# catches a submit button clicked twice; other requests by their trigger id.
+def slack_delivery_key() -> str:
+    payload = slack_payload()
+    view = payload.get("view") or {}
+    if payload.get("type") == "view_submission" and view.get("hash"):
+        identity = f"view:{view.get('id')}:{view['hash']}"
+    elif request.form.get("trigger_id") or payload.get("trigger_id"):
+        identity = "trigger:" + (request.form.get("trigger_id") or
+                                 payload["trigger_id"])
+    else:
+        identity = "body:" + hashlib.sha1(request.get_data()).hexdigest()
+
+    return "slack:" + hashlib.sha1(
+        f"{request.path}|{slack_team_id()}|{identity}".encode()).hexdigest()
+
+
+# Entry point of the Slack callbacks: verifies and captures the request and
+# acknowledges repeated deliveries (Slack retries after 3 seconds without a
+# response) without calling the handler again. A delivery whose handler
+# failed is forgotten so that Slack's retry of it is handled.
+def slack_request(func):
+    @wraps(func)
+    def handle_slack_request(*args, **kwargs):
+        if not verify_slack_request():
+            return make_response("invalid request", 403)
+        capture_slack_request()
+
+        key = slack_delivery_key()
+        if not slack_dedupe_cache.add(key, 1, ttl=SLACK_DEDUPE_TTL):
+            metrics.observe_duplicate_slack_request(
+                "retry" if request.headers.get("X-Slack-Retry-Num")
+                else "duplicate")
+            return make_response("", 200)
+
+        try:
+            response = make_response(func(*args, **kwargs))
+        except Exception:
+            slack_dedupe_cache.delete(key)
+            raise
+        if response.status_code >= 500:
+            slack_dedupe_cache.delete(key)
+        return response
+
+    return handle_slack_request
+
+
 # Format standups in the Slack's block syntax
 def build_standup(submissions: List[Submission], is_single: bool = False) -> List[Dict[str, Any]]:
     formatted_standup: list = []
@@ -57,36 +194,52 @@ def build_standup(submissions: List[Submission], is_single: bool = False) -> Lis
         formatted_standup.append(STANDUP_INFO_SECTION)
 
     for submission in submissions:
-        standup_user_section = {
-            "type": "section",
-            "text": {"type": "mrkdwn", "text": ""},
-        }
-        standup_user_section["text"]["text"] = f"<@{submission.user.user_id}>"
-        formatted_standup.append(standup_user_section)
+        formatted_standup.extend(submission_blocks(submission))
+    return formatted_standup
 
-        standup_json = json.loads(submission.standup_submission)
-        blocks = standup_json.get("blocks", [])
-        values = standup_json.get("state", {}).get("values", {})
 
-        for block in blocks:
-            if block.get("type") == "section":
-                continue
+# Blocks of one user's submission: a user section, one section per answer
+# and a divider
+def submission_blocks(submission: Submission) -> List[Dict[str, Any]]:
+    standup_user_section = {
+        "type": "section",
+        "text": {"type": "mrkdwn", "text": f"<@{submission.user.user_id}>"},
+    }
+    blocks: list = [standup_user_section]
+    blocks.extend(answer_sections(
+        submission.standup_submission,
+        forms.schema(submission.standup_id, submission.form_version)))
+    blocks.append(STANDUP_SECTION_DIVIDER)
+    return blocks
 
-            standup_content_section = {"type": "section", "text": {}}
 
-            block_id = block.get("block_id", "")
-            action_id = block.get("element", {}).get("action_id", "")
+# Sections of the answers of a stored submission view, one per answer
+# unless it is too long for a section
+def answer_sections(standup_submission: str,
+                    schema: forms.Schema = None) -> List[Dict[str, Any]]:
+    blocks: list = []
+    view = serialization.loads(standup_submission)
+    for title, content in forms.answers(view, schema):
+        content = beautify_slack_markup(content or "")
 
-            title = block.get("label", {}).get("text", "")
-            content = values.get(block_id, {}).get(action_id, {}).get("value", "")
-            content = beautify_slack_markup(content)
+        for text in split_section_text(f"\n*{title}*\n{content}\n"):
+            blocks.append({"type": "section",
+                           "text": {"type": "mrkdwn", "text": text}})
+    return blocks
 
-            standup_field = {"type": "mrkdwn", "text": f"\n*{title}*\n{content}\n"}
-            standup_content_section["text"] = standup_field
 
-            formatted_standup.append(standup_content_section)
-        formatted_standup.append(STANDUP_SECTION_DIVIDER)
-    return formatted_standup
+# Split text longer than Slack's section limit into several texts, at line
+# breaks where possible
+def split_section_text(text: str, size: int = SECTION_TEXT_SIZE) -> List[str]:
+    texts: List[str] = []
+    while len(text) > size:
+        cut = text.rfind("\n", 0, size)
+        if cut <= 0:
+            cut = size
+        texts.append(text[:cut])
+        text = text[cut:]
+    texts.append(text)
+    return texts
 
 
 # Beautify text content
@@ -104,30 +257,71 @@ def chunk_blocks(blocks: List[Dict], chunk_size: int) -> Iterator[List[Dict[str,
         yield blocks[i:i + chunk_size]
 
 
+def block_size(block: Dict[str, Any]) -> int:
+    return len(serialization.dumps_bytes(block))
+
+
+# Pack groups of blocks (e.g. the blocks of one submission each) into as few
+# messages as Slack's limits allow without splitting a group across
+# messages. Only a group too large for any message is split: it fills up the
+# current message and spills over into the following ones. Yields the blocks
+# of every message and the number of groups completed by it.
+def pack_blocks(groups: List[List[Dict[str, Any]]],
+                max_blocks: int = BLOCK_SIZE,
+                max_size: int = MESSAGE_PAYLOAD_SIZE,
+                ) -> Iterator[Tuple[List[Dict[str, Any]], int]]:
+    message: List[Dict[str, Any]] = []
+    size = 0
+    completed = 0
+
+    for group in groups:
+        sizes = [block_size(block) for block in group]
+        fits_alone = len(group) <= max_blocks and sum(sizes) <= max_size
+        if message and fits_alone and (len(message) + len(group) > max_blocks
+                                       or size + sum(sizes) > max_size):
+            yield message, completed
+            message, size, completed = [], 0, 0
+
+        for block, block_bytes in zip(group, sizes):
+            if message and (len(message) >= max_blocks or
+                            size + block_bytes > max_size):
+                yield message, completed
+                message, size, completed = [], 0, 0
+            message.append(block)
+            size += block_bytes
+        completed += 1
+
+    if message:
+        yield message, completed
+
+
 # Handle after standup submission process
 def after_submission(submission: Submission, is_edit: bool = False) -> None:
     now = datetime.now().time()
     publish_time = submission.standup.publish_time
 
     blocks = build_standup([submission], True)
-    if now > publish_time:
-        todays_datetime = datetime(
-            datetime.today().year, datetime.today().month, datetime.today().day
-        )
-        thread = StandupThread.query.filter(
-            and_(
-                StandupThread.standup == submission.standup,
-                StandupThread.created_at >= todays_datetime,
-            )).first()
+    thread = todays_thread(submission.standup) if now > publish_time else None
 
+    # Late submissions go straight to the thread if today's standup was
+    # already published. Otherwise the next publish picks them up. A publish
+    # re-run at the same time may post it instead, whoever claims it first.
+    published_at = datetime.utcnow()
+    if thread and claim_submissions([submission.id], published_at):
         channel = submission.standup.publish_channel
-        client.chat_postMessage(
-            channel=channel,
-            thread_ts=thread.thread_id,
-            blocks=blocks,
-        )
+        try:
+            for message, _ in pack_blocks([blocks]):
+                client.chat_postMessage(
+                    channel=channel,
+                    thread_ts=thread.thread_id,
+                    blocks=message,
+                )
+        except Exception:
+            unclaim_submissions([submission.id], published_at)
+            raise
+        set_committed_value(submission, "published_at", published_at)
         update_users_left_info(channel, thread.thread_id,
-                               submission.standup.team.id)
+                               submission.standup.team_id)
 
     if not is_edit:
         client.chat_postMessage(
@@ -184,28 +378,28 @@ def add_optional_block(post_submit_action: PostSubmitActionEnum) -> List[Dict[st
 # Check if new submission is eligible
 def is_submission_eligible(payload: Dict) -> bool:
     """
-    TODO: Don't allow multiple submissions by same user on same day
+    A view submission can be saved when it comes from a user and a standup
+    form. Repeated submissions of a day are merged by upsert_submission.
     """
-    return True
+    view = payload.get("view") or {}
+    return bool((payload.get("user") or {}).get("id")) and \
+        (view.get("callback_id") or "").count("%") == 1
 
 
 # Post standup user stats after publish
 def post_publish_stat(users: List[User]) -> List[str]:
-    no_submit_users: list = []
     users = users.all()
 
-    for user in users:
-        todays_datetime = datetime(
-            datetime.today().year, datetime.today().month, datetime.today().day
-        )
-
-        submission = user.submission.filter(
-            Submission.created_at >= todays_datetime
-        ).first()
-        if submission is None:
-            no_submit_users.append(f"<@{user.user_id}>")
+    # Users who submitted today, in one query
+    submitted = {user_id for user_id, in (
+        db.session.query(Submission.user_id)
+        .filter(Submission.user_id.in_([user.id for user in users]),
+                Submission.day == standup_day())
+        .group_by(Submission.user_id)
+    )} if users else set()
 
-    return no_submit_users
+    return [f"<@{user.user_id}>" for user in users
+            if user.id not in submitted]
 
 
 # Find how much time left to report
@@ -235,40 +429,9 @@ def time_left(publish_time: str) -> str:
     return text
 
 
-# Show pretty dump of questions from block kit for standup
-def format_standup(standup: Standup) -> Dict[str, Any]:
-    pretty_dict: dict = {**standup}
-    pretty_dict["questions"] = []
-
-    standup_blocks = json.loads(standup["standup_blocks"])
-    blocks = filter(lambda x: x["type"] == "input", standup_blocks["blocks"])
-
-    for block in blocks:
-        pretty_dict["questions"].append(block["label"]["text"])
-
-    return pretty_dict
-
-
 # Convert list of questions to block kit form
 def questions_to_blockkit(questions: List[str]) -> Dict[str, Any]:
-    blockkit_form = {
-        "title": {"type": "plain_text", "text": "Daily Standup", "emoji": True},
-        "submit": {"type": "plain_text", "text": "Submit", "emoji": True},
-        "type": "modal",
-        "close": {"type": "plain_text", "text": "Cancel", "emoji": True},
-        "blocks": [],
-    }
-    blockkit_form["blocks"].append(STANDUP_HELP_SECTION)
-
-    for question in questions:
-        block_template = {
-            "type": "input",
-            "label": {"type": "plain_text", "text": "", "emoji": True},
-            "element": {"type": "plain_text_input", "multiline": True},
-        }
-        block_template["label"]["text"] = question
-        blockkit_form["blocks"].append(block_template)
-    return blockkit_form
+    return forms.blockkit(forms.assign_ids(questions))
 
 
 # prepare data for Standup table
@@ -276,27 +439,11 @@ def prepare_standup_table_data(**payload: Dict[str, Any]) -> Dict[str, Any]:
     data: dict = {}
 
     data["is_active"] = payload.get("is_active", False)
-    data["standup_blocks"] = json.dumps(payload.get("standup_blocks", {}))
     data["trigger"] = payload.get("trigger", "")
 
     return data
 
 
-# Prepare response for fetch user APIs
-def prepare_user_response(users: List[User]) -> List[Dict]:
-    response: List = []
-
-    for user in users:
-        response.append({
-            "id": user.id,
-            "username": user.username,
-            "is_active": user.is_active,
-            "user_id": user.user_id,
-            "team": [team.name for team in user.team],
-        })
-    return response
-
-
 # Prepare response for get user submission API
 def prepare_user_submission(submission: Submission) -> Dict[str, Any]:
     submission_response = dict(
@@ -304,26 +451,20 @@ def prepare_user_submission(submission: Submission) -> Dict[str, Any]:
         submission_id=submission.id,
         user_id=submission.user_id,
         username=submission.user.username,
-        submission=[])
-
-    response_json = json.loads(submission.standup_submission)
-    blocks = response_json.get("blocks", [])
-    blocks = filter(lambda x: x["type"] == "input", blocks)
+        submission=submission_answers(
+            submission.standup_submission,
+            forms.schema(submission.standup_id, submission.form_version)))
 
-    state_dict = response_json.get("state", {})
-
-    for block in blocks:
-        block_id = block["block_id"]
-        action_id = block["element"]["action_id"]
+    return submission_response
 
-        question = block["label"]["text"]
-        answer = state_dict["values"][block_id][action_id]["value"]
 
-        submission_response["submission"].append(
-            {"question": question, "answer": answer}
-        )
-
-    return submission_response
+# Question/answer pairs of a stored standup submission view. `schema` is the
+# form version the submission was made with, see app.forms.
+def submission_answers(standup_submission: str,
+                       schema: forms.Schema = None) -> List[Dict[str, str]]:
+    view = serialization.loads(standup_submission)
+    return [{"question": question, "answer": answer}
+            for question, answer in forms.answers(view, schema)]
 
 
 # List of slash commands available to a user
@@ -378,26 +519,218 @@ def is_get_submission_valid(**params: Dict[str, Any]) -> bool:
 
 # Check if submission exists for a user for current day
 def submission_exists(user: User, standup: Standup) -> Submission:
-    print(standup.trigger)
-    todays_datetime = datetime(
-        datetime.today().year, datetime.today().month, datetime.today().day
+    return Submission.query.filter_by(user_id=user.id, standup_id=standup.id,
+                                      day=standup_day()).first()
+
+
+# Standup of a team of a user (Slack user id) and the user's submission to
+# it today, in one query. `team_name` picks the team, otherwise the user's
+# first team is used. None if the user isn't a member of such a team.
+def open_standup_context(slack_user_id: str, team_name: str = None
+                         ) -> Optional[Tuple[Standup, Optional[Submission]]]:
+    query = workspaces.scoped(
+        db.session.query(Standup, Submission)
+        .join(Team, Team.id == Standup.team_id)
+        .join(association_table, association_table.c.team_id == Team.id)
+        .join(User, User.id == association_table.c.user_id)
+        .outerjoin(Submission, and_(Submission.user_id == User.id,
+                                    Submission.standup_id == Standup.id,
+                                    Submission.day == standup_day()))
+        .filter(User.user_id == slack_user_id), User)
+    if team_name:
+        query = query.filter(Team.name == team_name)
+    return query.order_by(Team.id).first()
+
+
+# Don't expire the objects of the session on commit inside the block, for
+# code that commits several times but only reads rows it loaded itself
+@contextmanager
+def keep_loaded():
+    session = db.session()
+    expire_on_commit = session.expire_on_commit
+    session.expire_on_commit = False
+    try:
+        yield session
+    finally:
+        session.expire_on_commit = expire_on_commit
+
+
+# User (Slack user id) and the standup with `trigger` of a submission, in
+# one query. None when either is unknown.
+def submission_context(slack_user_id: str, trigger: str
+                       ) -> Optional[Tuple[User, Standup]]:
+    query = db.session.query(User, Standup).filter(
+        User.user_id == slack_user_id, Standup.trigger == trigger)
+    query = workspaces.scoped(workspaces.scoped(query, User), Standup)
+    return query.order_by(User.id, Standup.id).first()
+
+
+# Insert today's submission of `user` to `standup`, or replace its answers
+# if it already exists. Returns the submission, attached to the session
+# without reading it back, and whether it was inserted. Postgres does it in
+# one statement and reports an insert as `xmax = 0`; other databases insert
+# with DO NOTHING, which affects no row when the submission exists, and
+# update it then.
+def upsert_submission(user: User, standup: Standup, standup_submission: str,
+                      form_version: int = None) -> Tuple[Submission, bool]:
+    created_at = datetime.utcnow()
+    params = {"user_id": user.id, "standup_id": standup.id,
+              "standup_submission": standup_submission,
+              "form_version": form_version,
+              "day": standup_day(created_at), "created_at": created_at}
+    insert = (
+        "INSERT INTO submission "
+        "(user_id, standup_id, standup_submission, form_version, day, "
+        "created_at) "
+        "VALUES (:user_id, :standup_id, :standup_submission, :form_version, "
+        ":day, :created_at) "
+        "ON CONFLICT (user_id, standup_id, day) "
+    )
+    returning = " RETURNING id, created_at, published_at"
+    columns = {"id": Integer, "created_at": DateTime,
+               "published_at": DateTime}
+    types = {"form_version": Integer, "day": Date, "created_at": DateTime}
+
+    def statement(sql: str, rows: bool = True, **extra_columns):
+        statement = text(sql).bindparams(*(
+            bindparam(name, type_=type_) for name, type_ in types.items()
+            if f":{name}" in sql))
+        return statement.columns(**columns, **extra_columns) if rows \
+            else statement
+
+    if db.session.get_bind().dialect.name == "postgresql":
+        row = db.session.execute(statement(
+            insert + "DO UPDATE "
+            "SET standup_submission = excluded.standup_submission, "
+            "form_version = excluded.form_version"
+            + returning + ", (xmax = 0) AS inserted", inserted=Boolean),
+            params).first()
+        inserted = row.inserted
+    elif _supports_returning():
+        row = db.session.execute(statement(insert + "DO NOTHING" + returning),
+                                 params).first()
+        inserted = row is not None
+    else:
+        result = db.session.execute(
+            statement(insert + "DO NOTHING", rows=False), params)
+        inserted = result.rowcount == 1
+        row = {"id": result.lastrowid, "created_at": params["created_at"],
+               "published_at": None} if inserted else None
+
+    if not inserted:
+        update = (
+            "UPDATE submission SET standup_submission = :standup_submission, "
+            "form_version = :form_version "
+            "WHERE user_id = :user_id AND standup_id = :standup_id "
+            "AND day = :day"
+        )
+        if _supports_returning():
+            row = db.session.execute(statement(update + returning),
+                                     params).first()
+        else:
+            db.session.execute(statement(update, rows=False), params)
+            row = db.session.execute(statement(
+                "SELECT id, created_at, published_at FROM submission "
+                "WHERE user_id = :user_id AND standup_id = :standup_id "
+                "AND day = :day"), params).first()
+    db.session.commit()
+
+    submission = Submission(
+        id=row["id"], user_id=user.id, standup_id=standup.id,
+        standup_submission=standup_submission, form_version=form_version,
+        day=params["day"], created_at=row["created_at"],
+        published_at=row["published_at"])
+    make_transient_to_detached(submission)
+    set_committed_value(submission, "user", user)
+    set_committed_value(submission, "standup", standup)
+    return db.session.merge(submission, load=False), inserted
+
+
+# RETURNING is supported by Postgres and SQLite >= 3.35
+def _supports_returning() -> bool:
+    dialect = db.session.get_bind().dialect
+    if dialect.name == "sqlite":
+        return dialect.server_version_info >= (3, 35)
+    return True
+
+
+# Thread of today's publish of a standup
+def todays_thread(standup: Standup) -> Optional[StandupThread]:
+    return (
+        StandupThread.query.filter(
+            and_(
+                StandupThread.standup_id == standup.id,
+                StandupThread.day == standup_day(),
+            ))
+        .order_by(StandupThread.id)
+        .first()
     )
 
-    return Submission.query.filter(
-        and_(Submission.user_id == user.id,
-             Submission.created_at >= todays_datetime,
-             Submission.standup == standup,
-             )).first()
+
+# Claim unpublished submissions for posting to the standup thread by
+# setting their published_at to `token`. The conditional update lets a
+# single publish or late submission post each of them. Returns the ids of
+# the claimed submissions.
+def claim_submissions(ids: List[int], token: datetime) -> Set[int]:
+    if not ids:
+        return set()
+    claimed = Submission.query.filter(
+        and_(Submission.id.in_(ids), Submission.published_at.is_(None))
+    ).update({Submission.published_at: token}, synchronize_session=False)
+    db.session.commit()
+
+    if claimed == len(ids):
+        return set(ids)
+    if not claimed:
+        return set()
+    return {id for id, in db.session.query(Submission.id).filter(
+        and_(Submission.id.in_(ids), Submission.published_at == token))}
+
+
+# Release the claim on submissions that couldn't be posted, so that the next
+# publish posts them
+def unclaim_submissions(ids: List[int], token: datetime) -> None:
+    db.session.rollback()
+    Submission.query.filter(
+        and_(Submission.id.in_(ids), Submission.published_at == token)
+    ).update({Submission.published_at: None}, synchronize_session=False)
+    db.session.commit()
+
+
+# Mark a standup as being published. The conditional update lets the
+# database pick a single winner among concurrent publishes in any worker.
+# Returns the lock token, or None if another publish holds the lock.
+def acquire_publish_lock(standup: Standup) -> Optional[datetime]:
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=PUBLISH_LOCK_TIMEOUT)
+
+    acquired = Standup.query.filter(
+        and_(
+            Standup.id == standup.id,
+            or_(Standup.publishing_since.is_(None),
+                Standup.publishing_since < stale),
+        )).update({Standup.publishing_since: now}, synchronize_session=False)
+    db.session.commit()
+    return now if acquired else None
+
+
+def release_publish_lock(standup: Standup, token: datetime) -> None:
+    db.session.rollback()
+    Standup.query.filter(
+        and_(Standup.id == standup.id, Standup.publishing_since == token)
+    ).update({Standup.publishing_since: None}, synchronize_session=False)
+    db.session.commit()
 
 
 # Create block kit view for standup
 def get_standup_view(standup: Standup) -> str:
     standup_str = standup.standup_blocks
 
-    standup_blocks = json.loads(standup_str)
+    standup_blocks = serialization.loads(standup_str)
     standup_blocks["callback_id"] = f"submit_standup%{standup.trigger}"
+    forms.tag_view(standup_blocks, standup)
 
-    return json.dumps(standup_blocks)
+    return serialization.dumps(standup_blocks)
 
 
 # Get section to show users left for submission
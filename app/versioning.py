@@ -0,0 +1,131 @@
+import hashlib
+import random
+from functools import wraps
+from typing import Dict, Iterable, Set, Tuple
+
+from flask import request, make_response
+from sqlalchemy import and_, event, func, or_
+from sqlalchemy.orm import Session
+
+import app.replica as replica
+from app.models import ResourceVersion, Standup, Team, User, db
+
+# Resources whose versions are tracked, by model
+RESOURCES = {Standup: "standup", Team: "team", User: "user"}
+
+# Version rows per resource. A write bumps the shard of the row it writes, so
+# concurrent writes to different rows don't queue on one version row. The
+# migrations seed this many shards, changing it needs a migration.
+SHARDS = 16
+
+
+def _shard(obj) -> int:
+    return obj.id % SHARDS if obj.id is not None else random.randrange(SHARDS)
+
+
+def _resources(objects: Iterable) -> Set[Tuple[str, int]]:
+    return {(RESOURCES[type(obj)], _shard(obj))
+            for obj in objects if type(obj) in RESOURCES}
+
+
+def _any_shard(resources: Iterable[str]) -> Set[Tuple[str, int]]:
+    return {(resource, random.randrange(SHARDS)) for resource in resources}
+
+
+def _bump(session: Session, shards: Set[Tuple[str, int]]) -> None:
+    if not shards:
+        return
+    session.execute(
+        ResourceVersion.__table__.update()
+        .where(or_(*(and_(ResourceVersion.resource == resource,
+                          ResourceVersion.shard == shard)
+                     for resource, shard in sorted(shards))))
+        .values(version=ResourceVersion.version + 1))
+
+
+# Tables made by `create_all` (empty databases, tests, benchmarks) get their
+# version rows like the migrated ones
+@event.listens_for(ResourceVersion.__table__, "after_create")
+def _seed(table, connection, **kwargs):
+    connection.execute(table.insert(), [
+        {"resource": resource, "shard": shard, "version": 0}
+        for resource in sorted(RESOURCES.values()) for shard in range(SHARDS)
+    ])
+
+
+# Writes bump the versions in the transaction that makes them, so a version
+# never changes without the data (or the other way round).
+@event.listens_for(Session, "after_flush")
+def _after_flush(session, flush_context):
+    _bump(session, _resources(session.new) | _resources(session.dirty) |
+          _resources(session.deleted))
+
+
+@event.listens_for(Session, "after_bulk_update")
+def _after_bulk_update(update_context):
+    _bump(update_context.session,
+          _any_shard({RESOURCES.get(update_context.mapper.class_)} - {None}))
+
+
+@event.listens_for(Session, "after_bulk_delete")
+def _after_bulk_delete(delete_context):
+    _bump(delete_context.session,
+          _any_shard({RESOURCES.get(delete_context.mapper.class_)} - {None}))
+
+
+# Bump the versions of `resources` for writes that bypass the unit of work
+# and its events, e.g. `bulk_update_mappings`. Call in the same transaction.
+def bump(*resources: str) -> None:
+    _bump(db.session, _any_shard(resources))
+
+
+def _read(resources: Iterable[str]) -> Dict[str, int]:
+    resources = sorted(resources)
+    rows = dict(
+        db.session.query(ResourceVersion.resource,
+                         func.sum(ResourceVersion.version))
+        .filter(ResourceVersion.resource.in_(resources))
+        .group_by(ResourceVersion.resource)
+    )
+    return {resource: int(rows.get(resource) or 0) for resource in resources}
+
+
+# Current versions of `resources`, the sum of their shards. Read from the
+# primary even in read-only requests, a lagging replica would answer 304 to
+# a client that already saw newer data. Read only: the migrations and
+# `create_all` seed the version rows, a resource without any is at version 0.
+def versions(resources: Iterable[str]) -> Dict[str, int]:
+    with replica.primary():
+        return _read(resources)
+
+
+def etag(current: Dict[str, int]) -> str:
+    key = request.full_path + "|" + ",".join(
+        f"{resource}:{version}" for resource, version in sorted(current.items()))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+# Serve a read API with an ETag made of the URL and the versions of the
+# resources it returns. A request whose If-None-Match matches gets a 304
+# before the view runs. The body of a request routed to the replica is read
+# from the primary while the replica is behind the versions of the ETag.
+def conditional(*resources: str):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            current = versions(resources)
+            tag = etag(current)
+            if tag in request.if_none_match:
+                response = make_response("", 304)
+            elif replica.is_routed() and _read(resources) != current:
+                with replica.primary():
+                    response = make_response(func(*args, **kwargs))
+            else:
+                response = make_response(func(*args, **kwargs))
+            if response.status_code not in (200, 304):
+                return response
+            response.set_etag(tag)
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,60 @@
+from collections import namedtuple
+from typing import Optional, List
+
+from flask import g, has_app_context
+
+from app.models import Workspace, Team
+
+# What the Slack client needs to know about the workspace of a request. A
+# plain tuple, so that resolving the client never loads (expired) ORM rows.
+WorkspaceInfo = namedtuple("WorkspaceInfo",
+                           ["id", "slack_team_id", "bot_token",
+                            "signing_secret"])
+
+
+# Active workspace with Slack's team id `slack_team_id`
+def for_slack_team(slack_team_id: Optional[str]) -> Optional[Workspace]:
+    if not slack_team_id:
+        return None
+    return Workspace.query.filter_by(slack_team_id=slack_team_id,
+                                     is_active=True).first()
+
+
+# Make `workspace` the workspace of the current request: the Slack client
+# and signature verifier of `app` use its credentials from now on.
+def activate(workspace: Optional[Workspace]) -> None:
+    if workspace is None:
+        g.pop("workspace", None)
+        return
+    g.workspace = WorkspaceInfo(workspace.id, workspace.slack_team_id,
+                                workspace.bot_token, workspace.signing_secret)
+
+
+def current() -> Optional[WorkspaceInfo]:
+    return g.get("workspace") if has_app_context() else None
+
+
+def current_id() -> Optional[int]:
+    workspace = current()
+    return workspace.id if workspace else None
+
+
+# Restrict a query on a team-scoped model to the current workspace. Does
+# nothing outside of multi-workspace requests.
+def scoped(query, model):
+    workspace = current()
+    if workspace is None:
+        return query
+    return query.filter(model.workspace_id == workspace.id)
+
+
+# Teams named `name`, at most two. Team names are unique per workspace, so
+# the teams are looked up in the workspace of the current request, or the
+# one with Slack's team id `slack_team_id`. With neither, the name may match
+# teams of several workspaces.
+def teams_named(name: str, slack_team_id: str = None) -> List[Team]:
+    query = scoped(Team.query, Team).filter(Team.name == name)
+    if slack_team_id:
+        query = query.join(Workspace, Workspace.id == Team.workspace_id) \
+            .filter(Workspace.slack_team_id == slack_team_id)
+    return query.order_by(Team.id).limit(2).all()
@@ -0,0 +1,35 @@
+import os
+import sys
+import tempfile
+
+# The app reads its configuration from the environment at import time. Give
+# the benchmarks a throwaway database and dummy Slack credentials unless the
+# caller provides their own.
+os.environ.setdefault("SLACK_API_TOKEN", "xoxb-benchmark")
+os.environ.setdefault("SLACK_SIGNING_SECRET", "benchmark-signing-secret")
+os.environ.setdefault("ENVIRONMENT", "DEBUG")
+DEFAULT_DATABASE_URI = "sqlite:///" + os.path.join(tempfile.gettempdir(),
+                                                   "slate-benchmark.db")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", DEFAULT_DATABASE_URI)
+# Slack's rate limits don't apply to the fake Slack clients
+os.environ.setdefault("DIRECTORY_SYNC_RATE", "0")
+os.environ.setdefault("DIGEST_POST_RATE", "0")
+
+
+# The benchmarks drop and recreate every table. Refuse to touch any database
+# but the throwaway one (or an in-memory Sqlite DB) unless `i_know` is set,
+# e.g. when SQLALCHEMY_DATABASE_URI of the shell points at a real database.
+def check_database(i_know: bool) -> None:
+    uri = os.environ["SQLALCHEMY_DATABASE_URI"]
+    if uri in (DEFAULT_DATABASE_URI, "sqlite://", "sqlite:///:memory:") \
+            or i_know:
+        return
+    sys.exit(f"Refusing to drop all tables of {uri}. Unset "
+             "SQLALCHEMY_DATABASE_URI to use a throwaway Sqlite DB, or pass "
+             "--i-know to wipe this database.")
+
+
+def add_database_argument(parser) -> None:
+    parser.add_argument("--i-know", action="store_true",
+                        help="Drop and recreate the tables of a database "
+                             "other than the throwaway Sqlite DB")
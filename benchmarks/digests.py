@@ -0,0 +1,100 @@
+"""
+Time building a week of digests for every team: replaying `build_standup`
+over every day against the digest job, in this process and with a pool of
+worker processes.
+
+    python -m benchmarks.digests --teams 20 --users 500 --days 7 --workers 4
+
+The worker processes open the benchmark database themselves, so it must be
+a file or a server, not an in-memory Sqlite DB.
+"""
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+from typing import Dict, Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import benchmarks  # noqa: F401  (test environment defaults)
+from benchmarks import workspace, fake_slack
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--teams", type=int, default=10)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--memberships", type=int, default=1)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--post", action="store_true",
+                        help="Also post the digests to the fake Slack client")
+    parser.add_argument("--seed", type=int, default=42)
+    benchmarks.add_database_argument(parser)
+    args = parser.parse_args(argv)
+    benchmarks.check_database(args.i_know)
+
+    from app import create_app
+    from app.models import Standup, Submission, db
+    import app.utils as utils
+    import app.digests as digests
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        dataset = workspace.generate(
+            teams=args.teams, users=args.users, memberships=args.memberships,
+            days=args.days, seed=args.seed)
+        slack = fake_slack.install(fake_slack.FakeSlackClient())
+
+        queries = {"count": 0}
+        event.listen(Engine, "before_cursor_execute",
+                     lambda *_, **__: queries.__setitem__(
+                         "count", queries["count"] + 1))
+
+        today = datetime.utcnow().date()
+        start = today - timedelta(days=args.days - 1)
+        end = start + timedelta(days=6)
+
+        # The digest of every team as it is built today: one publish's
+        # blocks per day
+        def replay():
+            for standup in Standup.query.filter(Standup.is_active):
+                day = start
+                while day <= end:
+                    midnight = datetime.combine(day, datetime.min.time())
+                    utils.build_standup(Submission.query.filter(
+                        Submission.standup_id == standup.id,
+                        Submission.created_at >= midnight,
+                        Submission.created_at < midnight + timedelta(days=1),
+                    ).all())
+                    day += timedelta(days=1)
+
+        runs: Dict[str, Any] = {
+            "replay build_standup": replay,
+            "digests, 1 process": lambda: digests.build(
+                "week", start, workers=1, post=args.post),
+            f"digests, {args.workers} workers": lambda: digests.build(
+                "week", start, workers=args.workers, post=args.post),
+        }
+
+        print(f"{dataset['submissions']} submissions of {args.teams} teams, "
+              f"{start} to {end}", file=sys.stderr)
+        print(f"{'':<28}{'seconds':>10}{'queries':>10}{'slack calls':>14}")
+        for name, func in runs.items():
+            db.session.expire_all()
+            slack.reset()
+            start_queries = queries["count"]
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            db.session.rollback()
+            print(f"{name:<28}{elapsed:>10.3f}"
+                  f"{queries['count'] - start_queries:>10}"
+                  f"{sum(slack.calls.values()):>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import sys
+import time
+import itertools
+from collections import Counter
+from typing import Dict, Any, List
+
+# Modules holding a reference to the Slack client
+CLIENT_MODULES = ("app.utils", "app.routes", "app.handlers", "app.reminders",
+                  "app.directory", "app.digests")
+
+
+# Stand-in for `slack_sdk.WebClient` that answers every call locally and
+# counts calls per Slack API method.
+class FakeSlackClient:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        # Members returned by users.list
+        self.members: List[Dict[str, Any]] = []
+        self.calls: Counter = Counter()
+        self._ts = itertools.count(1)
+
+    def api_call(self, api_method: str, **kwargs) -> Dict[str, Any]:
+        self.calls[api_method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return {"ok": True, "ts": f"{time.time():.0f}.{next(self._ts):06d}",
+                "channel": kwargs.get("channel")}
+
+    def chat_postMessage(self, **kwargs):
+        return self.api_call("chat.postMessage", **kwargs)
+
+    def chat_update(self, **kwargs):
+        return self.api_call("chat.update", **kwargs)
+
+    def views_open(self, **kwargs):
+        return self.api_call("views.open", **kwargs)
+
+    def users_list(self, limit: int = 200, cursor: str = None, **kwargs):
+        self.api_call("users.list", **kwargs)
+        start = int(cursor or 0)
+        end = start + limit
+        return {"ok": True, "members": self.members[start:end],
+                "response_metadata": {
+                    "next_cursor": str(end) if end < len(self.members) else ""}}
+
+    def reset(self) -> None:
+        self.calls.clear()
+
+
+# Point every loaded module of the app at `fake` instead of the real client.
+# Call after `create_app()` so that the routes are imported.
+def install(fake: FakeSlackClient) -> FakeSlackClient:
+    for name in CLIENT_MODULES:
+        if name in sys.modules:
+            sys.modules[name].client = fake
+    return fake
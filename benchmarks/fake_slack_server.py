@@ -0,0 +1,157 @@
+"""
+Local stand-in for the Slack Web API.
+
+    python -m benchmarks.fake_slack_server --port 8099 --latency 0.05 --rate-limit 50
+
+Point the app at it with SLACK_API_URL=http://localhost:8099/api/. GET /stats
+returns the calls served per method, POST /reset clears them.
+"""
+import json
+import time
+import random
+import argparse
+import threading
+import itertools
+from collections import Counter, defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeSlackState:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0,
+                 rate_limit: float = 0.0, error_rate: float = 0.0,
+                 retry_after: int = 1, seed: int = None):
+        self.latency = latency
+        self.jitter = jitter
+        # Calls per second allowed per method before answering 429
+        self.rate_limit = rate_limit
+        # Fraction of calls answered with 429 regardless of the rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.ts = itertools.count(1)
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.calls = Counter()
+            self.rate_limited = Counter()
+            self.windows = defaultdict(deque)
+
+    # True if this call has to be rejected with 429
+    def throttle(self, method: str) -> bool:
+        now = time.monotonic()
+        with self.lock:
+            self.calls[method] += 1
+            limited = self.error_rate and self.rng.random() < self.error_rate
+
+            if self.rate_limit and not limited:
+                window = self.windows[method]
+                while window and now - window[0] > 1:
+                    window.popleft()
+                limited = len(window) >= self.rate_limit
+                if not limited:
+                    window.append(now)
+
+            if limited:
+                self.rate_limited[method] += 1
+            return bool(limited)
+
+    def delay(self) -> float:
+        return max(0.0, self.latency + self.rng.uniform(-self.jitter,
+                                                        self.jitter))
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"calls": dict(self.calls),
+                    "rate_limited": dict(self.rate_limited),
+                    "total": sum(self.calls.values())}
+
+
+class FakeSlackHandler(BaseHTTPRequestHandler):
+    state: FakeSlackState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: dict, headers: dict = None) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            return self._send(200, self.state.stats())
+        return self._send(404, {"ok": False, "error": "unknown_method"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+
+        if self.path.rstrip("/") == "/reset":
+            self.state.reset()
+            return self._send(200, {"ok": True})
+
+        method = self.path.split("?")[0].rstrip("/").rsplit("/", 1)[-1]
+        time.sleep(self.state.delay())
+
+        if self.state.throttle(method):
+            return self._send(429, {"ok": False, "error": "ratelimited"},
+                              {"Retry-After": str(self.state.retry_after)})
+
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            payload = {}
+
+        self._send(200, {
+            "ok": True,
+            "channel": payload.get("channel"),
+            "ts": f"{time.time():.0f}.{next(self.state.ts):06d}",
+            "view": {"id": f"V{next(self.state.ts):010d}"},
+        })
+
+
+# Start the fake API on a background thread. Returns the server and its state.
+def serve(host: str = "127.0.0.1", port: int = 0, **options):
+    state = FakeSlackState(**options)
+    handler = type("Handler", (FakeSlackHandler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Slack Web API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Seconds added to every call")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0,
+                        help="Calls per second per method before 429s")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of calls answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    server, _ = serve(args.host, args.port, latency=args.latency,
+                      jitter=args.jitter, rate_limit=args.rate_limit,
+                      error_rate=args.error_rate,
+                      retry_after=args.retry_after)
+    print(f"Fake Slack API on http://{args.host}:{server.server_port}/api/")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
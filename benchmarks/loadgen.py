@@ -0,0 +1,490 @@
+"""
+Load test the Slack endpoints the way Slack calls them.
+
+    python -m benchmarks.loadgen run --target http://localhost:5000 \\
+        --curve spike --rate 5 --spike-rate 80 --duration 120 \\
+        --slack-stats http://localhost:8099
+    python -m benchmarks.loadgen anonymize captured.jsonl anonymized.jsonl
+    python -m benchmarks.loadgen run --replay anonymized.jsonl --rate 20
+
+Requests are signed with SLACK_SIGNING_SECRET the same way Slack signs them,
+so the target must run with the same secret.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import string
+import hashlib
+import argparse
+import threading
+import itertools
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Iterator, Tuple
+from urllib.parse import urlencode, parse_qsl
+
+import requests
+from slack_sdk.signature import SignatureVerifier
+
+import benchmarks  # noqa: F401  (test environment defaults)
+from benchmarks.workspace import QUESTIONS, random_answer
+
+TRIGGER_PATH = "/slack/standup-trigger/"
+INTERACTION_PATH = "/slack/submit_standup/"
+FORM_CONTENT_TYPE = "application/x-www-form-urlencoded"
+
+
+# Arrival rate (requests per second) at `t` seconds into the run
+def rate_curve(args) -> Callable[[float], float]:
+    if args.curve == "ramp":
+        return lambda t: args.rate * min(1.0, t / max(args.duration, 1e-9))
+    if args.curve == "spike":
+        def spike(t):
+            if args.spike_at <= t < args.spike_at + args.spike_duration:
+                return args.spike_rate
+            return args.rate
+        return spike
+    return lambda t: args.rate
+
+
+# Send times of a non-homogeneous Poisson process (thinning)
+def arrivals(curve: Callable[[float], float], duration: float,
+             max_rate: float, rng: random.Random) -> Iterator[float]:
+    t = 0.0
+    while max_rate > 0:
+        t += rng.expovariate(max_rate)
+        if t >= duration:
+            return
+        if rng.random() <= curve(t) / max_rate:
+            yield t
+
+
+class PayloadFactory:
+    def __init__(self, roster: List[Tuple[str, str]], rng: random.Random):
+        self.roster = roster
+        self.rng = rng
+
+    def _trigger_id(self) -> str:
+        return (f"{self.rng.randint(10 ** 9, 10 ** 10)}."
+                f"{self.rng.randint(10 ** 9, 10 ** 10)}."
+                f"{''.join(self.rng.choices('0123456789abcdef', k=32))}")
+
+    def slash_command(self) -> Tuple[str, Dict[str, str]]:
+        user_id, team = self.rng.choice(self.roster)
+        return TRIGGER_PATH, {
+            "token": "loadgen",
+            "team_id": "T0LOADGEN",
+            "command": "/standup",
+            "text": team,
+            "user_id": user_id,
+            "user_name": user_id.lower(),
+            "response_url": "https://hooks.slack.com/commands/loadgen",
+            "trigger_id": self._trigger_id(),
+        }
+
+    def block_action(self) -> Tuple[str, Dict[str, str]]:
+        user_id, team = self.rng.choice(self.roster)
+        payload = {
+            "type": "block_actions",
+            "user": {"id": user_id},
+            "team": {"id": "T0LOADGEN"},
+            "trigger_id": self._trigger_id(),
+            "actions": [{"block_id": f"open_standup%{team}",
+                         "action_id": "open_dialog",
+                         "value": "open_dialog"}],
+        }
+        return INTERACTION_PATH, {"payload": json.dumps(payload)}
+
+    def view_submission(self) -> Tuple[str, Dict[str, str]]:
+        user_id, team = self.rng.choice(self.roster)
+        blocks = []
+        values = {}
+        for idx, question in enumerate(QUESTIONS):
+            block_id = f"q{idx}"
+            blocks.append({
+                "type": "input",
+                "block_id": block_id,
+                "label": {"type": "plain_text", "text": question},
+                "element": {"type": "plain_text_input", "multiline": True,
+                            "action_id": "answer"},
+            })
+            values[block_id] = {"answer": {"type": "plain_text_input",
+                                           "value": random_answer(self.rng)}}
+        payload = {
+            "type": "view_submission",
+            "user": {"id": user_id},
+            "team": {"id": "T0LOADGEN"},
+            "trigger_id": self._trigger_id(),
+            "view": {
+                "id": "V" + "".join(self.rng.choices(string.digits, k=10)),
+                "hash": "".join(self.rng.choices(string.hexdigits, k=16)),
+                "type": "modal",
+                "callback_id": f"submit_standup%{team}",
+                "blocks": blocks,
+                "state": {"values": values},
+            },
+        }
+        return INTERACTION_PATH, {"payload": json.dumps(payload)}
+
+
+# Users and their teams known to the target
+def fetch_roster(target: str, auth: str) -> List[Tuple[str, str]]:
+    response = requests.get(f"{target}/api/get_users/",
+                            headers={"Authorization": auth or ""}, timeout=30)
+    response.raise_for_status()
+    return [(user["user_id"], team)
+            for user in response.json().get("users", [])
+            if user.get("is_active") and user.get("user_id")
+            for team in user.get("team", []) if team]
+
+
+def signed_headers(verifier: SignatureVerifier, body: str,
+                   content_type: str = FORM_CONTENT_TYPE) -> Dict[str, str]:
+    timestamp = str(int(time.time()))
+    return {
+        "Content-Type": content_type,
+        "X-Slack-Request-Timestamp": timestamp,
+        "X-Slack-Signature": verifier.generate_signature(timestamp=timestamp,
+                                                         body=body),
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def record(self, kind: str, latency: float, status) -> None:
+        with self.lock:
+            self.latencies[kind].append(latency)
+            self.statuses[kind][status] += 1
+
+    def report(self) -> Dict[str, Any]:
+        report = {}
+        for kind, latencies in self.latencies.items():
+            latencies = sorted(latencies)
+            statuses = self.statuses[kind]
+            errors = sum(count for status, count in statuses.items()
+                         if not isinstance(status, int) or status >= 400)
+            report[kind] = {
+                "requests": len(latencies),
+                "error_rate": errors / len(latencies),
+                "statuses": {str(k): v for k, v in statuses.items()},
+                **{f"p{pct}": percentile(latencies, pct)
+                   for pct in (50, 90, 95, 99)},
+                "max": latencies[-1],
+            }
+        return report
+
+
+def percentile(values: List[float], pct: float) -> float:
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def send(target: str, verifier: SignatureVerifier, kind: str, path: str,
+         body: str, content_type: str, recorder: Recorder,
+         timeout: float) -> None:
+    start = time.perf_counter()
+    try:
+        response = _session().post(
+            target + path, data=body.encode(), timeout=timeout,
+            headers=signed_headers(verifier, body, content_type))
+        status = response.status_code
+    except requests.RequestException as e:
+        status = type(e).__name__
+    recorder.record(kind, time.perf_counter() - start, status)
+
+
+def load_replay(path: str) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# Maps the user ids of replayed requests onto users known to the target so
+# that anonymized captures can be replayed against a seeded database.
+class UserRemapper:
+    USER_PATTERN = re.compile(r"\bU[A-Z0-9]{7,}\b")
+
+    def __init__(self, user_ids: List[str]):
+        self.targets = itertools.cycle(sorted(set(user_ids)))
+        self.mapping: Dict[str, str] = {}
+
+    def _user(self, match) -> str:
+        user_id = match.group(0)
+        if user_id not in self.mapping:
+            self.mapping[user_id] = next(self.targets)
+        return self.mapping[user_id]
+
+    def body(self, body: str) -> str:
+        return self.USER_PATTERN.sub(self._user, body)
+
+
+# Gives the trigger ids and view hashes of replayed requests fresh values on
+# every pass over the capture after the first, so that looping a capture
+# doesn't resend ids the target has already deduplicated. The same id maps
+# to the same value within a pass, which keeps replayed sessions consistent.
+class ReplayRefresher:
+    TRIGGER_PATTERN = re.compile(r"\b(\d+\.\d+\.)([0-9a-f]{32})\b")
+    HASH_KEYS = {"hash", "previous_view_hash"}
+
+    def __init__(self, replay_pass: int):
+        self.replay_pass = replay_pass
+
+    def _digest(self, value: str, length: int) -> str:
+        digest = hashlib.sha256(
+            f"{self.replay_pass}:{value}".encode()).hexdigest()
+        return (digest * (length // len(digest) + 1))[:length]
+
+    def _trigger(self, match) -> str:
+        return match.group(1) + self._digest(match.group(2), 32)
+
+    def value(self, value, key: str = None):
+        if isinstance(value, dict):
+            return {k: self.value(v, k) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.value(v, key) for v in value]
+        if isinstance(value, str):
+            if key in self.HASH_KEYS:
+                head, dot, tail = value.rpartition(".")
+                return head + dot + self._digest(tail, len(tail))
+            if key == "payload":
+                return json.dumps(self.value(json.loads(value)))
+            return self.TRIGGER_PATTERN.sub(self._trigger, value)
+        return value
+
+    def body(self, body: str) -> str:
+        if not self.replay_pass:
+            return body
+        form = dict(parse_qsl(body, keep_blank_values=True))
+        return urlencode(self.value(form))
+
+
+# Captured records, looped forever, with the number of the pass over them
+def replay_records(records: List[Dict[str, Any]]) \
+        -> Iterator[Tuple[int, Dict[str, Any]]]:
+    for replay_pass in itertools.count():
+        for record in records:
+            yield replay_pass, record
+
+
+def _replay_kind(record: Dict[str, Any]) -> str:
+    if record["path"] == TRIGGER_PATH:
+        return "slash_command"
+    match = re.search(r'"type"\s*:\s*"(\w+)"', record.get("body", ""))
+    return f"replay:{match.group(1)}" if match else "replay"
+
+
+def run(args) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    verifier = SignatureVerifier(args.signing_secret)
+    recorder = Recorder()
+    curve = rate_curve(args)
+    max_rate = max(args.rate, args.spike_rate if args.curve == "spike" else 0)
+
+    if args.replay:
+        records = replay_records(load_replay(args.replay))
+        remapper = None
+        if args.remap_users:
+            remapper = UserRemapper([user_id for user_id, _ in
+                                     fetch_roster(args.target, args.auth)])
+
+        def next_request():
+            replay_pass, record = next(records)
+            body = ReplayRefresher(replay_pass).body(record["body"])
+            if remapper:
+                form = dict(parse_qsl(body, keep_blank_values=True))
+                body = urlencode({k: remapper.body(v) for k, v in form.items()})
+            return (_replay_kind(record), record["path"], body,
+                    record.get("content_type") or FORM_CONTENT_TYPE)
+    else:
+        roster = fetch_roster(args.target, args.auth)
+        if not roster:
+            sys.exit("The target has no active users in any team. Seed it "
+                     "first, e.g. with benchmarks.workspace.")
+        factory = PayloadFactory(roster, rng)
+        mix = dict(part.split("=") for part in args.mix.split(","))
+        kinds = list(mix)
+        weights = [float(mix[kind]) for kind in kinds]
+
+        def next_request():
+            kind = rng.choices(kinds, weights)[0]
+            path, form = getattr(factory, kind)()
+            return kind, path, urlencode(form), FORM_CONTENT_TYPE
+
+    if args.slack_stats:
+        requests.post(f"{args.slack_stats}/reset", timeout=5)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for at in arrivals(curve, args.duration, max_rate, rng):
+            delay = started + at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            kind, path, body, content_type = next_request()
+            pool.submit(send, args.target, verifier, kind, path, body,
+                        content_type, recorder, args.timeout)
+    elapsed = time.monotonic() - started
+
+    report = {
+        "config": {k: v for k, v in vars(args).items()
+                   if k not in ("func", "signing_secret", "auth")},
+        "elapsed": elapsed,
+        "ack": recorder.report(),
+    }
+    if args.slack_stats:
+        report["slack"] = requests.get(f"{args.slack_stats}/stats",
+                                       timeout=5).json()
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"{'kind':<24}{'reqs':>7}{'err%':>7}{'p50':>9}{'p90':>9}{'p99':>9}"
+          f"{'max':>9}")
+    for kind, stats in sorted(report["ack"].items()):
+        print(f"{kind:<24}{stats['requests']:>7}"
+              f"{stats['error_rate'] * 100:>6.1f}%"
+              + "".join(f"{stats[key] * 1000:>7.0f}ms"
+                        for key in ("p50", "p90", "p99", "max")))
+    if "slack" in report:
+        print(f"\nSlack API calls: {report['slack']['total']}")
+        for method, count in sorted(report["slack"]["calls"].items()):
+            limited = report["slack"]["rate_limited"].get(method, 0)
+            print(f"  {method:<22}{count:>7} ({limited} rate limited)")
+
+
+# Replaces identifiers and free text of captured Slack requests. The same
+# input id always maps to the same pseudonym so that replayed sessions stay
+# consistent.
+class Anonymizer:
+    ID_PATTERN = re.compile(r"\b([UWTCVBGDE])[A-Z0-9]{7,}\b")
+    TRIGGER_PATTERN = re.compile(r"\b\d+\.\d+\.[0-9a-f]{32}\b")
+    NAME_KEYS = {"name", "username", "user_name", "real_name", "display_name",
+                 "team_domain", "channel_name", "domain"}
+    TEXT_KEYS = {"value"}
+
+    def __init__(self, salt: str = "", scrub_text: bool = True):
+        self.salt = salt
+        self.scrub_text = scrub_text
+
+    def _digest(self, value: str) -> str:
+        return hashlib.sha256((self.salt + value).encode()).hexdigest()
+
+    def _id(self, match) -> str:
+        digest = self._digest(match.group(0)).upper()
+        return match.group(1) + "".join(
+            c for c in digest if c in string.ascii_uppercase + string.digits
+        )[:10]
+
+    def _trigger(self, match) -> str:
+        head, _, tail = match.group(0).rpartition(".")
+        return f"{head}.{self._digest(tail)[:32]}"
+
+    def _text(self, text: str) -> str:
+        rng = random.Random(self._digest(text))
+        return re.sub(r"[A-Za-z]+", lambda m: "".join(
+            rng.choices(string.ascii_lowercase, k=len(m.group(0)))), text)
+
+    def string(self, value: str) -> str:
+        value = self.TRIGGER_PATTERN.sub(self._trigger, value)
+        return self.ID_PATTERN.sub(self._id, value)
+
+    def value(self, value, key: str = None):
+        if isinstance(value, dict):
+            return {k: self.value(v, k) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.value(v, key) for v in value]
+        if isinstance(value, str):
+            if key in self.NAME_KEYS:
+                return "user-" + self._digest(value)[:8]
+            if key in self.TEXT_KEYS and self.scrub_text:
+                return self._text(value)
+            if key == "payload":
+                return json.dumps(self.value(json.loads(value)))
+            return self.string(value)
+        return value
+
+    def record(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        form = dict(parse_qsl(record["body"], keep_blank_values=True))
+        return {**record, "body": urlencode(self.value(form))}
+
+
+def anonymize(args) -> None:
+    anonymizer = Anonymizer(salt=args.salt, scrub_text=not args.keep_text)
+    with open(args.source) as source, open(args.destination, "w") as dest:
+        for line in source:
+            if line.strip():
+                record = anonymizer.record(json.loads(line))
+                dest.write(json.dumps(record) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split("\n")[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Generate load")
+    run_parser.add_argument("--target", default="http://localhost:5000")
+    run_parser.add_argument("--signing-secret",
+                            default=os.environ["SLACK_SIGNING_SECRET"])
+    run_parser.add_argument("--auth", default=os.environ.get("SLATE_AUTH"),
+                            help="Authorization token of the target APIs")
+    run_parser.add_argument("--duration", type=float, default=60)
+    run_parser.add_argument("--curve", choices=["constant", "ramp", "spike"],
+                            default="constant")
+    run_parser.add_argument("--rate", type=float, default=5,
+                            help="Requests per second")
+    run_parser.add_argument("--spike-rate", type=float, default=50)
+    run_parser.add_argument("--spike-at", type=float, default=10)
+    run_parser.add_argument("--spike-duration", type=float, default=20)
+    run_parser.add_argument("--mix",
+                            default="slash_command=3,block_action=2,"
+                                    "view_submission=5",
+                            help="Relative weights of payload kinds")
+    run_parser.add_argument("--replay",
+                            help="JSONL of captured requests to replay")
+    run_parser.add_argument("--remap-users", action="store_true",
+                            help="Replace replayed user ids with users of "
+                                 "the target")
+    run_parser.add_argument("--concurrency", type=int, default=32)
+    run_parser.add_argument("--timeout", type=float, default=10)
+    run_parser.add_argument("--slack-stats",
+                            help="Base URL of benchmarks.fake_slack_server")
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("-o", "--output", help="Write report as JSON")
+
+    anon_parser = subparsers.add_parser(
+        "anonymize", help="Anonymize captured requests for replay")
+    anon_parser.add_argument("source")
+    anon_parser.add_argument("destination")
+    anon_parser.add_argument("--salt", default="")
+    anon_parser.add_argument("--keep-text", action="store_true",
+                             help="Keep submission answers as they are")
+
+    args = parser.parse_args(argv)
+    if args.command == "anonymize":
+        return anonymize(args)
+
+    report = run(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Time opening the standup modal with `/standup <team>` end to end: signed
+request, handler and the views.open call to the fake Slack Web API server.
+
+    python -m benchmarks.open_view --users 200 --requests 500 --latency 0.02
+
+Users with a submission today get the filled edit view, the others the
+blank form. Both should make exactly one views.open call per request.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+from urllib.parse import urlencode
+from typing import Dict, Any, List
+
+import benchmarks  # noqa: F401  (test environment defaults)
+from benchmarks import fake_slack_server, workspace
+from benchmarks.loadgen import signed_headers, percentile, TRIGGER_PATH
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--teams", type=int, default=10)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Seconds the fake Slack API takes per call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("-o", "--output", help="Write the report as JSON")
+    benchmarks.add_database_argument(parser)
+    args = parser.parse_args(argv)
+    benchmarks.check_database(args.i_know)
+
+    server, state = fake_slack_server.serve(latency=args.latency)
+    os.environ["SLACK_API_URL"] = \
+        f"http://127.0.0.1:{server.server_port}/api/"
+
+    from slack_sdk.signature import SignatureVerifier
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    from app import create_app
+    from app.models import User, Submission, db
+
+    app = create_app()
+    rng = random.Random(args.seed)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        workspace.generate(teams=args.teams, users=args.users, days=1,
+                           seed=args.seed)
+        submitted = {(row.user_id, row.standup_id) for row in
+                     db.session.query(Submission.user_id,
+                                      Submission.standup_id)}
+        roster = [(user.user_id, team.name,
+                   (user.id, team.standup.id) in submitted)
+                  for user in User.query if user.is_active
+                  for team in user.team]
+
+    queries = {"count": 0}
+    event.listen(Engine, "before_cursor_execute",
+                 lambda *_, **__: queries.__setitem__("count",
+                                                      queries["count"] + 1))
+
+    verifier = SignatureVerifier(os.environ["SLACK_SIGNING_SECRET"])
+    test_client = app.test_client()
+    results: Dict[str, Dict[str, List[float]]] = {
+        "blank form": {"latency": [], "queries": []},
+        "edit view": {"latency": [], "queries": []},
+    }
+    state.reset()
+    for idx in range(args.requests):
+        user_id, team, has_submission = rng.choice(roster)
+        body = urlencode({"command": "/standup", "text": team,
+                          "user_id": user_id, "team_id": "T0BENCHMARK",
+                          "trigger_id": f"{idx}.{rng.getrandbits(64)}"})
+        start_queries = queries["count"]
+        start = time.perf_counter()
+        response = test_client.post(TRIGGER_PATH, data=body,
+                                    headers=signed_headers(verifier, body))
+        elapsed = time.perf_counter() - start
+        if response.status_code != 200 or response.data:
+            raise RuntimeError(f"{response.status_code}: {response.data[:200]}")
+
+        case = results["edit view" if has_submission else "blank form"]
+        case["latency"].append(elapsed)
+        case["queries"].append(queries["count"] - start_queries)
+
+    calls = state.stats()["calls"]
+    report: Dict[str, Any] = {
+        "requests": args.requests,
+        "slack_latency": args.latency,
+        "views_open_per_request": calls.get("views.open", 0) / args.requests,
+        "cases": {
+            name: {"requests": len(case["latency"]),
+                   "p50": percentile(sorted(case["latency"]), 50),
+                   "p99": percentile(sorted(case["latency"]), 99),
+                   "queries": statistics.median(case["queries"])}
+            for name, case in results.items() if case["latency"]
+        },
+    }
+
+    print(f"{'':<14}{'requests':>10}{'p50':>12}{'p99':>12}{'queries':>9}",
+          file=sys.stderr)
+    for name, case in report["cases"].items():
+        print(f"{name:<14}{case['requests']:>10}"
+              f"{case['p50'] * 1000:>10.2f}ms{case['p99'] * 1000:>10.2f}ms"
+              f"{case['queries']:>9.0f}", file=sys.stderr)
+    print(f"views.open calls per request: "
+          f"{report['views_open_per_request']:.2f}", file=sys.stderr)
+
+    server.shutdown()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
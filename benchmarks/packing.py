@@ -0,0 +1,119 @@
+"""
+Compare the thread messages of a standup publish packed by user with the
+naive 50-block chunks on a synthetic large team.
+
+    python -m benchmarks.packing --users 300 --questions 4 --oversized 0.05
+
+Naive chunks are counted as rejected by Slack when they exceed the block or
+payload size limit; the users in them would be missing from the thread.
+"""
+import sys
+import json
+import random
+import argparse
+from typing import Dict, Any, List
+
+import benchmarks  # noqa: F401  (test environment defaults)
+import app.utils as utils
+from app.constants import BLOCK_SIZE, MESSAGE_PAYLOAD_SIZE
+from app.models import User, Standup, Submission
+from benchmarks import workspace
+
+
+# Submissions of a team, not saved to a DB. A share of the users paste very
+# long answers (logs, release notes) to exercise the size limits.
+def synthetic_team(users: int, questions: int, oversized: float,
+                   rng: random.Random) -> List[Submission]:
+    blockkit_form = utils.questions_to_blockkit(
+        [f"Question {idx + 1}?" for idx in range(questions)])
+    blockkit_form["callback_id"] = "submit_standup%benchmark"
+    standup = Standup(standup_blocks=json.dumps(blockkit_form),
+                      trigger="benchmark")
+
+    submissions = []
+    for idx in range(users):
+        view = workspace.submission_view(standup, rng)
+        if rng.random() < oversized:
+            values = list(view["state"]["values"].values())
+            answer = next(iter(rng.choice(values).values()))
+            answer["value"] = workspace.random_answer(rng, max_lines=400)
+        user = User(user_id=f"U{idx:010d}", username=f"user-{idx}")
+        submissions.append(Submission(user=user, standup=standup,
+                                      standup_submission=json.dumps(view)))
+    return submissions
+
+
+# Message count and limit violations of a list of messages. `owners` maps
+# every block to the index of the submission it belongs to.
+def summarize(messages: List[List[Dict[str, Any]]],
+              owners: Dict[int, int]) -> Dict[str, Any]:
+    users_in: Dict[int, set] = {}
+    rejected_users: set = set()
+    sizes = []
+    for number, message in enumerate(messages):
+        size = sum(utils.block_size(block) for block in message)
+        sizes.append(size)
+        for block in message:
+            users_in.setdefault(owners[id(block)], set()).add(number)
+        if len(message) > BLOCK_SIZE or size > MESSAGE_PAYLOAD_SIZE:
+            rejected_users.update(owners[id(block)] for block in message)
+
+    return {
+        "messages": len(messages),
+        "split_users": sum(1 for numbers in users_in.values()
+                           if len(numbers) > 1),
+        "over_limit_messages": sum(1 for message, size in zip(messages, sizes)
+                                   if len(message) > BLOCK_SIZE or
+                                   size > MESSAGE_PAYLOAD_SIZE),
+        "rejected_users": len(rejected_users),
+        "max_message_size": max(sizes, default=0),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--questions", type=int, default=4)
+    parser.add_argument("--oversized", type=float, default=0.05,
+                        help="Share of users with very long answers")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("-o", "--output", help="Write the report as JSON")
+    args = parser.parse_args(argv)
+
+    submissions = synthetic_team(args.users, args.questions, args.oversized,
+                                 random.Random(args.seed))
+
+    owners: Dict[int, int] = {}
+    groups = []
+    for idx, submission in enumerate(submissions):
+        # The shared divider block is copied so that it has one owner
+        blocks = [dict(block) for block in utils.submission_blocks(submission)]
+        owners.update((id(block), idx) for block in blocks)
+        groups.append(blocks)
+
+    naive_blocks = [block for blocks in groups for block in blocks]
+    naive = summarize(list(utils.chunk_blocks(naive_blocks, BLOCK_SIZE)),
+                      owners)
+    packed = summarize([message for message, _ in
+                        utils.pack_blocks(groups)], owners)
+
+    report = {"users": args.users, "questions": args.questions,
+              "oversized": args.oversized,
+              "naive": naive, "packed": packed,
+              "messages_saved": naive["messages"] - packed["messages"]}
+
+    print(f"{'':<20}{'naive':>10}{'packed':>10}", file=sys.stderr)
+    for key in naive:
+        print(f"{key:<20}{naive[key]:>10}{packed[key]:>10}", file=sys.stderr)
+    print(f"messages saved: {report['messages_saved']} "
+          f"({naive['rejected_users']} users lost to rejected naive chunks)",
+          file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
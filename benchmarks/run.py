@@ -0,0 +1,262 @@
+"""
+Time the hot paths of the app against a synthetic workspace.
+
+    python -m benchmarks.run --teams 20 --users 500 --days 10 -o results.json
+    python -m benchmarks.run --compare results.json
+"""
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import contextlib
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Any, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import benchmarks  # noqa: F401  (test environment defaults)
+from app import create_app
+from app.models import User, Team, Standup, Submission, StandupThread, db
+from benchmarks import workspace, fake_slack
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        event.listen(Engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args, **kwargs):
+        self.count += 1
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+# Run `func` `repeat` times after one warmup and summarize the timings.
+# `setup` runs untimed before every run.
+def measure(func: Callable, repeat: int, queries: QueryCounter,
+            slack: fake_slack.FakeSlackClient,
+            setup: Callable = None) -> Dict[str, Any]:
+    timings = []
+    query_counts = []
+
+    for run in range(repeat + 1):
+        if setup:
+            setup()
+        db.session.expire_all()
+        slack.reset()
+        start_queries = queries.count
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        elapsed = time.perf_counter() - start
+
+        db.session.rollback()
+        if run == 0:
+            continue
+        timings.append(elapsed)
+        query_counts.append(queries.count - start_queries)
+
+    return {
+        "runs": repeat,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+        "p95": _percentile(timings, 95),
+        "max": max(timings),
+        "queries": statistics.median(query_counts),
+        "slack_calls": dict(slack.calls),
+    }
+
+
+# Benchmarks by name. A `(setup, func)` tuple runs `setup` before every
+# timed call of `func`.
+def hot_paths(app, rng) -> Dict[str, Any]:
+    test_client = app.test_client()
+    team = Team.query.order_by(Team.id).first()
+    standup = team.standup
+    today = datetime(datetime.today().year, datetime.today().month,
+                     datetime.today().day)
+
+    users = (
+        db.session.query(User)
+        .join(Team.user)
+        .filter(Team.id == team.id, User.is_active)
+    )
+    submissions = Submission.query.filter(
+        Submission.created_at >= today,
+        Submission.user_id.in_([user.id for user in users]),
+        Submission.standup == standup,
+    )
+    submission = submissions.first()
+    oldest = Submission.query.order_by(Submission.created_at).first()
+
+    import app.utils as utils
+    import app.handlers as handlers
+    import app.directory as directory
+
+    # The Slack directory of the workspace, one member per user
+    directory.client.members = [
+        {"id": user.user_id, "name": f"user{user.id}", "tz": "Europe/Berlin",
+         "updated": 1, "deleted": not user.is_active,
+         "profile": {"real_name": f"User {user.id}",
+                     "display_name": f"user-{user.id}"}}
+        for user in User.query]
+
+    configure_data = workspace.configure_payload(
+        team.name, [user.user_id for user in users], workspace.QUESTIONS,
+        standup.publish_channel, rng)
+
+    # Resubmission of today's answers of a user, as Slack posts it
+    submit_data = {"type": "view_submission",
+                   "user": {"id": submission.user.user_id},
+                   "view": workspace.submission_view(standup, rng)}
+
+    start_date = oldest.created_at.strftime("%Y-%m-%d")
+    end_date = (today + timedelta(days=1)).strftime("%Y-%m-%d")
+
+    def expect_ok(response):
+        if response.status_code >= 400:
+            raise RuntimeError(f"{response.status_code}: {response.data[:200]}")
+
+    # Forget today's publish so that the next publish posts everything again
+    def unpublish():
+        StandupThread.query.filter_by(standup_id=standup.id).delete()
+        submissions.update({Submission.published_at: None},
+                           synchronize_session=False)
+        db.session.commit()
+
+    publish = lambda: expect_ok(  # noqa: E731
+        test_client.get(f"/slack/publish_standup/{team.name}/"))
+
+    return {
+        "build_standup": lambda: utils.build_standup(submissions, True),
+        "post_publish_stat": lambda: utils.post_publish_stat(users),
+        "publish_standup": (unpublish, publish),
+        "publish_standup_rerun": publish,
+        "notify_users": lambda: expect_ok(
+            test_client.get(f"/api/notify_users/{team.name}/")),
+        # Dry run: the real run is paced by REMINDER_SEND_RATE
+        "notify_all_users": lambda: expect_ok(
+            test_client.get("/api/notify_all_users/?dry_run=1")),
+        "get_submissions": lambda: expect_ok(test_client.get(
+            f"/api/get_submissions/?start_date={start_date}"
+            f"&end_date={end_date}")),
+        "get_submission": lambda: expect_ok(test_client.get(
+            f"/api/get_submission/{submission.user_id}/"
+            f"?start_date={start_date}")),
+        "get_users": lambda: expect_ok(test_client.get("/api/get_users/")),
+        "get_standups": lambda: expect_ok(
+            test_client.get("/api/get_standups/")),
+        "get_teams": lambda: expect_ok(test_client.get("/api/get_teams/")),
+        "open_edit_view": lambda: handlers.open_edit_view(
+            Standup.query.get(standup.id), Submission.query.get(submission.id)),
+        "configure_standup_handler": lambda: handlers.configure_standup_handler(
+            data=configure_data),
+        "submit_standup_handler": lambda: handlers.submit_standup_handler(
+            data=submit_data),
+        "directory_sync": lambda: directory.sync(full=True),
+    }
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return ""
+
+
+# Print median timings of `current` next to a previous run
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> None:
+    print(f"{'benchmark':<28}{'baseline':>12}{'current':>12}{'change':>10}"
+          f"{'queries':>14}")
+    for name, result in current["results"].items():
+        old = baseline["results"].get(name)
+        if not old:
+            print(f"{name:<28}{'-':>12}{result['median'] * 1000:>10.2f}ms")
+            continue
+        change = (result["median"] / old["median"] - 1) * 100
+        print(f"{name:<28}{old['median'] * 1000:>10.2f}ms"
+              f"{result['median'] * 1000:>10.2f}ms{change:>+9.1f}%"
+              f"{old['queries']:>7.0f}->{result['queries']:<6.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--teams", type=int, default=10)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--memberships", type=int, default=1,
+                        help="Teams every user is a member of")
+    parser.add_argument("--days", type=int, default=5,
+                        help="Days of submissions to generate")
+    parser.add_argument("--participation", type=float, default=0.9)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", action="append",
+                        help="Run only the named benchmark (repeatable)")
+    parser.add_argument("-o", "--output", help="Write results as JSON")
+    parser.add_argument("--compare", help="Previous JSON results to compare")
+    benchmarks.add_database_argument(parser)
+    args = parser.parse_args(argv)
+    benchmarks.check_database(args.i_know)
+
+    import random
+    rng = random.Random(args.seed)
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        dataset = workspace.generate(
+            teams=args.teams, users=args.users, memberships=args.memberships,
+            days=args.days, participation=args.participation, seed=args.seed)
+
+        slack = fake_slack.install(fake_slack.FakeSlackClient())
+        queries = QueryCounter()
+
+        results = {}
+        for name, func in hot_paths(app, rng).items():
+            if args.only and name not in args.only:
+                continue
+            setup, func = func if isinstance(func, tuple) else (None, func)
+            results[name] = measure(func, args.repeat, queries, slack, setup)
+            print(f"{name:<28}{results[name]['median'] * 1000:>10.2f}ms "
+                  f"{results[name]['queries']:>6.0f} queries "
+                  f"{sum(results[name]['slack_calls'].values()):>5} slack calls",
+                  file=sys.stderr)
+
+    report = {
+        "meta": {
+            "revision": _git_revision(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "database": app.config["SQLALCHEMY_DATABASE_URI"].split(":")[0],
+            "dataset": dataset,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Time the JSON backends of app.serialization on payloads shaped like the
+app's: a large get_submissions response, stored Slack views and the blocks
+of a standup publish.
+
+    python -m benchmarks.serialization --submissions 2000 --repeat 20
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Any, List
+
+import benchmarks  # noqa: F401  (test environment defaults)
+import app.serialization as serialization
+import app.utils as utils
+from app import StandupJSONEncoder
+from app.models import User, Standup, Submission
+from benchmarks import workspace
+
+
+def payloads(count: int, rng: random.Random) -> Dict[str, Any]:
+    blockkit_form = utils.questions_to_blockkit(workspace.QUESTIONS)
+    blockkit_form["callback_id"] = "submit_standup%benchmark"
+    standup = Standup(standup_blocks=json.dumps(blockkit_form),
+                      trigger="benchmark")
+
+    views = [json.dumps(workspace.submission_view(standup, rng))
+             for _ in range(count)]
+    start = datetime(2021, 7, 1, 9)
+    submissions = [
+        Submission(id=idx, user_id=idx % 500,
+                   user=User(user_id=f"U{idx % 500:010d}",
+                             username=f"user-{idx % 500}"),
+                   standup=standup, standup_submission=view,
+                   created_at=start + timedelta(minutes=idx))
+        for idx, view in enumerate(views)
+    ]
+
+    return {
+        "get_submissions": {
+            "success": True,
+            "submissions": [utils.prepare_user_submission(submission)
+                            for submission in submissions],
+        },
+        "views": views,
+        "publish_blocks": utils.build_standup(submissions[:300]),
+    }
+
+
+# Serialization as before app.serialization: stdlib json through the
+# Flask encoder, as jsonify called it
+def stdlib_dumps(obj: Any) -> str:
+    encoder = StandupJSONEncoder(sort_keys=True, separators=(",", ":"))
+    return json.JSONEncoder.encode(encoder, obj)
+
+
+def cases(data: Dict[str, Any]) -> Dict[str, Callable]:
+    return {
+        "dumps get_submissions": lambda: serialization.dumps(
+            data["get_submissions"], sort_keys=True),
+        "dumps publish blocks": lambda: serialization.dumps(
+            data["publish_blocks"]),
+        "loads stored views": lambda: [serialization.loads(view)
+                                       for view in data["views"]],
+    }
+
+
+def measure(func: Callable, repeat: int) -> float:
+    timings: List[float] = []
+    for _ in range(repeat + 1):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings[1:])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--submissions", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("-o", "--output", help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    data = payloads(args.submissions, random.Random(args.seed))
+    backends = ["stdlib"] + (["orjson"] if serialization.orjson else [])
+    installed = serialization.BACKEND
+
+    results: Dict[str, Dict[str, float]] = {
+        "flask encoder (before)": {"stdlib": measure(
+            lambda: stdlib_dumps(data["get_submissions"]), args.repeat)},
+    }
+    try:
+        for backend in backends:
+            serialization.BACKEND = backend
+            for name, func in cases(data).items():
+                results.setdefault(name, {})[backend] = measure(func,
+                                                                args.repeat)
+    finally:
+        serialization.BACKEND = installed
+
+    print(f"{'':<28}" + "".join(f"{backend:>12}" for backend in backends),
+          file=sys.stderr)
+    for name, timings in results.items():
+        print(f"{name:<28}" + "".join(
+            f"{timings[backend] * 1000:>10.2f}ms" if backend in timings
+            else f"{'':>12}" for backend in backends), file=sys.stderr)
+
+    report = {"submissions": args.submissions, "backends": backends,
+              "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
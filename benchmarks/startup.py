@@ -0,0 +1,53 @@
+"""
+Measure the cold start of the app in fresh interpreters.
+
+    python -m benchmarks.startup --runs 10 -o startup.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+import benchmarks  # noqa: F401  (test environment defaults)
+
+SCRIPT = (
+    "from app import create_app; app = create_app(); "
+    "print(app.config['STARTUP_SECONDS'])"
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure app cold start")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("-o", "--output", help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    wall = []
+    reported = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        output = subprocess.check_output([sys.executable, "-c", SCRIPT],
+                                         env=os.environ)
+        wall.append(time.perf_counter() - start)
+        reported.append(float(output.decode().strip().splitlines()[-1]))
+
+    result = {
+        "runs": args.runs,
+        "wall_median": statistics.median(wall),
+        "wall_max": max(wall),
+        "app_median": statistics.median(reported),
+        "app_max": max(reported),
+        "create_schema": os.environ.get("CREATE_SCHEMA"),
+        "cache_warmup": os.environ.get("CACHE_WARMUP", "lazy"),
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
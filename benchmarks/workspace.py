@@ -0,0 +1,186 @@
+import copy
+import json
+import random
+import string
+from datetime import datetime, timedelta, time
+from typing import Dict, Any, List
+
+import app.utils as utils
+import app.forms as forms
+import app.constants as constants
+from app.models import User, Team, Standup, Submission, db
+
+QUESTIONS = [
+    "What did you do yesterday?",
+    "What will you do today?",
+    "Anything blocking you?",
+]
+
+WORDS = (
+    "deploy review fix refactor migration test release incident sync design "
+    "api dashboard cron metrics query index cache slack thread publish docs "
+    "customer bug feature rollout config oncall benchmark cleanup"
+).split()
+
+
+def _slack_id(prefix: str, rng: random.Random) -> str:
+    return prefix + "".join(rng.choices(string.ascii_uppercase + string.digits,
+                                        k=10))
+
+
+# Bullet list answer similar to what people actually type in the form
+def random_answer(rng: random.Random, max_lines: int = 4) -> str:
+    lines = []
+    for _ in range(rng.randint(1, max_lines)):
+        words = rng.choices(WORDS, k=rng.randint(4, 12))
+        lines.append("- " + " ".join(words))
+    return "\n".join(lines)
+
+
+# View payload in the shape Slack sends on a `view_submission`
+def submission_view(standup: Standup, rng: random.Random) -> Dict[str, Any]:
+    view = json.loads(utils.get_standup_view(standup))
+    values: dict = {}
+
+    for block in view["blocks"]:
+        if block["type"] != "input":
+            continue
+        block_id = block.setdefault("block_id", "".join(
+            rng.choices(string.ascii_letters, k=5)))
+        action_id = block["element"].setdefault("action_id", "".join(
+            rng.choices(string.ascii_letters, k=5)))
+        values[block_id] = {action_id: {"type": "plain_text_input",
+                                        "value": random_answer(rng)}}
+
+    view.update({
+        "id": _slack_id("V", rng),
+        "team_id": "T0BENCHMARK",
+        "hash": _slack_id("", rng),
+        "state": {"values": values},
+    })
+    return view
+
+
+# `view_submission` payload of the configure modal for a team
+def configure_payload(team_name: str, user_ids: List[str],
+                      questions: List[str], channel: str,
+                      rng: random.Random) -> Dict[str, Any]:
+    view = copy.deepcopy(constants.CONFIGURE_VIEW)
+    view["callback_id"] = f"configure_standup%{team_name}"
+    values: dict = {}
+
+    for block in view["blocks"]:
+        if block["type"] == "input":
+            block["block_id"] = "".join(rng.choices(string.ascii_letters, k=5))
+            action_id = block["element"]["action_id"]
+            if action_id == "multi_users_select-action":
+                state = {"selected_users": user_ids}
+            else:
+                state = {"value": "\n".join(questions)}
+            values[block["block_id"]] = {action_id: state}
+        elif block.get("block_id") == "channels_select":
+            values["channels_select"] = {
+                "channels_select": {"selected_channel": channel}}
+        elif block.get("block_id") == "timepicker_select":
+            values["timepicker_select"] = {
+                "timepicker_action": {"selected_time": "09:30"}}
+
+    view["state"] = {"values": values}
+    return {"type": "view_submission",
+            "user": {"id": user_ids[0] if user_ids else "U0BENCHMARK"},
+            "view": view}
+
+
+# Fill the database with a synthetic workspace. Every user is a member of
+# `memberships` teams (at most `teams`) and submits on most days.
+def generate(teams: int = 10, users: int = 100, memberships: int = 1,
+             days: int = 5, participation: float = 0.9,
+             seed: int = 42) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    memberships = min(memberships, teams)
+
+    team_rows = []
+    for idx in range(teams):
+        team = Team(name=f"team-{idx}")
+        team.standup = Standup(trigger=team.name,
+                               is_active=True,
+                               publish_channel=_slack_id("C", rng),
+                               publish_time=time(9, 30))
+        forms.set_questions(team.standup, QUESTIONS,
+                            callback_id=f"submit_standup%{team.name}")
+        team_rows.append(team)
+    db.session.add_all(team_rows)
+    db.session.flush()
+
+    user_rows = []
+    for idx in range(users):
+        user = User(user_id=_slack_id("U", rng),
+                    username=f"user-{idx}",
+                    is_active=True,
+                    team=rng.sample(team_rows, memberships))
+        user_rows.append(user)
+    db.session.add_all(user_rows)
+    db.session.flush()
+
+    today = datetime(datetime.today().year, datetime.today().month,
+                     datetime.today().day)
+    views = {team.id: [json.dumps(submission_view(team.standup, rng))
+                       for _ in range(8)] for team in team_rows}
+
+    submissions = []
+    for day in range(days):
+        created_at = today - timedelta(days=day) + timedelta(hours=8)
+        for user in user_rows:
+            for team in user.team:
+                if rng.random() > participation:
+                    continue
+                submissions.append({
+                    "user_id": user.id,
+                    "standup_id": team.standup.id,
+                    "standup_submission": rng.choice(views[team.id]),
+                    "form_version": team.standup.form_version,
+                    "created_at": created_at + timedelta(
+                        minutes=rng.randint(0, 120)),
+                    "day": created_at.date(),
+                })
+    db.session.bulk_insert_mappings(Submission, submissions)
+    db.session.commit()
+
+    return {
+        "teams": teams,
+        "users": users,
+        "memberships": memberships,
+        "days": days,
+        "submissions": len(submissions),
+        "seed": seed,
+    }
+
+
+# Seed the database of SQLALCHEMY_DATABASE_URI, e.g. for benchmarks.loadgen:
+#   python -m benchmarks.workspace --teams 20 --users 500 --days 0
+def main(argv=None):
+    import argparse
+    import benchmarks
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description="Seed a synthetic workspace")
+    parser.add_argument("--teams", type=int, default=10)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--memberships", type=int, default=1)
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--participation", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=42)
+    benchmarks.add_database_argument(parser)
+    args = parser.parse_args(argv)
+    benchmarks.check_database(args.i_know)
+
+    with create_app().app_context():
+        db.drop_all()
+        db.create_all()
+        print(generate(teams=args.teams, users=args.users,
+                       memberships=args.memberships, days=args.days,
+                       participation=args.participation, seed=args.seed))
+
+
+if __name__ == "__main__":
+    main()
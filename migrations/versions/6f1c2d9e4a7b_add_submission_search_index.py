@@ -0,0 +1,36 @@
+"""add submission search index
+
+Revision ID: 6f1c2d9e4a7b
+Revises: c235bc96c11d
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+import logging
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1c2d9e4a7b'
+down_revision = 'c235bc96c11d'
+branch_labels = None
+depends_on = None
+
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+def upgrade():
+    from app.search import index_ddl, is_indexed
+
+    dialect = op.get_bind().dialect.name
+    if not is_indexed(dialect):
+        logger.warning("No full-text index on %s, submission search falls "
+                       "back to LIKE matching", dialect)
+        return
+    for statement in index_ddl(dialect):
+        op.execute(statement)
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS submission_search")
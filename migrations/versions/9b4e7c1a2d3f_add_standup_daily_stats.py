@@ -0,0 +1,39 @@
+"""add standup daily stats
+
+Revision ID: 9b4e7c1a2d3f
+Revises: 6f1c2d9e4a7b
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4e7c1a2d3f'
+down_revision = '6f1c2d9e4a7b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'standup_daily_stats',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('standup_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('expected_members', sa.Integer(), nullable=False),
+        sa.Column('submitted', sa.Integer(), nullable=False),
+        sa.Column('late', sa.Integer(), nullable=False),
+        sa.Column('first_submitted_at', sa.DateTime(), nullable=True),
+        sa.Column('last_submitted_at', sa.DateTime(), nullable=True),
+        sa.Column('published_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['standup_id'], ['standup.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('standup_id', 'day',
+                            name='uq_standup_daily_stats_standup_day'),
+    )
+
+
+def downgrade():
+    op.drop_table('standup_daily_stats')
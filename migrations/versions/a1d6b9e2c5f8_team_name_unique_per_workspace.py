@@ -0,0 +1,56 @@
+"""make team names unique per workspace
+
+Revision ID: a1d6b9e2c5f8
+Revises: f4c7a0d3e6b9
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1d6b9e2c5f8'
+down_revision = 'f4c7a0d3e6b9'
+branch_labels = None
+depends_on = None
+
+# create_all named the unique constraint of team.name after the database's
+# defaults, and Sqlite doesn't name it at all. Batch mode recreates the
+# table on Sqlite and can only drop the constraint by this name.
+NAMING_CONVENTION = {"uq": "uq_%(table_name)s_%(column_0_name)s"}
+PARTIAL_INDEX_DIALECTS = ('postgresql', 'sqlite')
+
+
+def _name_constraint():
+    inspector = sa.inspect(op.get_bind())
+    for constraint in inspector.get_unique_constraints('team'):
+        if constraint['column_names'] == ['name']:
+            return constraint['name'] or 'uq_team_name'
+    return None
+
+
+def upgrade():
+    name_constraint = _name_constraint()
+    with op.batch_alter_table('team', schema=None,
+                              naming_convention=NAMING_CONVENTION) as batch_op:
+        if name_constraint:
+            batch_op.drop_constraint(name_constraint, type_='unique')
+        batch_op.create_unique_constraint('uq_team_workspace_id_name',
+                                          ['workspace_id', 'name'])
+
+    # Teams without a workspace (single-workspace deployments) have a NULL
+    # workspace_id, their names stay unique through a partial index
+    dialect = op.get_bind().dialect.name
+    if dialect in PARTIAL_INDEX_DIALECTS:
+        op.create_index('uq_team_name_without_workspace', 'team', ['name'],
+                        unique=True,
+                        **{f'{dialect}_where': sa.text('workspace_id IS NULL')})
+
+
+def downgrade():
+    if op.get_bind().dialect.name in PARTIAL_INDEX_DIALECTS:
+        op.drop_index('uq_team_name_without_workspace', table_name='team')
+    with op.batch_alter_table('team', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_team_workspace_id_name', type_='unique')
+        batch_op.create_unique_constraint('uq_team_name', ['name'])
@@ -0,0 +1,100 @@
+"""submission day key
+
+Revision ID: a7d2e5f8c1b3
+Revises: f3c6a9d2b8e4
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d2e5f8c1b3'
+down_revision = 'f3c6a9d2b8e4'
+branch_labels = None
+depends_on = None
+
+SEARCH_TABLE = 'submission_search'
+_COLUMN_NAMES = ("id, user_id, standup_id, standup_submission, created_at, "
+                 "published_at, day")
+
+
+def _remove_from_search_index(bind, where: str) -> None:
+    if SEARCH_TABLE not in sa.inspect(bind).get_table_names():
+        return
+    column = 'submission_id' if bind.dialect.name == 'postgresql' \
+        else 'rowid'
+    op.execute(f"DELETE FROM {SEARCH_TABLE} WHERE {column} IN "
+               f"(SELECT id FROM submission_archive WHERE {where})")
+
+
+# Day key of the existing submissions, computed from their UTC `created_at`
+# by the helper the app uses for new ones
+def _backfill_days(bind) -> None:
+    from app.models import standup_day
+
+    rows = bind.execute(sa.text(
+        "SELECT id, created_at FROM submission "
+        "WHERE created_at IS NOT NULL").columns(
+            id=sa.Integer(), created_at=sa.DateTime())).fetchall()
+    if rows:
+        bind.execute(
+            sa.text("UPDATE submission SET day = :day WHERE id = :id")
+            .bindparams(sa.bindparam('day', type_=sa.Date())),
+            [{'id': id, 'day': standup_day(created_at)}
+             for id, created_at in rows])
+
+
+def upgrade():
+    # Submissions set aside by the migrations instead of being deleted
+    op.create_table(
+        'submission_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('standup_id', sa.Integer(), nullable=True),
+        sa.Column('standup_submission', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('published_at', sa.DateTime(), nullable=True),
+        sa.Column('day', sa.Date(), nullable=True),
+        sa.Column('reason', sa.String(length=20), nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    with op.batch_alter_table('submission', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('day', sa.Date(), nullable=True))
+
+    _backfill_days(op.get_bind())
+
+    # A user submits once per standup and day. The latest submission of a
+    # day is kept, the earlier duplicates are moved to the archive.
+    op.execute(
+        f"INSERT INTO submission_archive ({_COLUMN_NAMES}, reason, "
+        f"archived_at) SELECT {_COLUMN_NAMES}, 'duplicate', CURRENT_TIMESTAMP "
+        "FROM submission WHERE day IS NOT NULL AND id NOT IN ("
+        "SELECT MAX(id) FROM submission WHERE day IS NOT NULL "
+        "GROUP BY user_id, standup_id, day)"
+    )
+    _remove_from_search_index(op.get_bind(), "reason = 'duplicate'")
+    op.execute("DELETE FROM submission WHERE id IN "
+               "(SELECT id FROM submission_archive)")
+
+    with op.batch_alter_table('submission', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_submission_user_standup_day',
+                                          ['user_id', 'standup_id', 'day'])
+
+
+def downgrade():
+    with op.batch_alter_table('submission', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_submission_user_standup_day',
+                                 type_='unique')
+
+    # Archived submissions go back, they need `flask search backfill` to be
+    # searchable again
+    op.execute(f"INSERT INTO submission ({_COLUMN_NAMES}) "
+               f"SELECT {_COLUMN_NAMES} FROM submission_archive")
+    op.drop_table('submission_archive')
+
+    with op.batch_alter_table('submission', schema=None) as batch_op:
+        batch_op.drop_column('day')
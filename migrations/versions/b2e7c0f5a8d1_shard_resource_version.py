@@ -0,0 +1,62 @@
+"""shard resource versions
+
+Revision ID: b2e7c0f5a8d1
+Revises: a1d6b9e2c5f8
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2e7c0f5a8d1'
+down_revision = 'a1d6b9e2c5f8'
+branch_labels = None
+depends_on = None
+
+RESOURCES = ('standup', 'team', 'user')
+# app.versioning.SHARDS when this migration was written
+SHARDS = 16
+
+
+def upgrade():
+    # A version becomes the sum of its shards. The current version moves to
+    # shard 0 so that no version handed out before is handed out again.
+    resource_version = op.create_table(
+        'resource_version_sharded',
+        sa.Column('resource', sa.String(length=30), nullable=False),
+        sa.Column('shard', sa.Integer(), autoincrement=False,
+                  nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('resource', 'shard',
+                                name='pk_resource_version'),
+    )
+    current = dict(op.get_bind().execute(
+        sa.text("SELECT resource, version FROM resource_version")).fetchall())
+    op.bulk_insert(resource_version, [
+        {'resource': resource, 'shard': shard,
+         'version': current.get(resource, 0) if shard == 0 else 0}
+        for resource in sorted(set(RESOURCES) | set(current))
+        for shard in range(SHARDS)
+    ])
+    op.drop_table('resource_version')
+    op.rename_table('resource_version_sharded', 'resource_version')
+
+
+def downgrade():
+    resource_version = op.create_table(
+        'resource_version_single',
+        sa.Column('resource', sa.String(length=30), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('resource'),
+    )
+    totals = op.get_bind().execute(sa.text(
+        "SELECT resource, SUM(version) FROM resource_version "
+        "GROUP BY resource")).fetchall()
+    op.bulk_insert(resource_version, [
+        {'resource': resource, 'version': int(version)}
+        for resource, version in totals
+    ])
+    op.drop_table('resource_version')
+    op.rename_table('resource_version_single', 'resource_version')
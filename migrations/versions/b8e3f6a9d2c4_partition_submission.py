@@ -0,0 +1,139 @@
+"""partition submission by month on postgres
+
+Revision ID: b8e3f6a9d2c4
+Revises: a7d2e5f8c1b3
+Create Date: 2026-10-19 16:00:00.000000
+
+Only runs on Postgres with SUBMISSION_PARTITIONING=1. Other databases keep
+the single submission table.
+
+"""
+import os
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e3f6a9d2c4'
+down_revision = 'a7d2e5f8c1b3'
+branch_labels = None
+depends_on = None
+
+SEARCH_TABLE = 'submission_search'
+
+
+def _columns(day_null: str) -> str:
+    return (
+        "id INTEGER NOT NULL DEFAULT nextval('submission_id_seq'), "
+        'user_id INTEGER REFERENCES "user" (id), '
+        "standup_id INTEGER REFERENCES standup (id), "
+        "standup_submission VARCHAR, "
+        "created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL, "
+        "published_at TIMESTAMP WITHOUT TIME ZONE, "
+        f"day DATE {day_null}"
+    )
+
+
+_COLUMN_NAMES = ("id, user_id, standup_id, standup_submission, created_at, "
+                 "published_at, day")
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _is_partitioned(bind) -> bool:
+    return bind.execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+        "JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = 'submission' AND pg_table_is_visible(c.oid))"
+    )).scalar()
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql' or \
+            os.environ.get('SUBMISSION_PARTITIONING', '0') != '1' or \
+            _is_partitioned(bind):
+        return
+
+    # a7d2e5f8c1b3 sets the day of every submission, rows written without
+    # one since can't be held by a partition. They are moved to the archive
+    # like the duplicates, with their search entries removed.
+    op.execute(
+        f"INSERT INTO submission_archive ({_COLUMN_NAMES}, reason, "
+        f"archived_at) SELECT {_COLUMN_NAMES}, 'no_day', CURRENT_TIMESTAMP "
+        "FROM submission WHERE day IS NULL")
+    if bind.execute(sa.text(f"SELECT to_regclass('{SEARCH_TABLE}')")).scalar():
+        op.execute(f"DELETE FROM {SEARCH_TABLE} WHERE submission_id IN "
+                   "(SELECT id FROM submission_archive "
+                   "WHERE reason = 'no_day')")
+    op.execute("DELETE FROM submission WHERE day IS NULL")
+
+    op.execute("ALTER TABLE submission RENAME TO submission_unpartitioned")
+    op.execute("ALTER TABLE submission_unpartitioned RENAME CONSTRAINT "
+               "submission_pkey TO submission_unpartitioned_pkey")
+    op.execute("ALTER TABLE submission_unpartitioned RENAME CONSTRAINT "
+               "uq_submission_user_standup_day "
+               "TO uq_submission_unpartitioned_user_standup_day")
+    op.execute("ALTER SEQUENCE submission_id_seq OWNED BY NONE")
+
+    op.execute(
+        f"CREATE TABLE submission ({_columns('NOT NULL')}, "
+        "CONSTRAINT submission_pkey PRIMARY KEY (id, day), "
+        "CONSTRAINT uq_submission_user_standup_day "
+        "UNIQUE (user_id, standup_id, day)) "
+        "PARTITION BY RANGE (day)")
+    op.execute("ALTER SEQUENCE submission_id_seq OWNED BY submission.id")
+    op.execute("CREATE TABLE submission_default PARTITION OF submission "
+               "DEFAULT")
+
+    this_month = date.today().replace(day=1)
+    first_day = bind.execute(sa.text(
+        "SELECT MIN(day) FROM submission_unpartitioned")).scalar()
+    month = min(first_day.replace(day=1), this_month) if first_day \
+        else this_month
+    ahead = int(os.environ.get('SUBMISSION_PARTITIONS_AHEAD', 3))
+    while month <= _add_months(this_month, ahead):
+        end = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE submission_y{month.year}m{month.month:02d} "
+            "PARTITION OF submission "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')")
+        month = end
+
+    op.execute(f"INSERT INTO submission ({_COLUMN_NAMES}) "
+               f"SELECT {_COLUMN_NAMES} FROM submission_unpartitioned")
+    op.execute("DROP TABLE submission_unpartitioned")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql' or not _is_partitioned(bind):
+        return
+
+    op.execute("ALTER SEQUENCE submission_id_seq OWNED BY NONE")
+    op.execute(
+        f"CREATE TABLE submission_unpartitioned ({_columns('NULL')}, "
+        "CONSTRAINT submission_unpartitioned_pkey PRIMARY KEY (id), "
+        "CONSTRAINT uq_submission_unpartitioned_user_standup_day "
+        "UNIQUE (user_id, standup_id, day))")
+    op.execute(f"INSERT INTO submission_unpartitioned ({_COLUMN_NAMES}) "
+               f"SELECT {_COLUMN_NAMES} FROM submission")
+    op.execute("DROP TABLE submission")
+
+    op.execute("ALTER TABLE submission_unpartitioned RENAME TO submission")
+    op.execute("ALTER TABLE submission RENAME CONSTRAINT "
+               "submission_unpartitioned_pkey TO submission_pkey")
+    op.execute("ALTER TABLE submission RENAME CONSTRAINT "
+               "uq_submission_unpartitioned_user_standup_day "
+               "TO uq_submission_user_standup_day")
+    op.execute("ALTER SEQUENCE submission_id_seq OWNED BY submission.id")
+
+    op.execute(f"INSERT INTO submission ({_COLUMN_NAMES}) "
+               f"SELECT {_COLUMN_NAMES} FROM submission_archive "
+               "WHERE reason = 'no_day'")
+    op.execute("DELETE FROM submission_archive WHERE reason = 'no_day'")
@@ -0,0 +1,36 @@
+"""add user directory fields
+
+Revision ID: c9f4a7b0e3d5
+Revises: b8e3f6a9d2c4
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9f4a7b0e3d5'
+down_revision = 'b8e3f6a9d2c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('display_name', sa.String(length=80),
+                                      nullable=True))
+        batch_op.add_column(sa.Column('tz', sa.String(length=50),
+                                      nullable=True))
+        batch_op.add_column(sa.Column('is_deleted', sa.Boolean(),
+                                      nullable=True))
+        batch_op.add_column(sa.Column('directory_updated', sa.Integer(),
+                                      nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('directory_updated')
+        batch_op.drop_column('is_deleted')
+        batch_op.drop_column('tz')
+        batch_op.drop_column('display_name')
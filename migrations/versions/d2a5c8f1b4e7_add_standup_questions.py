@@ -0,0 +1,45 @@
+"""add standup questions
+
+Revision ID: d2a5c8f1b4e7
+Revises: c9f4a7b0e3d5
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a5c8f1b4e7'
+down_revision = 'c9f4a7b0e3d5'
+branch_labels = None
+depends_on = None
+
+
+def _questions(standup_blocks):
+    blocks = json.loads(standup_blocks or "{}").get("blocks", [])
+    return json.dumps([block["label"]["text"] for block in blocks
+                       if block["type"] == "input"])
+
+
+def upgrade():
+    with op.batch_alter_table('standup', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('questions', sa.String(),
+                                      nullable=True))
+
+    standup = sa.table('standup', sa.column('id', sa.Integer),
+                       sa.column('standup_blocks', sa.String),
+                       sa.column('questions', sa.String))
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select([standup.c.id, standup.c.standup_blocks])).fetchall()
+    for row in rows:
+        bind.execute(standup.update().where(standup.c.id == row.id)
+                     .values(questions=_questions(row.standup_blocks)))
+
+
+def downgrade():
+    with op.batch_alter_table('standup', schema=None) as batch_op:
+        batch_op.drop_column('questions')
@@ -0,0 +1,53 @@
+"""idempotent publish
+
+Revision ID: d5a8e3f0b6c2
+Revises: 9b4e7c1a2d3f
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a8e3f0b6c2'
+down_revision = '9b4e7c1a2d3f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('standupthread', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('day', sa.Date(), nullable=True))
+        batch_op.create_index('ix_standupthread_standup_id_day',
+                              ['standup_id', 'day'], unique=False)
+
+    with op.batch_alter_table('submission', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('published_at', sa.DateTime(),
+                                      nullable=True))
+
+    with op.batch_alter_table('standup', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('publishing_since', sa.DateTime(),
+                                      nullable=True))
+
+    op.execute("UPDATE standupthread SET day = DATE(created_at)")
+
+    # Submissions of days that already have a thread were posted to it
+    op.execute(
+        "UPDATE submission SET published_at = ("
+        "SELECT MIN(t.created_at) FROM standupthread t "
+        "WHERE t.standup_id = submission.standup_id "
+        "AND t.day = DATE(submission.created_at))"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('standup', schema=None) as batch_op:
+        batch_op.drop_column('publishing_since')
+
+    with op.batch_alter_table('submission', schema=None) as batch_op:
+        batch_op.drop_column('published_at')
+
+    with op.batch_alter_table('standupthread', schema=None) as batch_op:
+        batch_op.drop_index('ix_standupthread_standup_id_day')
+        batch_op.drop_column('day')
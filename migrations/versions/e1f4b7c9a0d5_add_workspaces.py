@@ -0,0 +1,53 @@
+"""add workspaces
+
+Revision ID: e1f4b7c9a0d5
+Revises: d5a8e3f0b6c2
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1f4b7c9a0d5'
+down_revision = 'd5a8e3f0b6c2'
+branch_labels = None
+depends_on = None
+
+SCOPED_TABLES = ('user', 'team', 'standup')
+
+
+def upgrade():
+    op.create_table(
+        'workspace',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('slack_team_id', sa.String(length=20), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=True),
+        sa.Column('bot_token', sa.String(length=255), nullable=False),
+        sa.Column('signing_secret', sa.String(length=100), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('slack_team_id'),
+    )
+
+    for table in SCOPED_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('workspace_id', sa.Integer(),
+                                          nullable=True))
+            batch_op.create_index(f'ix_{table}_workspace_id',
+                                  ['workspace_id'], unique=False)
+            batch_op.create_foreign_key(f'fk_{table}_workspace_id_workspace',
+                                        'workspace', ['workspace_id'], ['id'])
+
+
+def downgrade():
+    for table in SCOPED_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_constraint(f'fk_{table}_workspace_id_workspace',
+                                     type_='foreignkey')
+            batch_op.drop_index(f'ix_{table}_workspace_id')
+            batch_op.drop_column('workspace_id')
+
+    op.drop_table('workspace')
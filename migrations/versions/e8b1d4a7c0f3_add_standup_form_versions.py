@@ -0,0 +1,84 @@
+"""add standup form versions
+
+Revision ID: e8b1d4a7c0f3
+Revises: d2a5c8f1b4e7
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+import json
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b1d4a7c0f3'
+down_revision = 'd2a5c8f1b4e7'
+branch_labels = None
+depends_on = None
+
+
+# Gives the questions of a form the ids 1..n (block ids `question_<id>`,
+# action id `answer`) and returns the form and its questions
+def _assign_ids(standup_blocks):
+    form = json.loads(standup_blocks or "{}")
+    questions = []
+    for block in form.get("blocks", []):
+        if block.get("type") != "input":
+            continue
+        question_id = len(questions) + 1
+        block["block_id"] = f"question_{question_id}"
+        block.setdefault("element", {})["action_id"] = "answer"
+        questions.append({"id": question_id, "text": block["label"]["text"]})
+    return json.dumps(form), json.dumps(questions)
+
+
+def upgrade():
+    op.create_table(
+        'standup_form',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('standup_id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('questions', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['standup_id'], ['standup.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('standup_id', 'version',
+                            name='uq_standup_form_standup_version')
+    )
+    with op.batch_alter_table('standup', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('form_version', sa.Integer(),
+                                      nullable=True))
+    with op.batch_alter_table('submission', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('form_version', sa.Integer(),
+                                      nullable=True))
+
+    # Every standup starts at version 1. Existing submissions keep a NULL
+    # version, their answers are read by walking the stored view.
+    standup = sa.table('standup', sa.column('id', sa.Integer),
+                       sa.column('standup_blocks', sa.String),
+                       sa.column('form_version', sa.Integer))
+    standup_form = sa.table('standup_form',
+                            sa.column('standup_id', sa.Integer),
+                            sa.column('version', sa.Integer),
+                            sa.column('questions', sa.String),
+                            sa.column('created_at', sa.DateTime))
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select([standup.c.id, standup.c.standup_blocks])).fetchall()
+    for row in rows:
+        standup_blocks, questions = _assign_ids(row.standup_blocks)
+        bind.execute(standup.update().where(standup.c.id == row.id)
+                     .values(standup_blocks=standup_blocks, form_version=1))
+        bind.execute(standup_form.insert().values(
+            standup_id=row.id, version=1, questions=questions,
+            created_at=datetime.utcnow()))
+
+
+def downgrade():
+    with op.batch_alter_table('submission', schema=None) as batch_op:
+        batch_op.drop_column('form_version')
+    with op.batch_alter_table('standup', schema=None) as batch_op:
+        batch_op.drop_column('form_version')
+    op.drop_table('standup_form')
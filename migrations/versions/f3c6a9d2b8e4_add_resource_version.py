@@ -0,0 +1,33 @@
+"""add resource version
+
+Revision ID: f3c6a9d2b8e4
+Revises: e1f4b7c9a0d5
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c6a9d2b8e4'
+down_revision = 'e1f4b7c9a0d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    resource_version = op.create_table(
+        'resource_version',
+        sa.Column('resource', sa.String(length=30), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('resource'),
+    )
+    op.bulk_insert(resource_version, [
+        {'resource': resource, 'version': 0}
+        for resource in ('standup', 'team', 'user')
+    ])
+
+
+def downgrade():
+    op.drop_table('resource_version')
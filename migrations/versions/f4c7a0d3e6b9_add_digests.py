@@ -0,0 +1,43 @@
+"""add digests
+
+Revision ID: f4c7a0d3e6b9
+Revises: e8b1d4a7c0f3
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4c7a0d3e6b9'
+down_revision = 'e8b1d4a7c0f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'digest',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('standup_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('period', sa.String(length=10), nullable=False),
+        sa.Column('start_date', sa.Date(), nullable=False),
+        sa.Column('end_date', sa.Date(), nullable=False),
+        sa.Column('submissions', sa.Integer(), nullable=False),
+        sa.Column('blocks', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('posted_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['standup_id'], ['standup.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_digest_standup_id_period_start_date', 'digest',
+                    ['standup_id', 'period', 'start_date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_digest_standup_id_period_start_date',
+                  table_name='digest')
+    op.drop_table('digest')
@@ -0,0 +1,65 @@
+import os
+import random
+import tempfile
+
+# The app reads its configuration from the environment at import time. Tests
+# run against a throwaway Sqlite database with every query budget enforced:
+# a route or handler that executes more statements than its budget raises
+# QueryBudgetExceeded and fails the test.
+os.environ["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(
+    tempfile.mkdtemp(prefix="slate-tests-"), "test.db")
+os.environ["QUERY_BUDGET_MODE"] = "raise"
+os.environ.setdefault("ENVIRONMENT", "DEBUG")
+os.environ.setdefault("SLACK_API_TOKEN", "xoxb-test")
+os.environ.setdefault("SLACK_SIGNING_SECRET", "test-signing-secret")
+os.environ.setdefault("DIRECTORY_SYNC_RATE", "0")
+os.environ.setdefault("DIGEST_POST_RATE", "0")
+
+import pytest  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.models import db as _db  # noqa: E402
+from benchmarks import fake_slack, workspace  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app():
+    app = create_app()
+    app.testing = True
+    return app
+
+
+# Empty tables for every test, inside an app context
+@pytest.fixture
+def db(app):
+    with app.app_context():
+        _db.drop_all()
+        _db.create_all()
+        yield _db
+        _db.session.remove()
+
+
+@pytest.fixture
+def client(app, db):
+    return app.test_client()
+
+
+@pytest.fixture
+def slack(app):
+    return fake_slack.install(fake_slack.FakeSlackClient())
+
+
+@pytest.fixture
+def rng():
+    return random.Random(42)
+
+
+# Fills the database with a synthetic workspace, see
+# benchmarks.workspace.generate
+@pytest.fixture
+def seed(db):
+    def seed(**kwargs):
+        kwargs.setdefault("seed", 42)
+        return workspace.generate(**kwargs)
+
+    return seed
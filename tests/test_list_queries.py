@@ -0,0 +1,49 @@
+from datetime import date, timedelta
+
+import pytest
+
+import app.query_budget as query_budget
+from app.models import db
+from benchmarks import workspace
+
+# A list route executes the same statements for one row as for many: the
+# statement count measured with a single row is the budget of the same
+# request over a larger workspace, checked with mode="raise".
+
+ONE_ROW = dict(teams=1, users=1, memberships=1, days=1, participation=1.0)
+MANY_ROWS = dict(teams=4, users=20, memberships=2, days=3, participation=1.0)
+START_DATE = (date.today() - timedelta(days=7)).isoformat()
+
+
+# Recreate the tables with a synthetic workspace of `sizes`. Requests run
+# outside of the app context, each in its own session like in production.
+def _seed(app, **sizes):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        workspace.generate(**sizes)
+        db.session.commit()
+        db.session.remove()
+
+
+def _statements(app, url: str, budget: int = 100) -> int:
+    client = app.test_client()
+    # The first request fills the caches (auth tokens, versions)
+    assert client.get(url).status_code == 200
+    with query_budget.scope(url, budget, mode="raise") as current:
+        assert client.get(url).status_code == 200
+    return len(current.statements)
+
+
+@pytest.mark.parametrize("url", [
+    "/api/get_teams/",
+    "/api/get_users/",
+    f"/api/get_submissions/?start_date={START_DATE}",
+    "/api/notify_users/team-0/",
+])
+def test_statements_independent_of_rows(app, slack, url):
+    _seed(app, **ONE_ROW)
+    one_row = _statements(app, url)
+
+    _seed(app, **MANY_ROWS)
+    assert _statements(app, url, budget=one_row) == one_row
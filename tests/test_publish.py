@@ -0,0 +1,51 @@
+from datetime import datetime, time
+
+import app.utils as utils
+from app.models import StandupThread, Submission, db, standup_day
+
+
+def _late(seed):
+    seed(teams=1, users=4, days=1, participation=1.0)
+    submission = Submission.query.filter_by(day=standup_day()) \
+        .order_by(Submission.id).first()
+    submission.standup.publish_time = time(0, 0)
+    db.session.add(StandupThread(standup=submission.standup,
+                                 standup_id=submission.standup_id,
+                                 thread_id="1700000000.000100",
+                                 day=standup_day()))
+    db.session.commit()
+    return submission
+
+
+def test_claim_submissions_once(db, seed):
+    seed(teams=1, users=4, days=1, participation=1.0)
+    submissions = Submission.query.order_by(Submission.id).all()
+    ids = [submission.id for submission in submissions]
+
+    first = utils.claim_submissions(ids[:2], datetime.utcnow())
+    second = utils.claim_submissions(ids, datetime.utcnow())
+
+    assert first == set(ids[:2])
+    assert second == set(ids[2:])
+
+
+# A publish re-run claimed the submission first, the late submission isn't
+# posted to the thread a second time
+def test_late_submission_claimed_by_publish(db, seed, slack):
+    submission = _late(seed)
+    utils.claim_submissions([submission.id], datetime.utcnow())
+
+    utils.after_submission(submission, is_edit=True)
+
+    assert slack.calls["chat.update"] == 0
+    assert slack.calls["chat.postMessage"] == 1  # the copy sent to the user
+
+
+def test_late_submission_posted_once(db, seed, slack):
+    submission = _late(seed)
+
+    utils.after_submission(submission, is_edit=True)
+    utils.after_submission(submission, is_edit=True)
+
+    assert slack.calls["chat.update"] == 1
+    assert Submission.query.get(submission.id).published_at is not None
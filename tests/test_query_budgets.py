@@ -0,0 +1,125 @@
+from datetime import date, time, timedelta
+
+import pytest
+
+import app.handlers as handlers
+import app.query_budget as query_budget
+from app.constants import SLASH_COMMAND_TRIGGER
+from app.models import Standup, StandupThread, Submission, Team, User, db, \
+    standup_day
+from benchmarks import workspace
+
+# conftest.py sets QUERY_BUDGET_MODE=raise, so every route and handler below
+# raises QueryBudgetExceeded when it executes more statements than its
+# `@query_budget.budget`.
+
+
+def test_budgets_raise():
+    assert query_budget.QUERY_BUDGET_MODE == "raise"
+
+
+@pytest.fixture
+def seeded(seed):
+    seed(teams=3, users=12, memberships=2, days=3)
+    return Submission.query.order_by(Submission.id).first()
+
+
+@pytest.mark.parametrize("url", [
+    "/api/get_users/",
+    "/api/get_standups/",
+    "/api/get_standups/?status=active",
+    "/api/get_teams/",
+    "/api/notify_all_users/?dry_run=1",
+])
+def test_list_routes(client, seeded, url):
+    response = client.get(url)
+    assert response.status_code == 200
+
+
+def test_get_user(client, seeded):
+    response = client.get(f"/api/get_user/{seeded.user.username}/")
+    assert response.status_code == 200
+    assert len(response.json["users"]) == 1
+
+
+def test_get_standup(client, seeded):
+    response = client.get(f"/api/get_standup/{seeded.standup_id}/")
+    assert response.status_code == 200
+    assert response.json["standup"]["id"] == seeded.standup_id
+
+
+def test_get_submission(client, seeded):
+    start_date = (date.today() - timedelta(days=7)).isoformat()
+    response = client.get(f"/api/get_submission/{seeded.user_id}/"
+                          f"?start_date={start_date}")
+    assert response.status_code == 200
+    assert response.json["submissions"]
+
+
+def test_get_submissions(client, seeded):
+    start_date = (date.today() - timedelta(days=7)).isoformat()
+    response = client.get(f"/api/get_submissions/?start_date={start_date}")
+    assert response.status_code == 200
+    assert response.json["submissions"]
+
+
+def _submit_payload(user: User, standup: Standup, rng):
+    return {"type": "view_submission", "user": {"id": user.user_id},
+            "view": workspace.submission_view(standup, rng)}
+
+
+def test_submit_standup_handler(db, seed, slack, rng):
+    seed(teams=2, users=6, days=0)
+    user = User.query.order_by(User.id).first()
+    standup = user.team[0].standup
+
+    handlers.submit_standup_handler(data=_submit_payload(user, standup, rng))
+    # The second submission of the day edits the first
+    handlers.submit_standup_handler(data=_submit_payload(user, standup, rng))
+
+    assert Submission.query.filter_by(user_id=user.id).count() == 1
+
+
+# A submission made after today's standup was published goes straight to
+# its thread, and the thread's list of missing users is updated
+def test_submit_standup_handler_late(db, seed, slack, rng):
+    seed(teams=2, users=24, memberships=1, days=0)
+    team = max(Team.query.all(), key=lambda team: len(team.user))
+    user, standup = team.user[0], team.standup
+    standup.publish_time = time(0, 0)
+    db.session.add(StandupThread(standup=standup, standup_id=standup.id,
+                                 thread_id="1700000000.000100",
+                                 day=standup_day()))
+    db.session.commit()
+
+    handlers.submit_standup_handler(data=_submit_payload(user, standup, rng))
+
+    assert slack.calls["chat.update"] == 1
+    assert Submission.query.filter_by(user_id=user.id).one().published_at
+
+
+def test_open_standup_view(db, seed, slack):
+    seed(teams=2, users=6, days=0)
+    team = Team.query.order_by(Team.id).first()
+    user = team.user[0]
+
+    response = handlers.open_standup_view(
+        user_id=user.user_id, trigger_type=SLASH_COMMAND_TRIGGER,
+        data={"text": team.name, "trigger_id": "1.2.abc"})
+
+    assert response.status_code == 200
+    assert slack.calls["views.open"] == 1
+
+    # Without a team name the user gets the usage and their commands
+    handlers.open_standup_view(
+        user_id=user.user_id, trigger_type=SLASH_COMMAND_TRIGGER,
+        data={"text": "", "trigger_id": "1.2.abd"})
+
+    assert slack.calls["chat.postMessage"] == 1
+
+
+def test_open_edit_view(db, seeded):
+    standup = Standup.query.get(seeded.standup_id)
+    submission = Submission.query.get(seeded.id)
+
+    assert handlers.open_edit_view(standup, submission)
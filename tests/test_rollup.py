@@ -0,0 +1,37 @@
+import time as clock
+from datetime import date, datetime, time
+
+import pytest
+
+import app.rollup as rollup
+from app.models import StandupDailyStats, Submission, Team, standup_day
+
+
+@pytest.fixture
+def kolkata(monkeypatch):
+    monkeypatch.setenv("TZ", "Asia/Kolkata")
+    clock.tzset()
+    yield
+    monkeypatch.undo()
+    clock.tzset()
+
+
+# On a host that isn't on UTC, the rollup goes by the standup day and the
+# local publish time like the submissions and threads it describes
+def test_record_submission_local_day(db, seed, kolkata):
+    seed(teams=1, users=2, days=0)
+    team = Team.query.one()
+    team.standup.publish_time = time(4, 0)
+    created_at = datetime(2026, 10, 19, 23, 30)  # 05:00 on the 20th locally
+    submission = Submission(user=team.user[0], standup=team.standup,
+                            standup_submission="{}", created_at=created_at,
+                            day=standup_day(created_at))
+    db.session.add(submission)
+    db.session.commit()
+
+    rollup.record_submission(submission)
+    rollup.rebuild(date(2026, 10, 18), date(2026, 10, 21))
+
+    stats = StandupDailyStats.query.one()
+    assert (stats.day, stats.submitted, stats.late) == \
+        (date(2026, 10, 20), 1, 1)
@@ -0,0 +1,40 @@
+import app.versioning as versioning
+from app.models import ResourceVersion, User, db
+
+
+def test_etag_changes_with_writes(client, seed):
+    seed(teams=2, users=6, days=0)
+    etag = client.get("/api/get_users/").headers["ETag"]
+
+    response = client.get("/api/get_users/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    user = User.query.order_by(User.id).first()
+    user.display_name = "Renamed"
+    db.session.commit()
+
+    response = client.get("/api/get_users/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_writes_bump_the_shard_of_their_row(db, seed):
+    seed(teams=2, users=6, days=0)
+    before = versioning.versions(["user"])["user"]
+
+    user = User.query.order_by(User.id).first()
+    user.display_name = "Renamed"
+    db.session.commit()
+
+    assert versioning.versions(["user"])["user"] == before + 1
+    shard = ResourceVersion.query.get(("user", user.id % versioning.SHARDS))
+    assert shard.version >= 1
+
+
+def test_versions_are_read_only(db):
+    ResourceVersion.query.delete()
+    db.session.commit()
+
+    assert versioning.versions(["standup", "user"]) == {"standup": 0,
+                                                        "user": 0}
+    assert ResourceVersion.query.count() == 0